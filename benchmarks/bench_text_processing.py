@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the text processing stages of the document pipeline
+(cleaning, metadata extraction, language detection, chunking), in MB/s of text.
+
+The text is built by repeating a sample document up to `--size-mb`, with page
+footers and irregular whitespace so that the cleaner has work to do. Metadata
+is measured twice: on a document with a letterhead (found in the header) and on
+one without (full-scan fallback, the worst case).
+
+Usage:
+    python benchmarks/bench_text_processing.py --size-mb 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from unihelp.processor.chunker import SemanticChunker
+from unihelp.processor.cleaner import TextCleaner
+from unihelp.processor import metadata
+from unihelp.processor.metadata import MetadataExtractor
+
+DEFAULT_SAMPLE_PATH = os.path.join(ROOT, "unihelp", "processor", "tests", "dummy_fr.txt")
+
+
+def build_text(sample: str, size_mb: float) -> str:
+    """Repeats `sample` as numbered pages, with footers and runs of spaces/newlines, up to `size_mb`."""
+    target = int(size_mb * 1024 * 1024)
+    page = sample.replace(". ", ".   ").replace("\n\n", "\n\n\n\n")
+    pages = []
+    size = 0
+    while size < target:
+        pages.append(f"{page}\n\nPage {len(pages) + 1} of 9999\n\n")
+        size += len(pages[-1])
+    return "".join(pages)
+
+
+def strip_metadata(text: str) -> str:
+    """Removes everything the metadata patterns would find."""
+    for pattern in metadata._DOCUMENT_TYPE_PATTERNS + metadata._DATE_PATTERNS + metadata._DEPARTMENT_PATTERNS:
+        text = pattern.sub("", text)
+    return text
+
+
+def measure(func: Callable[[], Any], megabytes: float, repeat: int) -> Dict[str, float]:
+    """Best of `repeat` runs, as seconds and MB/s."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return {
+        "seconds": round(best, 4),
+        "mb_per_sec": round(megabytes / best, 2) if best else 0.0,
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    with open(args.sample, "r", encoding="utf-8") as f:
+        sample = f.read()
+
+    raw_text = build_text(sample, args.size_mb)
+    cleaned_text = TextCleaner.clean(raw_text)
+    no_metadata_text = TextCleaner.clean(build_text(strip_metadata(sample), args.size_mb))
+    megabytes = len(raw_text.encode("utf-8")) / (1024 * 1024)
+    chunker = SemanticChunker()
+
+    return {
+        "size_mb": round(megabytes, 2),
+        "clean": measure(lambda: TextCleaner.clean(raw_text), megabytes, args.repeat),
+        "metadata_header": measure(lambda: MetadataExtractor.extract(cleaned_text), megabytes, args.repeat),
+        "metadata_full_scan": measure(lambda: MetadataExtractor.extract(no_metadata_text), megabytes, args.repeat),
+        "langdetect": measure(lambda: TextCleaner.detect_language(cleaned_text), megabytes, args.repeat),
+        "chunk": measure(lambda: chunker.chunk(cleaned_text), megabytes, args.repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of the text processing stages.")
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE_PATH, help="Document repeated to build the benchmark text")
+    parser.add_argument("--size-mb", type=float, default=4, help="Size of the benchmark text")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (the best one is kept)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
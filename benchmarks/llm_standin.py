@@ -0,0 +1,136 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions server, to load test
+the whole UniHelp stack offline and reproducibly (no API key, no credit, no
+network). It answers `POST /v1/chat/completions`, streamed or not, with a canned
+French answer after a configurable latency and at a configurable token rate,
+and can inject errors (HTTP 429/500) at a given rate.
+
+Usage:
+    python benchmarks/llm_standin.py --port 8088 --latency-ms 300 --tokens-per-sec 50 --error-rate 0.02
+    LLM_BASE_URL=http://127.0.0.1:8088/v1 uvicorn unihelp.api.main:app --workers 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Selon le règlement de l'université, la demande doit être déposée auprès du service "
+    "de la scolarité avant la date limite indiquée dans la circulaire, accompagnée des "
+    "pièces justificatives requises. Pour toute question, contactez le département concerné."
+).split()
+
+
+def build_app(latency_ms: float, jitter_ms: float, tokens_per_sec: float, answer_tokens: int, error_rate: float, seed: int) -> FastAPI:
+    app = FastAPI(title="UniHelp LLM stand-in")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def answer_tokens_list():
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(answer_tokens)]
+
+    def chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "unihelp"}]}
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "standin")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        stats["requests"] += 1
+
+        # Draws are made in request order, so a run with the same seed fails the same requests
+        fail = rng.random() < error_rate
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if fail:
+            stats["errors"] += 1
+            await asyncio.sleep(delay)
+            status = 429 if rng.random() < 0.5 else 500
+            return JSONResponse(status_code=status, content={"error": {"message": "Injected stand-in error", "type": "standin_error", "code": status}})
+
+        tokens = answer_tokens_list()
+        token_delay = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+        if body.get("stream"):
+            async def events():
+                try:
+                    await asyncio.sleep(delay)
+                    yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                    for token in tokens:
+                        yield chunk(completion_id, model, {"content": token})
+                        if token_delay:
+                            await asyncio.sleep(token_delay)
+                    yield chunk(completion_id, model, {}, finish_reason="stop")
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model, "choices": [], "usage": usage}
+                        yield f"data: {json.dumps(payload)}\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats["in_flight"] -= 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        try:
+            await asyncio.sleep(delay + token_delay * len(tokens))
+        finally:
+            stats["in_flight"] -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local OpenAI-compatible chat completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--tokens-per-sec", type=float, default=50, help="Generation rate (0: all tokens at once)")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="Tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 429/500")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the latency jitter and error injection")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = build_app(args.latency_ms, args.jitter_ms, args.tokens_per_sec, args.answer_tokens, args.error_rate, args.seed)
+    print(f"LLM stand-in on http://{args.host}:{args.port}/v1", file=sys.stderr)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Load test of a running UniHelp API: `--concurrency` clients send the golden
+questions in a loop to /ask (or /ask/stream) until `--requests` have completed,
+and the report gives the throughput, latency percentiles (and time to first
+token when streaming), errors, and the server-side stage timings.
+
+To load test offline and reproducibly, serve the API against the local LLM
+stand-in, with the answer cache disabled so that every request reaches the LLM:
+    python benchmarks/llm_standin.py --latency-ms 300 --tokens-per-sec 50 &
+    LLM_BASE_URL=http://127.0.0.1:8088/v1 ANSWER_CACHE_SIZE=0 uvicorn unihelp.api.main:app --workers 2 &
+    python benchmarks/load_test.py --concurrency 32 --requests 500 --stream
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from run_benchmarks import DEFAULT_GOLDEN_PATH, percentiles
+
+
+async def _ask(client: httpx.AsyncClient, url: str, question: str, k: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    response = await client.post(f"{url}/ask", json={"question": question, "top_k": k})
+    sample = {"latency_ms": (time.perf_counter() - start) * 1000, "status": response.status_code}
+    if response.status_code == 200:
+        sample["timings"] = response.json().get("timings", {})
+    return sample
+
+
+async def _ask_stream(client: httpx.AsyncClient, url: str, question: str, k: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    sample = {}
+    event = None
+    async with client.stream("POST", f"{url}/ask/stream", json={"question": question, "top_k": k}) as response:
+        sample["status"] = response.status_code
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "token" and "ttft_ms" not in sample:
+                    sample["ttft_ms"] = (time.perf_counter() - start) * 1000
+                elif event == "done":
+                    sample["timings"] = json.loads(line[len("data:"):]).get("timings", {})
+                elif event == "error":
+                    sample["status"] = 500
+    sample["latency_ms"] = (time.perf_counter() - start) * 1000
+    return sample
+
+
+async def run_load(args, questions: List[str]) -> Dict[str, Any]:
+    send = _ask_stream if args.stream else _ask
+    samples: List[Dict[str, Any]] = []
+    counter = iter(range(args.requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        for i in counter:
+            try:
+                samples.append(await send(client, args.url, questions[i % len(questions)], args.k))
+            except httpx.HTTPError as e:
+                samples.append({"status": type(e).__name__, "latency_ms": None})
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        # Warm-up requests are not measured
+        for question in questions[:args.warmup]:
+            await send(client, args.url, question, args.k)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [s for s in samples if s["status"] == 200]
+    stage_samples: Dict[str, List[float]] = {}
+    for sample in ok:
+        for stage, ms in sample.get("timings", {}).items():
+            stage_samples.setdefault(stage, []).append(ms)
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if sample["status"] != 200:
+            errors[str(sample["status"])] = errors.get(str(sample["status"]), 0) + 1
+
+    report = {
+        "endpoint": "/ask/stream" if args.stream else "/ask",
+        "concurrency": args.concurrency,
+        "requests": len(samples),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "latency_ms": percentiles([s["latency_ms"] for s in ok]),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stage_samples.items())},
+    }
+    if args.stream:
+        report["ttft_ms"] = percentiles([s["ttft_ms"] for s in ok if "ttft_ms" in s])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /ask endpoints of a running UniHelp API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the API")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_PATH, help="Questions to send (golden question set)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests in total")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests sent first")
+    parser.add_argument("--k", type=int, default=4, help="Number of retrieved chunks")
+    parser.add_argument("--stream", action="store_true", help="Use /ask/stream and measure the time to first token")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request (seconds)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with open(args.golden, "r", encoding="utf-8") as f:
+        questions = [q["question"] for q in json.load(f)["questions"]]
+
+    report = json.dumps(asyncio.run(run_load(args, questions)), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Benchmark suite for UniHelp, run against the sample corpus of `generate_samples.py`.
+
+Measures ingestion throughput, retrieval latency and quality (recall@k, MRR) on
+the golden question set, and end-to-end /ask latency with a local fake LLM so
+that no API key or network access is needed. Everything runs in a scratch
+directory: the real ChromaDB, manifest and caches are never touched.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json   # compare with a previous run
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_GOLDEN_PATH = os.path.join(ROOT, "benchmarks", "golden_questions.json")
+
+FAKE_ANSWER = "Réponse de référence du benchmark."
+
+# Metrics shown by --baseline, with the direction that counts as an improvement
+COMPARED_METRICS = [
+    ("ingestion.files_per_sec", "higher"),
+    ("ingestion.chunks_per_sec", "higher"),
+    ("retrieval.latency_ms.p50", "lower"),
+    ("retrieval.latency_ms.p95", "lower"),
+    ("retrieval.recall_at_k", "higher"),
+    ("retrieval.mrr", "higher"),
+    ("ask.latency_ms.p50", "lower"),
+    ("ask.latency_ms.p95", "lower"),
+    ("ask.cached_latency_ms.p50", "lower"),
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank percentiles of latency samples, in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 2),
+        "p50": round(rank(50), 2),
+        "p90": round(rank(90), 2),
+        "p95": round(rank(95), 2),
+        "p99": round(rank(99), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def prepare_workdir(workdir: str, raw_dir: str) -> str:
+    """Points every persistent path of the settings into `workdir` and copies the corpus there.
+    Must run before `unihelp` is imported, since the settings are read at import time."""
+    os.environ.update(
+        CHROMA_PERSIST_DIR=os.path.join(workdir, "chroma_db"),
+        INGEST_MANIFEST_PATH=os.path.join(workdir, "ingest_manifest.json"),
+        EMBEDDING_CACHE_PATH=os.path.join(workdir, "embedding_cache.sqlite3"),
+        BM25_INDEX_PATH=os.path.join(workdir, "bm25_index.json"),
+        QUANTIZED_INDEX_DIR=os.path.join(workdir, "quantized_index"),
+    )
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    corpus_dir = os.path.join(workdir, "raw")
+    if os.path.isdir(raw_dir) and os.listdir(raw_dir):
+        shutil.copytree(raw_dir, corpus_dir)
+    else:
+        import generate_samples
+        generate_samples.DATA_DIR = corpus_dir
+        generate_samples.main()
+    return corpus_dir
+
+
+def use_fake_llm():
+    """Replaces the OpenAI chat model with a canned local one."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    import unihelp.rag.engine
+    import unihelp.tools.email_gen
+
+    def build_fake_llm(temperature: float = 0.0, max_retries: int = None):
+        return FakeListChatModel(responses=[FAKE_ANSWER])
+
+    unihelp.rag.engine.build_chat_llm = build_fake_llm
+    unihelp.tools.email_gen.build_chat_llm = build_fake_llm
+
+
+def bench_ingestion(corpus_dir: str, workers: int, batch_size: int) -> Dict[str, Any]:
+    from unihelp.rag.ingestion import ingest_data
+
+    stats = ingest_data(corpus_dir, workers=workers, full=True, batch_size=batch_size)
+    if stats is None:
+        raise RuntimeError("Ingestion failed, see the logs above")
+    return {
+        "workers": workers,
+        "files": stats["files_ingested"],
+        "files_failed": stats["files_failed"],
+        "chunks": stats["chunks"],
+        "seconds": stats["seconds"],
+        "files_per_sec": stats["files_per_sec"],
+        "chunks_per_sec": round(stats["chunks"] / stats["seconds"], 2) if stats["seconds"] else 0.0,
+        "embedding_chunks_per_sec": stats["chunks_per_sec"],
+        "embed_seconds": stats["embed_seconds"],
+        "write_seconds": stats["write_seconds"],
+        "truncated_chunks": stats["truncated_chunks"],
+        "truncated_tokens": stats["truncated_tokens"],
+    }
+
+
+def _score(retrieved_sources: List[str], expected: List[str]) -> Dict[str, float]:
+    """recall@k and reciprocal rank of one result list (ranked by chunk, deduplicated by file)."""
+    ranked_files = list(dict.fromkeys(retrieved_sources))
+    found = set(ranked_files) & set(expected)
+    reciprocal_rank = 0.0
+    for rank, source in enumerate(ranked_files, start=1):
+        if source in expected:
+            reciprocal_rank = 1.0 / rank
+            break
+    return {"recall": len(found) / len(expected), "reciprocal_rank": reciprocal_rank}
+
+
+def bench_retrieval(vector_store, questions: List[Dict[str, Any]], k: int, repeat: int) -> Dict[str, Any]:
+    latencies = []
+    per_question = []
+    for item in questions:
+        docs = []
+        for _ in range(repeat):
+            # Measure the full path, query embedding included
+            vector_store.query_cache.clear()
+            start = time.perf_counter()
+            docs = vector_store.similarity_search(item["question"], k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        sources = [doc["metadata"].get("source", "unknown") for doc in docs]
+        per_question.append({
+            "id": item["id"],
+            "language": item["language"],
+            "retrieved": list(dict.fromkeys(sources)),
+            **_score(sources, item["expected_sources"]),
+        })
+
+    by_language = {}
+    for language in sorted({q["language"] for q in per_question}):
+        subset = [q for q in per_question if q["language"] == language]
+        by_language[language] = {
+            "questions": len(subset),
+            "recall_at_k": round(statistics.fmean(q["recall"] for q in subset), 4),
+            "mrr": round(statistics.fmean(q["reciprocal_rank"] for q in subset), 4),
+        }
+
+    return {
+        "k": k,
+        "latency_ms": percentiles(latencies),
+        "recall_at_k": round(statistics.fmean(q["recall"] for q in per_question), 4),
+        "mrr": round(statistics.fmean(q["reciprocal_rank"] for q in per_question), 4),
+        "by_language": by_language,
+        "questions": per_question,
+    }
+
+
+def bench_ask(questions: List[Dict[str, Any]], k: int, repeat: int) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from unihelp.api.main import app
+    from unihelp.api.dependencies import get_rag_engine
+
+    latencies = []
+    cached_latencies = []
+    stage_samples: Dict[str, List[float]] = {}
+    errors = 0
+
+    with TestClient(app) as client:
+        engine = get_rag_engine()
+        for item in questions:
+            for _ in range(repeat):
+                # Cold path: no answer cache, no cached query embedding
+                engine.answer_cache.clear()
+                engine.vector_store.query_cache.clear()
+                start = time.perf_counter()
+                response = client.post("/ask", json={"question": item["question"], "top_k": k})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                for stage, ms in response.json().get("timings", {}).items():
+                    stage_samples.setdefault(stage, []).append(ms)
+
+            # Same question again: served by the semantic answer cache
+            start = time.perf_counter()
+            response = client.post("/ask", json={"question": item["question"], "top_k": k})
+            cached_latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    return {
+        "llm": "fake",
+        "errors": errors,
+        "latency_ms": percentiles(latencies),
+        "cached_latency_ms": percentiles(cached_latencies),
+        "stages_ms": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _lookup(results: Dict[str, Any], path: str):
+    value = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per metric: baseline -> current value, flagged when it got worse."""
+    lines = [f"Comparison with baseline {baseline.get('commit', '?')} ({baseline.get('timestamp', '?')}):"]
+    for path, better in COMPARED_METRICS:
+        old, new = _lookup(baseline, path), _lookup(results, path)
+        if old is None or new is None:
+            continue
+        delta = ((new - old) / old * 100) if old else 0.0
+        worse = (new < old) if better == "higher" else (new > old)
+        flag = "  REGRESSION" if worse and abs(delta) >= 5 else ""
+        lines.append(f"  {path:<28} {old:>10} -> {new:>10} ({delta:+.1f}%){flag}")
+    return lines
+
+
+def run(args) -> Dict[str, Any]:
+    with open(args.golden, "r", encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+    if args.languages:
+        questions = [q for q in questions if q["language"] in args.languages]
+
+    workdir = tempfile.mkdtemp(prefix="unihelp-bench-")
+    try:
+        corpus_dir = prepare_workdir(workdir, args.raw_dir)
+        use_fake_llm()
+
+        from unihelp.core.config import settings
+        from unihelp.api.dependencies import get_vector_store
+
+        results: Dict[str, Any] = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "embedding_model": settings.EMBEDDING_MODEL_NAME,
+                "hybrid_search": settings.HYBRID_SEARCH_ENABLED,
+                "reranker": settings.RERANKER_ENABLED,
+                "context_max_tokens": settings.CONTEXT_MAX_TOKENS,
+            },
+            "questions": len(questions),
+        }
+
+        results["ingestion"] = bench_ingestion(corpus_dir, args.workers, args.batch_size)
+        results["retrieval"] = bench_retrieval(get_vector_store(), questions, args.k, args.repeat)
+        if not args.skip_ask:
+            results["ask"] = bench_ask(questions, args.k, args.repeat)
+        return results
+    finally:
+        if args.keep_workdir:
+            print(f"Benchmark data kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and /ask on the sample corpus.")
+    parser.add_argument("--raw-dir", default=os.path.join(ROOT, "data", "raw"), help="Corpus to ingest (generated when missing)")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_PATH, help="Golden question set (JSON)")
+    parser.add_argument("--languages", nargs="*", help="Only use the golden questions in these languages")
+    parser.add_argument("--k", type=int, default=4, help="Number of retrieved chunks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per question")
+    parser.add_argument("--workers", type=int, default=1, help="Ingestion worker processes")
+    parser.add_argument("--batch-size", type=int, default=None, help="Ingestion embedding batch size")
+    parser.add_argument("--skip-ask", action="store_true", help="Skip the end-to-end /ask benchmark")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON results to compare with")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the scratch ChromaDB and caches")
+    args = parser.parse_args()
+
+    # The pipeline prints progress on stdout, which is reserved for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(results, baseline)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
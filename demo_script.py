@@ -12,18 +12,25 @@ def main():
     import sys
     api_process = subprocess.Popen([sys.executable, "-m", "uvicorn", "unihelp.api.main:app", "--host", "0.0.0.0", "--port", "8000"])
     
-    # 2. Wait a moment for API to initialize
+    # 2. Wait for the API to load its models (the /ready probe answers 503 until then)
     print("Waiting for API to initialize...")
-    time.sleep(5) # give it a bit more time to spin up
+    status = None
+    for _ in range(120):
+        time.sleep(1)
+        try:
+            res = requests.get("http://127.0.0.1:8000/ready")
+            status = res.status_code
+            if status == 200 or res.json().get("status") == "error":
+                break
+        except requests.exceptions.ConnectionError:
+            continue
     
-    try:
-        res = requests.get("http://127.0.0.1:8000/")
-        if res.status_code == 200:
-            print("API is up and running!")
-        else:
-            print(f"API returned status {res.status_code}")
-    except requests.exceptions.ConnectionError:
+    if status == 200:
+        print("API is up and running!")
+    elif status is None:
         print("Warning: API doesn't seem to be responding on port 8000")
+    else:
+        print(f"API returned status {status}")
         
     print("\nStarting Streamlit UI...")
     # 3. Use subprocess to run streamlit
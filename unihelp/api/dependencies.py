@@ -0,0 +1,126 @@
+import asyncio
+import secrets
+import threading
+from typing import Optional
+from fastapi import Header, HTTPException
+from unihelp.rag.engine import RAGEngine
+from unihelp.rag.jobs import IngestionJobQueue
+from unihelp.rag.vector_store import VectorStore
+from unihelp.tools.email_gen import EmailGenerator
+from unihelp.core.config import settings
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# One engine graph per process: the RAG engine and the /documents stats share the
+# same VectorStore (and so the same embedding model). The lock guarantees that
+# concurrent first requests never build a second copy.
+_lock = threading.RLock()
+_vector_store = None
+_rag_engine = None
+_email_generator = None
+_job_queue = None
+
+_ready = False
+_warmup_error = None
+
+
+def get_vector_store() -> VectorStore:
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
+
+
+def get_rag_engine() -> RAGEngine:
+    global _rag_engine
+    if _rag_engine is None:
+        with _lock:
+            if _rag_engine is None:
+                _rag_engine = RAGEngine(vector_store=get_vector_store())
+    return _rag_engine
+
+
+def get_email_generator() -> EmailGenerator:
+    global _email_generator
+    if _email_generator is None:
+        with _lock:
+            if _email_generator is None:
+                # Rule contexts are retrieved through the shared RAG engine
+                _email_generator = EmailGenerator(rag_engine=get_rag_engine())
+    return _email_generator
+
+
+def get_job_queue() -> IngestionJobQueue:
+    global _job_queue
+    if _job_queue is None:
+        with _lock:
+            if _job_queue is None:
+                # Ingestion jobs write through the store (and embedding model) the API already holds
+                _job_queue = IngestionJobQueue(get_vector_store(), settings.RAW_DATA_DIR, workers=settings.INGEST_WORKERS)
+    return _job_queue
+
+
+def require_admin(authorization: Optional[str] = Header(None), x_admin_token: Optional[str] = Header(None)):
+    """Guards the endpoints that change the knowledge base (uploads, ingestion jobs): they
+    need ADMIN_API_TOKEN, and are disabled while it is not set."""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Document administration is disabled (ADMIN_API_TOKEN is not set)")
+    token = x_admin_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):].strip()
+    if not token or not secrets.compare_digest(token.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+async def aget_rag_engine() -> RAGEngine:
+    """Async handlers must not block the event loop while another thread is building the engine."""
+    if _rag_engine is not None:
+        return _rag_engine
+    return await asyncio.to_thread(get_rag_engine)
+
+
+async def aget_email_generator() -> EmailGenerator:
+    if _email_generator is not None:
+        return _email_generator
+    return await asyncio.to_thread(get_email_generator)
+
+
+async def aget_vector_store() -> VectorStore:
+    if _vector_store is not None:
+        return _vector_store
+    return await asyncio.to_thread(get_vector_store)
+
+
+async def aget_job_queue() -> IngestionJobQueue:
+    if _job_queue is not None:
+        return _job_queue
+    return await asyncio.to_thread(get_job_queue)
+
+
+def warm_up():
+    """Builds every engine and runs one query embedding so the model weights are loaded
+    before traffic arrives. Called from the API startup lifespan."""
+    global _ready, _warmup_error
+    try:
+        logger.info("Warming up UniHelp engines...")
+        engine = get_rag_engine()
+        email_generator = get_email_generator()
+        engine.vector_store.embed_query("warm up")
+        email_generator.precompute_contexts()
+        engine.vector_store.get_collection_stats()
+        _ready = True
+        logger.info("UniHelp engines are warm and ready.")
+    except Exception as e:
+        _warmup_error = str(e)
+        logger.error(f"Engine warm-up failed: {e}")
+
+
+def readiness() -> dict:
+    if _ready:
+        return {"status": "ready"}
+    if _warmup_error:
+        return {"status": "error", "detail": _warmup_error}
+    return {"status": "warming_up"}
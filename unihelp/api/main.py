@@ -1,14 +1,31 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from unihelp.core.logging import setup_logger
+from unihelp.core.llm import aclose_http_clients
+from unihelp.core.logging import request_id_var, setup_logger
+from unihelp.core.metrics import observe_request
+from .dependencies import warm_up
 from .routes import router
 
 logger = setup_logger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting UniHelp API...")
+    # Load the embedding model and ChromaDB in the background; /ready answers 503 until done
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    await warmup_task
+    await aclose_http_clients()
+
 app = FastAPI(
     title="UniHelp API",
     description="University Administrative Assistant API for IIT/NAU Tunisia",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for Streamlit
@@ -20,11 +37,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(router)
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tags the log lines of a request with its ID (the client's X-Request-ID, or a
+    new one) and records its duration per route."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        observe_request(request.method, route_path, status, elapsed)
+        logger.info(
+            f"{request.method} {request.url.path} -> {status} in {elapsed * 1000:.1f}ms",
+            extra={"fields": {"method": request.method, "route": route_path, "status": status, "duration_ms": round(elapsed * 1000, 2)}}
+        )
+        request_id_var.reset(token)
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting UniHelp API...")
+app.include_router(router)
 
 @app.get("/")
 def read_root():
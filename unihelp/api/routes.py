@@ -1,50 +1,127 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+import asyncio
+import io
+import json
+import os
+import zipfile
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, File, Form, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Dict, Any, Optional
-from unihelp.rag.engine import RAGEngine
-from unihelp.tools.email_gen import EmailGenerator
-from unihelp.rag.vector_store import VectorStore
+from unihelp.core.config import settings
 from unihelp.core.logging import setup_logger
+from unihelp.core.metrics import render_metrics
+from unihelp.processor.extractors import SUPPORTED_EXTENSIONS
+from unihelp.rag.conversations import new_session_id
+from unihelp.rag.filters import FILTERABLE_FIELDS
+from unihelp.tools.student_records import StudentRecord, format_student_record, parse_student_records
+from .dependencies import aget_email_generator, aget_job_queue, aget_rag_engine, aget_vector_store, get_email_generator, readiness, require_admin
 
 logger = setup_logger(__name__)
 router = APIRouter()
 
-# Initialize engines lazily or at startup
-rag_engine = None
-email_generator = None
-vector_store = None
-
-def get_rag_engine():
-    global rag_engine
-    if rag_engine is None:
-        rag_engine = RAGEngine()
-    return rag_engine
-
-def get_email_generator():
-    global email_generator
-    if email_generator is None:
-        email_generator = EmailGenerator()
-    return email_generator
-
-def get_vector_store():
-    global vector_store
-    if vector_store is None:
-        vector_store = VectorStore()
-    return vector_store
+def check_filter_fields(filters):
+    unknown = set(filters or {}) - set(FILTERABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unsupported filter fields: {sorted(unknown)}. Allowed: {list(FILTERABLE_FIELDS)}")
+    return filters
 
 class AskRequest(BaseModel):
     question: str
     top_k: int = 4
+    # Optional metadata filters, e.g. {"department": "Département des Stages", "language": "fr"}
+    filters: Optional[Dict[str, Any]] = None
+
+    _check_filters = field_validator("filters")(check_filter_fields)
+
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    top_k: int = 4
+    # Applied to every question
+    filters: Optional[Dict[str, Any]] = None
+
+    _check_filters = field_validator("filters")(check_filter_fields)
+
+    @field_validator("questions")
+    @classmethod
+    def check_batch_size(cls, questions):
+        if not questions:
+            raise ValueError("At least one question is required")
+        if len(questions) > settings.ASK_BATCH_MAX_QUESTIONS:
+            raise ValueError(f"At most {settings.ASK_BATCH_MAX_QUESTIONS} questions per batch")
+        return questions
 
 class AskResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
+    # Per-stage durations in milliseconds (embed, retrieve, rerank, format, generate...)
+    timings: Dict[str, float] = {}
+
+class AskBatchItem(BaseModel):
+    index: int
+    question: str
+    answer: Optional[str] = None
+    sources: List[Dict[str, Any]] = []
+    timings: Dict[str, float] = {}
+    # Set instead of the answer when generation failed for this question
+    error: Optional[str] = None
+
+class AskBatchResponse(BaseModel):
+    results: List[AskBatchItem]
+    # Stages run once for the whole batch (embed, retrieve)
+    timings: Dict[str, float] = {}
+
+class ChatRequest(BaseModel):
+    # Omit to start a new conversation; the response carries the ID to send with the follow-ups
+    session_id: Optional[str] = None
+    question: str
+    top_k: int = 4
+    filters: Optional[Dict[str, Any]] = None
+
+    _check_filters = field_validator("filters")(check_filter_fields)
+
+class ChatResponse(BaseModel):
+    session_id: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    # The follow-up rewritten with the conversation history, as used for retrieval
+    standalone_question: str
+    timings: Dict[str, float] = {}
 
 class EmailRequest(BaseModel):
     template_type: str
     student_info: str
     include_rag_context: bool = False
 
+EMAIL_BATCH_FORMATS = ("ndjson", "zip")
+
+class EmailBatchRequest(BaseModel):
+    template_type: str
+    # One per student: a description, or fields such as {"nom": ..., "matricule": ...}
+    students: List[StudentRecord]
+    include_rag_context: bool = False
+    # "ndjson" streams the emails as they are generated, "zip" returns one file per student
+    output_format: str = "ndjson"
+
+    @field_validator("students")
+    @classmethod
+    def check_batch_size(cls, students):
+        if not students:
+            raise ValueError("At least one student is required")
+        if len(students) > settings.EMAIL_BATCH_MAX_STUDENTS:
+            raise ValueError(f"At most {settings.EMAIL_BATCH_MAX_STUDENTS} students per batch")
+        return students
+
+    @field_validator("output_format")
+    @classmethod
+    def check_output_format(cls, output_format):
+        if output_format not in EMAIL_BATCH_FORMATS:
+            raise ValueError(f"output_format must be one of {list(EMAIL_BATCH_FORMATS)}")
+        return output_format
+
+class IngestRequest(BaseModel):
+    # Re-ingest every document instead of only the new and changed ones
+    full: bool = False
+
 class FeedbackRequest(BaseModel):
     query: str
     response: str
@@ -52,34 +129,164 @@ class FeedbackRequest(BaseModel):
     comments: Optional[str] = None
 
 @router.post("/ask", response_model=AskResponse)
-def ask_question(request: AskRequest):
+async def ask_question(request: AskRequest):
     try:
-        engine = get_rag_engine()
-        result = engine.answer(request.question, k=request.top_k)
-        return AskResponse(answer=result["answer"], sources=result["sources"])
+        engine = await aget_rag_engine()
+        result = await engine.aanswer(request.question, k=request.top_k, filters=request.filters)
+        return AskResponse(answer=result["answer"], sources=result["sources"], timings=result.get("timings", {}))
     except Exception as e:
         logger.error(f"Error in /ask: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    """Server-sent events: one `sources` event, then `token` events, then `done` (or `error`)."""
+    engine = await aget_rag_engine()
+
+    async def event_stream():
+        timings = {}
+        try:
+            async for event in engine.astream_answer(request.question, k=request.top_k, filters=request.filters):
+                if event["type"] == "sources":
+                    yield _sse("sources", {"sources": event["sources"]})
+                elif event["type"] == "token":
+                    yield _sse("token", {"content": event["content"]})
+                elif event["type"] == "timings":
+                    timings = event["timings"]
+            yield _sse("done", {"timings": timings})
+        except Exception as e:
+            logger.error(f"Error in /ask/stream: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """One turn of a conversation kept server-side under `session_id`."""
+    try:
+        engine = await aget_rag_engine()
+        session_id = request.session_id or new_session_id()
+        result = await engine.achat(session_id, request.question, k=request.top_k, filters=request.filters)
+        return ChatResponse(
+            session_id=session_id,
+            answer=result["answer"],
+            sources=result["sources"],
+            standalone_question=result["standalone_question"],
+            timings=result.get("timings", {})
+        )
+    except Exception as e:
+        logger.error(f"Error in /chat: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-sent events of `/ask/stream`, preceded by a `session` event with the
+    `session_id` and the `standalone_question`."""
+    engine = await aget_rag_engine()
+    session_id = request.session_id or new_session_id()
+
+    async def event_stream():
+        timings = {}
+        try:
+            async for event in engine.astream_chat(session_id, request.question, k=request.top_k, filters=request.filters):
+                if event["type"] == "question":
+                    yield _sse("session", {"session_id": session_id, "standalone_question": event["standalone_question"]})
+                elif event["type"] == "sources":
+                    yield _sse("sources", {"sources": event["sources"]})
+                elif event["type"] == "token":
+                    yield _sse("token", {"content": event["content"]})
+                elif event["type"] == "timings":
+                    timings = event["timings"]
+            yield _sse("done", {"timings": timings})
+        except Exception as e:
+            logger.error(f"Error in /chat/stream: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/{session_id}")
+async def get_conversation(session_id: str):
+    """The summary of the older turns and the recent turns of a conversation."""
+    engine = await aget_rag_engine()
+    conversation = await engine.aget_conversation(session_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return {"session_id": session_id, **conversation}
+
+@router.delete("/chat/{session_id}")
+async def delete_conversation(session_id: str):
+    engine = await aget_rag_engine()
+    await engine.adelete_conversation(session_id)
+    return {"status": "deleted"}
+
+def _batch_item(index: int, question: str, result: Dict[str, Any]) -> AskBatchItem:
+    return AskBatchItem(
+        index=index,
+        question=question,
+        answer=result.get("answer"),
+        sources=result.get("sources", []),
+        timings=result.get("timings", {}),
+        error=result.get("error")
+    )
+
+@router.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_batch(request: AskBatchRequest):
+    """Answers many questions at once (e.g. to pre-generate an FAQ), results in input order."""
+    try:
+        engine = await aget_rag_engine()
+        batch = await engine.aanswer_many(request.questions, k=request.top_k, filters=request.filters)
+        return AskBatchResponse(
+            results=[_batch_item(i, question, result) for i, (question, result) in enumerate(zip(request.questions, batch["results"]))],
+            timings=batch["timings"]
+        )
+    except Exception as e:
+        logger.error(f"Error in /ask/batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ask/batch/stream")
+async def ask_batch_stream(request: AskBatchRequest):
+    """NDJSON: one line per question as soon as it is answered (completion order,
+    with its `index` in the request), then a final {"done": true, "timings"} line."""
+    engine = await aget_rag_engine()
+
+    async def lines():
+        timings = {}
+        try:
+            async for i, result in engine.astream_answer_many(request.questions, k=request.top_k, filters=request.filters, batch_timings=timings):
+                yield _batch_item(i, request.questions[i], result).model_dump_json() + "\n"
+            yield json.dumps({"done": True, "timings": timings}) + "\n"
+        except Exception as e:
+            logger.error(f"Error in /ask/batch/stream: {e}")
+            yield json.dumps({"done": False, "error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
 @router.get("/templates")
 def list_email_templates():
     gen = get_email_generator()
     return {"templates": gen.get_supported_templates()}
 
 @router.post("/generate-email")
-def generate_email(request: EmailRequest):
+async def generate_email(request: EmailRequest):
     try:
-        gen = get_email_generator()
-        context = ""
-        
-        # Optionally inject context from university rules for the specific request
-        if request.include_rag_context:
-            engine = get_rag_engine()
-            # Simple retrieval for context
-            docs = engine.vector_store.similarity_search(request.template_type, k=3)
-            context, _ = engine._format_docs(docs)
-            
-        email_content = gen.generate(request.template_type, request.student_info, context)
+        gen = await aget_email_generator()
+        # The university rules of the template are retrieved once and reused
+        email_content = await gen.agenerate(
+            request.template_type,
+            request.student_info,
+            include_rag_context=request.include_rag_context
+        )
         return {"email": email_content}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
@@ -87,11 +294,74 @@ def generate_email(request: EmailRequest):
         logger.error(f"Error in /generate-email: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _email_batch_response(template_type: str, students: List[str], include_rag_context: bool, output_format: str):
+    gen = await aget_email_generator()
+    if template_type not in gen.templates:
+        raise HTTPException(status_code=400, detail=f"Template type '{template_type}' is not supported.")
+    timings = {}
+    results = gen.astream_generate_many(template_type, students, include_rag_context, batch_timings=timings)
+
+    if output_format == "zip":
+        # One text file per student, named after its position in the input, and errors.json
+        buffer = io.BytesIO()
+        errors = []
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            async for i, result in results:
+                if "email" in result:
+                    archive.writestr(f"email_{i + 1:04d}.txt", result["email"])
+                else:
+                    errors.append({"index": i, "student_info": students[i], "error": result["error"]})
+            if errors:
+                archive.writestr("errors.json", json.dumps(sorted(errors, key=lambda e: e["index"]), ensure_ascii=False, indent=2))
+        return Response(
+            content=buffer.getvalue(),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="emails_{template_type}.zip"'}
+        )
+
+    async def lines():
+        try:
+            async for i, result in results:
+                yield json.dumps({"index": i, "student_info": students[i], **result}, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "timings": timings}) + "\n"
+        except Exception as e:
+            logger.error(f"Error in /generate-email/batch: {e}")
+            yield json.dumps({"done": False, "error": str(e)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@router.post("/generate-email/batch")
+async def generate_email_batch(request: EmailBatchRequest):
+    """
+    Emails of one template for many students (e.g. reinscription reminders for a
+    cohort). As NDJSON: one {"index", "student_info", "email" or "error"} line per
+    student in completion order, then {"done": true, "timings"}. As a ZIP:
+    email_0001.txt... in input order, and errors.json for the failed ones.
+    """
+    students = [format_student_record(student) for student in request.students]
+    return await _email_batch_response(request.template_type, students, request.include_rag_context, request.output_format)
+
+@router.post("/generate-email/batch/upload")
+async def generate_email_batch_upload(
+    file: UploadFile = File(...),
+    template_type: str = Form(...),
+    include_rag_context: bool = Form(False),
+    output_format: str = Form("ndjson")
+):
+    """`/generate-email/batch` for a CSV, XLSX or JSON list of students (one row per
+    student, the first row naming the columns)."""
+    try:
+        students = parse_student_records(file.filename, await file.read())
+        EmailBatchRequest(template_type=template_type, students=students, output_format=output_format)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _email_batch_response(template_type, students, include_rag_context, output_format)
+
 @router.get("/documents")
-def list_documents():
+async def list_documents():
     """Returns basic stats about the loaded documents."""
     try:
-        vs = get_vector_store()
+        vs = await aget_vector_store()
         stats = vs.get_collection_stats()
         return {
             "status": "ready",
@@ -100,6 +370,78 @@ def list_documents():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _save_upload(upload: UploadFile, path: str):
+    """Streams an upload to `path`. The file only appears under its name once complete,
+    so a running ingestion never reads half of it."""
+    tmp_path = f"{path}.part"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while block := upload.file.read(1 << 20):
+                size += len(block)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise ValueError(f"{upload.filename} is larger than {settings.UPLOAD_MAX_BYTES} bytes")
+                f.write(block)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+@router.post("/documents/upload", status_code=202, dependencies=[Depends(require_admin)])
+async def upload_documents(files: List[UploadFile] = File(...), ingest: bool = Form(True)):
+    """Adds documents to the raw data directory (replacing files with the same name)
+    and, unless `ingest` is false, queues an ingestion job for them."""
+    names = [os.path.basename(upload.filename or "") for upload in files]
+    for name in names:
+        if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported file '{name}'. Supported: {sorted(SUPPORTED_EXTENSIONS)}")
+
+    os.makedirs(settings.RAW_DATA_DIR, exist_ok=True)
+    for upload, name in zip(files, names):
+        try:
+            await asyncio.to_thread(_save_upload, upload, os.path.join(settings.RAW_DATA_DIR, name))
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    job = None
+    if ingest:
+        job_queue = await aget_job_queue()
+        job = job_queue.submit(files=names)
+    return {"files": names, "job": job}
+
+@router.post("/ingest", status_code=202, dependencies=[Depends(require_admin)])
+async def ingest(request: IngestRequest = IngestRequest()):
+    """Queues an ingestion of the raw data directory; follow it with `/jobs/{id}`."""
+    job_queue = await aget_job_queue()
+    return job_queue.submit(full=request.full)
+
+@router.get("/jobs", dependencies=[Depends(require_admin)])
+async def list_jobs():
+    job_queue = await aget_job_queue()
+    return {"jobs": job_queue.list_jobs()}
+
+@router.get("/jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def get_job(job_id: str):
+    """Status and progress of an ingestion job: files done/failed of files_total,
+    chunks written and chunks/sec, per-file errors, and the run statistics once finished."""
+    job_queue = await aget_job_queue()
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@router.get("/ready")
+def ready():
+    """Readiness probe: 200 once the engines are built and the embedding model is warm."""
+    status = readiness()
+    return JSONResponse(status_code=200 if status["status"] == "ready" else 503, content=status)
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-stage and per-route latency histograms."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @router.post("/feedback")
 def submit_feedback(request: FeedbackRequest):
     """Logs user feedback to a file or db for analytics."""
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from unihelp.api.main import app
+from unihelp.core.config import settings
+from unihelp.rag.engine import RAGEngine
+
+DOCS = [
+    {
+        "id": "calendrier.pdf_1a2b_chunk_0",
+        "page_content": "Les inscriptions ferment le 30 septembre.",
+        "metadata": {"source": "calendrier.pdf", "document_type": "Calendrier", "department": "Scolarité", "page": 1},
+    },
+    {
+        "id": "bourses.docx_3c4d_chunk_0",
+        "page_content": "Les bourses sont versées en octobre.",
+        "metadata": {"source": "bourses.docx", "document_type": "Note", "department": "Service des bourses"},
+    },
+]
+
+
+class EchoChatModel(BaseChatModel):
+    """
+    Offline chat model: answers "Réponse : <prompt>" (word by word when streamed),
+    rewrites follow-ups as "<question> (reformulée)", and fails on prompts
+    mentioning "panne".
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    @staticmethod
+    def _reply(messages) -> str:
+        prompt = messages[-1].content
+        if "panne" in prompt:
+            raise RuntimeError("LLM indisponible")
+        system = messages[0].content if len(messages) > 1 else ""
+        if system.startswith("Given a conversation"):
+            return f"{prompt} (reformulée)"
+        if system.startswith("Summarize"):
+            return "Résumé de la conversation."
+        return f"Réponse : {prompt}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, word in enumerate(self._reply(messages).split(" ")):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+
+
+class FakeVectorStore:
+    """The part of `VectorStore` that the engines use: every search returns `docs`."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def embed_query(self, query):
+        return [1.0, float(len(query))]
+
+    def embed_queries(self, queries):
+        return [self.embed_query(query) for query in queries]
+
+    def get_generation(self):
+        return 1
+
+    def similarity_search(self, query, k=5, embedding=None, where=None):
+        return self.docs[:k]
+
+    def similarity_search_many(self, queries, k, embeddings, wheres):
+        return [self.docs[:k] for _ in queries]
+
+    def get_collection_stats(self):
+        return {"count": len(self.docs)}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(settings, "RERANKER_ENABLED", False)
+    monkeypatch.setattr(settings, "AUTO_FILTERS_ENABLED", False)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "CONVERSATION_BACKEND", "memory")
+    monkeypatch.setattr("unihelp.rag.engine.build_chat_llm", lambda temperature, max_retries=None: EchoChatModel())
+    return RAGEngine(vector_store=FakeVectorStore(DOCS))
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    async def aget_rag_engine():
+        return engine
+
+    monkeypatch.setattr("unihelp.api.routes.aget_rag_engine", aget_rag_engine)
+    # Without the `with` block, the lifespan (engine warm-up) does not run
+    return TestClient(app)
+
@@ -0,0 +1,97 @@
+import pytest
+from unihelp.core.config import settings
+
+TOKEN = "s3cret-admin-token"
+
+
+class RecordingJobQueue:
+    """Stands in for `IngestionJobQueue`: records the submitted jobs."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def submit(self, full=False, files=None):
+        job = {"id": f"job{len(self.jobs) + 1}", "status": "queued", "full": full, "uploaded_files": files or []}
+        self.jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        return list(reversed(self.jobs.values()))
+
+
+@pytest.fixture
+def job_queue(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", TOKEN)
+    monkeypatch.setattr(settings, "RAW_DATA_DIR", str(tmp_path / "raw"))
+    job_queue = RecordingJobQueue()
+
+    async def aget_job_queue():
+        return job_queue
+
+    monkeypatch.setattr("unihelp.api.routes.aget_job_queue", aget_job_queue)
+    return job_queue
+
+
+def test_admin_endpoints_are_disabled_without_a_token(client, job_queue, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", "")
+    response = client.post("/ingest", headers={"Authorization": "Bearer "}, json={})
+    assert response.status_code == 403
+    assert job_queue.jobs == {}
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"X-Admin-Token": "wrong"}, {"Authorization": TOKEN}])
+def test_wrong_or_missing_tokens_are_rejected(client, job_queue, headers):
+    for method, path in [("post", "/ingest"), ("get", "/jobs"), ("get", "/jobs/job1"), ("post", "/documents/upload")]:
+        response = client.request(method, path, headers=headers)
+        assert response.status_code == 401, path
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert job_queue.jobs == {}
+
+
+@pytest.mark.parametrize("headers", [{"Authorization": f"Bearer {TOKEN}"}, {"X-Admin-Token": TOKEN}])
+def test_ingestion_jobs_with_a_valid_token(client, job_queue, headers):
+    job = client.post("/ingest", headers=headers, json={"full": True})
+    assert job.status_code == 202
+    assert job.json()["full"] is True
+
+    assert client.get(f"/jobs/{job.json()['id']}", headers=headers).json()["status"] == "queued"
+    assert [j["id"] for j in client.get("/jobs", headers=headers).json()["jobs"]] == [job.json()["id"]]
+    assert client.get("/jobs/unknown", headers=headers).status_code == 404
+
+
+def test_uploads_are_saved_then_ingested(client, job_queue, tmp_path):
+    headers = {"X-Admin-Token": TOKEN}
+    response = client.post(
+        "/documents/upload",
+        headers=headers,
+        files=[("files", ("../calendrier.txt", "Les inscriptions ferment le 30 septembre.".encode(), "text/plain"))]
+    )
+    assert response.status_code == 202
+    # Only the base name is kept: uploads never leave the raw directory
+    assert response.json()["files"] == ["calendrier.txt"]
+    assert (tmp_path / "raw" / "calendrier.txt").read_text(encoding="utf-8") == "Les inscriptions ferment le 30 septembre."
+    assert response.json()["job"]["uploaded_files"] == ["calendrier.txt"]
+
+    without_job = client.post(
+        "/documents/upload",
+        headers=headers,
+        files=[("files", ("bourses.txt", b"Bourses", "text/plain"))],
+        data={"ingest": "false"}
+    )
+    assert without_job.json()["job"] is None
+    assert len(job_queue.jobs) == 1
+
+
+def test_uploads_are_checked(client, job_queue, tmp_path, monkeypatch):
+    headers = {"X-Admin-Token": TOKEN}
+    unsupported = client.post("/documents/upload", headers=headers, files=[("files", ("script.sh", b"rm -rf /", "text/plain"))])
+    assert unsupported.status_code == 400
+
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 10)
+    too_large = client.post("/documents/upload", headers=headers, files=[("files", ("gros.txt", b"x" * 11, "text/plain"))])
+    assert too_large.status_code == 413
+    assert list((tmp_path / "raw").iterdir()) == []
+    assert job_queue.jobs == {}
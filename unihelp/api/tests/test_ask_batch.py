@@ -0,0 +1,43 @@
+import json
+from unihelp.core.config import settings
+
+QUESTIONS = [f"Question {i} sur les inscriptions ?" for i in range(12)]
+
+
+def test_batch_answers_in_input_order(client):
+    response = client.post("/ask/batch", json={"questions": QUESTIONS, "top_k": 1})
+    assert response.status_code == 200
+
+    body = response.json()
+    assert [item["index"] for item in body["results"]] == list(range(len(QUESTIONS)))
+    assert [item["answer"] for item in body["results"]] == [f"Réponse : {question}" for question in QUESTIONS]
+    assert all(item["sources"][0]["file"] == "calendrier.pdf" for item in body["results"])
+    # Embedding and retrieval run once for the whole batch
+    assert {"embed", "retrieve"} <= set(body["timings"])
+
+
+def test_a_failed_generation_only_fails_its_question(client):
+    questions = ["Première question ?", "Et en cas de panne ?", "Dernière question ?"]
+    results = client.post("/ask/batch", json={"questions": questions}).json()["results"]
+
+    assert results[1]["answer"] is None
+    assert results[1]["error"] == "LLM indisponible"
+    assert results[0]["answer"] == "Réponse : Première question ?"
+    assert results[2]["error"] is None
+
+
+def test_stream_yields_every_answer_then_done(client):
+    response = client.post("/ask/batch/stream", json={"questions": QUESTIONS})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["done"] is True
+    answers = {line["index"]: line["answer"] for line in lines[:-1]}
+    assert answers == {i: f"Réponse : {question}" for i, question in enumerate(QUESTIONS)}
+
+
+def test_batch_size_is_validated(client, monkeypatch):
+    monkeypatch.setattr(settings, "ASK_BATCH_MAX_QUESTIONS", 3)
+    assert client.post("/ask/batch", json={"questions": []}).status_code == 422
+    assert client.post("/ask/batch", json={"questions": QUESTIONS[:4]}).status_code == 422
+    assert client.post("/ask/batch", json={"questions": QUESTIONS[:3]}).status_code == 200
@@ -0,0 +1,49 @@
+import json
+
+
+def parse_sse(body):
+    """(event, data) pairs of a server-sent events body."""
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_sources_then_tokens_then_done(client):
+    response = client.post("/ask/stream", json={"question": "Quand ferment les inscriptions ?", "top_k": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+
+    sources = events[0][1]["sources"]
+    assert [source["file"] for source in sources] == ["calendrier.pdf", "bourses.docx"]
+    assert sources[0]["page"] == 1
+    answer = "".join(data["content"] for name, data in events if name == "token")
+    assert answer == "Réponse : Quand ferment les inscriptions ?"
+    assert "generate" in events[-1][1]["timings"]
+
+
+def test_stream_matches_the_blocking_answer(client):
+    question = {"question": "Quand sont versées les bourses ?"}
+    events = parse_sse(client.post("/ask/stream", json=question).text)
+    answer = client.post("/ask", json=question).json()
+
+    assert "".join(data["content"] for name, data in events if name == "token") == answer["answer"]
+    assert events[0][1]["sources"] == answer["sources"]
+
+
+def test_generation_failure_ends_the_stream_with_an_error_event(client):
+    events = parse_sse(client.post("/ask/stream", json={"question": "Une panne ?"}).text)
+    assert events[0][0] == "sources"
+    assert events[-1] == ("error", {"detail": "LLM indisponible"})
+    assert "done" not in [name for name, _ in events]
+
+
+def test_unknown_filter_fields_are_rejected(client):
+    response = client.post("/ask/stream", json={"question": "?", "filters": {"auteur": "x"}})
+    assert response.status_code == 422
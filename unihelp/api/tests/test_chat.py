@@ -0,0 +1,53 @@
+import json
+from unihelp.core.config import settings
+
+
+def test_follow_ups_are_condensed_with_the_history(client):
+    first = client.post("/chat", json={"question": "Quand ferment les inscriptions ?"}).json()
+    # The first turn has no history to condense with
+    assert first["standalone_question"] == "Quand ferment les inscriptions ?"
+
+    follow_up = client.post("/chat", json={"session_id": first["session_id"], "question": "Et pour les boursiers ?"}).json()
+    assert follow_up["session_id"] == first["session_id"]
+    assert follow_up["standalone_question"] == "Et pour les boursiers ? (reformulée)"
+    assert follow_up["answer"] == "Réponse : Et pour les boursiers ? (reformulée)"
+    assert "condense" in follow_up["timings"]
+
+    conversation = client.get(f"/chat/{first['session_id']}").json()
+    # Turns keep the question as asked
+    assert [t["question"] for t in conversation["turns"]] == ["Quand ferment les inscriptions ?", "Et pour les boursiers ?"]
+
+
+def test_sessions_are_separate(client):
+    first = client.post("/chat", json={"question": "Quand ferment les inscriptions ?"}).json()
+    other = client.post("/chat", json={"question": "Et pour les boursiers ?"}).json()
+    assert other["session_id"] != first["session_id"]
+    assert other["standalone_question"] == "Et pour les boursiers ?"
+
+
+def test_older_turns_are_folded_into_the_summary(client, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_MAX_TURNS", 2)
+    session_id = client.post("/chat", json={"question": "Question 0 ?"}).json()["session_id"]
+    for i in range(1, 3):
+        client.post("/chat", json={"session_id": session_id, "question": f"Question {i} ?"})
+
+    conversation = client.get(f"/chat/{session_id}").json()
+    assert conversation["summary"] == "Résumé de la conversation."
+    assert [t["question"] for t in conversation["turns"]] == ["Question 2 ?"]
+
+
+def test_streamed_turn_is_saved_before_the_done_event(client):
+    response = client.post("/chat/stream", json={"question": "Quand ferment les inscriptions ?"})
+    events = [message.split("\n") for message in response.text.strip().split("\n\n")]
+    names = [lines[0][len("event: "):] for lines in events]
+    assert names[:2] == ["session", "sources"] and names[-1] == "done"
+    session_id = json.loads(events[0][1][len("data: "):])["session_id"]
+
+    turns = client.get(f"/chat/{session_id}").json()["turns"]
+    assert turns == [{"question": "Quand ferment les inscriptions ?", "answer": "Réponse : Quand ferment les inscriptions ?"}]
+
+
+def test_deleted_or_unknown_sessions_are_not_found(client):
+    session_id = client.post("/chat", json={"question": "Quand ferment les inscriptions ?"}).json()["session_id"]
+    assert client.delete(f"/chat/{session_id}").json() == {"status": "deleted"}
+    assert client.get(f"/chat/{session_id}").status_code == 404
@@ -0,0 +1,105 @@
+import io
+import json
+import zipfile
+import httpx
+import openai
+import pytest
+from conftest import EchoChatModel
+from unihelp.core.config import settings
+from unihelp.tools.email_gen import EmailGenerator
+
+STUDENTS = [{"nom": f"Étudiant {i}", "matricule": 2021000 + i} for i in range(10)]
+
+
+class FlakyChatModel(EchoChatModel):
+    """Times out on the first call for each prompt, then answers."""
+
+    seen: set = set()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if messages[-1].content not in self.seen:
+            self.seen.add(messages[-1].content)
+            raise openai.APITimeoutError(request=httpx.Request("POST", "http://llm/v1/chat/completions"))
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+@pytest.fixture
+def make_client(client, engine, monkeypatch):
+    def make(model=EchoChatModel):
+        monkeypatch.setattr("unihelp.tools.email_gen.build_chat_llm", lambda temperature, max_retries=None: model())
+        generator = EmailGenerator(rag_engine=engine)
+
+        async def aget_email_generator():
+            return generator
+
+        monkeypatch.setattr("unihelp.api.routes.aget_email_generator", aget_email_generator)
+        return client
+    return make
+
+
+def lines_of(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_has_one_email_per_student_then_done(make_client):
+    client = make_client()
+    response = client.post("/generate-email/batch", json={"template_type": "reinscription", "students": STUDENTS})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = lines_of(response)
+    assert lines[-1]["done"] is True and "generate" in lines[-1]["timings"]
+    emails = {line["index"]: line for line in lines[:-1]}
+    assert sorted(emails) == list(range(len(STUDENTS)))
+    for i, line in emails.items():
+        assert line["student_info"] == f"nom: Étudiant {i}; matricule: {2021000 + i}"
+        assert f"Informations de l'étudiant: {line['student_info']}\n" in line["email"]
+
+
+def test_zip_has_the_emails_in_input_order_and_the_errors(make_client):
+    client = make_client()
+    students = ["Amine, L3", "Sarra, en panne de transport", "Yassine, M1"]
+    response = client.post("/generate-email/batch", json={"template_type": "absence", "students": students, "output_format": "zip"})
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["email_0001.txt", "email_0003.txt", "errors.json"]
+    assert "Amine, L3" in archive.read("email_0001.txt").decode()
+    assert "Yassine, M1" in archive.read("email_0003.txt").decode()
+    assert json.loads(archive.read("errors.json")) == [{"index": 1, "student_info": students[1], "error": "LLM indisponible"}]
+
+
+def test_transient_llm_errors_are_retried(make_client, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_BATCH_RETRIES", 1)
+    FlakyChatModel.seen = set()
+    client = make_client(FlakyChatModel)
+    lines = lines_of(client.post("/generate-email/batch", json={"template_type": "bourse", "students": STUDENTS[:2]}))
+    assert all("email" in line for line in lines[:-1])
+
+
+def test_upload_parses_the_students_file(make_client):
+    client = make_client()
+    content = "nom;matricule\nAmine Ben Salah;2021042\nSarra Trabelsi;2022017\n".encode("utf-8")
+    response = client.post(
+        "/generate-email/batch/upload",
+        files={"file": ("etudiants.csv", content, "text/csv")},
+        data={"template_type": "attestation"}
+    )
+    lines = lines_of(response)
+    assert sorted(line["student_info"] for line in lines[:-1]) == [
+        "nom: Amine Ben Salah; matricule: 2021042",
+        "nom: Sarra Trabelsi; matricule: 2022017",
+    ]
+
+
+def test_invalid_batches_are_rejected(make_client, monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(settings, "EMAIL_BATCH_MAX_STUDENTS", 3)
+    assert client.post("/generate-email/batch", json={"template_type": "stage", "students": STUDENTS}).status_code == 422
+    assert client.post("/generate-email/batch", json={"template_type": "stage", "students": []}).status_code == 422
+    assert client.post("/generate-email/batch", json={"template_type": "inconnu", "students": STUDENTS[:1]}).status_code == 400
+    upload = client.post(
+        "/generate-email/batch/upload",
+        files={"file": ("etudiants.pdf", b"%PDF", "application/pdf")},
+        data={"template_type": "stage"}
+    )
+    assert upload.status_code == 400
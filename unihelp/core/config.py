@@ -3,10 +3,55 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
+    LLM_MODEL: str = "gpt-4o-mini"
+    LLM_BASE_URL: str = ""
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_MAX_CONCURRENCY: int = 0
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    CHUNKING_MODE: str = "chars"
+    CHUNK_MAX_TOKENS: int = 0
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_SIZE: int = 512
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    EMAIL_CACHE_SIZE: int = 256
+    EMAIL_CONTEXT_K: int = 3
+    EMAIL_BATCH_MAX_STUDENTS: int = 1000
+    EMAIL_BATCH_CONCURRENCY: int = 8
+    EMAIL_BATCH_RETRIES: int = 2
+    HYBRID_SEARCH_ENABLED: bool = True
+    BM25_INDEX_PATH: str = "./data/bm25_index.json"
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+    AUTO_FILTERS_ENABLED: bool = True
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL_NAME: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    RERANK_CANDIDATES: int = 30
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_TIME_BUDGET_MS: float = 200
+    CONTEXT_MAX_TOKENS: int = 1500
+    ASK_BATCH_MAX_QUESTIONS: int = 500
+    ASK_BATCH_CONCURRENCY: int = 8
+    CONVERSATION_BACKEND: str = "memory"
+    CONVERSATION_DB_PATH: str = "./data/conversations.sqlite3"
+    CONVERSATION_MAX_SESSIONS: int = 1000
+    CONVERSATION_TTL_SECONDS: int = 3600
+    CONVERSATION_MAX_TURNS: int = 6
     CHROMA_PERSIST_DIR: str = "./data/chroma_db"
+    VECTOR_BACKEND: str = "chroma"
+    QUANTIZED_INDEX_DIR: str = "./data/quantized_index"
+    QUANTIZED_RESCORE_CANDIDATES: int = 100
+    INGEST_MANIFEST_PATH: str = "./data/ingest_manifest.json"
+    RAW_DATA_DIR: str = "./data/raw"
+    INGEST_WORKERS: int = 1
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    ADMIN_API_TOKEN: str = ""
     DEBUG: bool = False
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
 
     class Config:
         env_file = ".env"
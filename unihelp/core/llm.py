@@ -0,0 +1,79 @@
+import httpx
+from langchain_openai import ChatOpenAI
+from .config import settings
+
+# Pool of the openai SDK's own clients. httpx's defaults (100 connections) would cap
+# the concurrent LLM calls of the process when LLM_MAX_CONCURRENCY is 0.
+DEFAULT_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+# HTTP clients shared by every LLM instance of the process, so that connections
+# (and their TLS sessions) to the LLM server are pooled across engines and requests
+_http_client = None
+_async_http_client = None
+
+
+def _timeout() -> httpx.Timeout:
+    # LLM_TIMEOUT_SECONDS bounds the call itself, never the wait for a free connection:
+    # calls beyond LLM_MAX_CONCURRENCY queue instead of failing with APITimeoutError
+    return httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, pool=None)
+
+
+def _client_options() -> dict:
+    options = {"timeout": _timeout()}
+    if settings.LLM_MAX_CONCURRENCY > 0:
+        # One connection per in-flight call (a streamed answer holds its connection until
+        # the end), so the pool size caps the calls in flight on each client. The sync
+        # client (calls run in the thread pool) and the async one (streamed answers,
+        # conversations, email batches) have a pool each: up to twice the limit in total.
+        options["limits"] = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+        )
+    else:
+        options["limits"] = DEFAULT_LIMITS
+    return options
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(**_client_options())
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(**_client_options())
+    return _async_http_client
+
+
+async def aclose_http_clients():
+    global _http_client, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+
+def build_chat_llm(temperature: float, max_retries: int = None) -> ChatOpenAI:
+    """
+    Chat model used by the engines, wired to the shared sync and async HTTP clients.
+    LLM_BASE_URL points it at any OpenAI-compatible server instead of the OpenAI API
+    (vLLM, llama.cpp, Ollama, or `benchmarks/llm_standin.py` for offline load tests).
+    `max_retries` overrides LLM_MAX_RETRIES, e.g. 0 when the caller retries itself.
+    """
+    return ChatOpenAI(
+        model=settings.LLM_MODEL,
+        temperature=temperature,
+        # Local servers usually ignore the key, but the client requires one
+        api_key=settings.OPENAI_API_KEY or ("unused" if settings.LLM_BASE_URL else ""),
+        base_url=settings.LLM_BASE_URL or None,
+        # The SDK sends its own timeout with every request, overriding the client's
+        timeout=_timeout(),
+        max_retries=settings.LLM_MAX_RETRIES if max_retries is None else max_retries,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    )
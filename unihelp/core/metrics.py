@@ -0,0 +1,56 @@
+import os
+from typing import Dict, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest, multiprocess
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# From sub-millisecond cache lookups up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_LATENCY = Histogram(
+    "unihelp_stage_duration_seconds",
+    "Duration of each processing stage (embed, retrieve, generate, extract, chunk...)",
+    ["component", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUEST_LATENCY = Histogram(
+    "unihelp_http_request_duration_seconds",
+    "Duration of HTTP requests until the response headers are sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def record_stages(component: str, timings: Dict[str, float], **fields):
+    """
+    Publishes the per-stage durations (ms, as collected by `timed`) of one
+    operation: one histogram observation per stage, and one log line carrying
+    the timings as structured fields.
+    """
+    for stage, ms in timings.items():
+        STAGE_LATENCY.labels(component=component, stage=stage).observe(ms / 1000)
+    logger.info(
+        f"{component} stage timings (ms): {timings}",
+        extra={"fields": {"component": component, "timings_ms": timings, **fields}},
+    )
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_LATENCY.labels(method=method, route=route, status=str(status)).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Current metrics in the Prometheus text format, with their content type.
+    Metrics live in the memory of each process, so behind several uvicorn workers
+    a scrape only sees the worker that answered it. Setting PROMETHEUS_MULTIPROC_DIR
+    (in the environment, before the workers start) to an empty directory makes
+    every process write its metrics there, and they are aggregated here.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
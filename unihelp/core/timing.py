@@ -0,0 +1,16 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """
+    Records the wall time of a block, in milliseconds, under `timings[stage]`.
+    Repeated blocks of the same stage (e.g. per page) add up.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000, 2)
@@ -1,33 +1,45 @@
 import argparse
-import glob
 import os
-from .pipeline import DocumentPipeline
+from .batch import find_documents, process_files
+from .pipeline import CHUNKING_MODES, DocumentPipeline
+from unihelp.core.config import settings
 
 def main():
     parser = argparse.ArgumentParser(description="Process administrative documents into JSON chunks.")
     parser.add_argument("input", help="File or directory path to process")
     parser.add_argument("--output-dir", help="Directory to save output JSON files", default=".")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes used to parse a directory")
+    parser.add_argument("--chunking-mode", choices=CHUNKING_MODES, default="chars", help="Size chunks in characters or in embedding model tokens")
     
     args = parser.parse_args()
     
-    pipeline = DocumentPipeline()
+    pipeline_kwargs = {}
+    if args.chunking_mode == "tokens":
+        pipeline_kwargs = {
+            "chunking_mode": "tokens",
+            "embedding_model": settings.EMBEDDING_MODEL_NAME,
+            "max_chunk_tokens": settings.CHUNK_MAX_TOKENS or None,
+        }
     
     # Process directory
     if os.path.isdir(args.input):
-        files = glob.glob(os.path.join(args.input, "**", "*.*"), recursive=True)
-        supported_exts = {".pdf", ".docx", ".xlsx", ".txt"}
-        files_to_process = [f for f in files if os.path.splitext(f)[1].lower() in supported_exts]
+        files_to_process = find_documents(args.input)
         
         print(f"Found {len(files_to_process)} supported files in directory.")
         
         if not os.path.exists(args.output_dir) and args.output_dir != ".":
             os.makedirs(args.output_dir)
             
-        for file in files_to_process:
+        # Worker processes build their own pipeline
+        pipeline = DocumentPipeline(**pipeline_kwargs) if args.workers <= 1 else None
+        for file, result, error in process_files(files_to_process, workers=args.workers, pipeline_kwargs=pipeline_kwargs, pipeline=pipeline):
+            if error is not None:
+                print(f"Failed to process {file}: {error}")
+                continue
             try:
                 base_name = os.path.splitext(os.path.basename(file))[0]
                 output_path = os.path.join(args.output_dir, f"{base_name}_processed.json")
-                pipeline.process_and_save(file, output_path)
+                DocumentPipeline.save_result(result, output_path)
                 print(f"Successfully processed: {file} -> {output_path}")
             except Exception as e:
                 print(f"Failed to process {file}: {e}")
@@ -40,7 +52,7 @@ def main():
         base_name = os.path.splitext(os.path.basename(args.input))[0]
         output_path = os.path.join(args.output_dir, f"{base_name}_processed.json")
         try:
-            pipeline.process_and_save(args.input, output_path)
+            DocumentPipeline(**pipeline_kwargs).process_and_save(args.input, output_path)
             print(f"Successfully processed: {args.input} -> {output_path}")
         except Exception as e:
             print(f"Failed to process {args.input}: {e}")
@@ -0,0 +1,83 @@
+import glob
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .extractors import SUPPORTED_EXTENSIONS
+from .pipeline import DocumentPipeline
+
+# Pipeline instance owned by each worker process (built once by the pool initializer)
+_worker_pipeline = None
+
+
+def find_documents(directory: str) -> List[str]:
+    """Recursively lists the supported documents under a directory, in a stable order."""
+    files = glob.glob(os.path.join(directory, "**", "*.*"), recursive=True)
+    return sorted(f for f in files if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS)
+
+
+def _init_worker(pipeline_kwargs: dict):
+    global _worker_pipeline
+    _worker_pipeline = DocumentPipeline(**pipeline_kwargs)
+
+
+def _process_in_worker(file_path: str) -> dict:
+    return _worker_pipeline.process_file(file_path)
+
+
+def process_files(
+    files: Iterable[str],
+    workers: int = 1,
+    pipeline_kwargs: Optional[dict] = None,
+    pipeline: Optional[DocumentPipeline] = None,
+) -> Iterator[Tuple[str, Optional[dict], Optional[Exception]]]:
+    """
+    Runs `DocumentPipeline.process_file` over many files and yields
+    `(file_path, result, error)` tuples as each file finishes.
+
+    With `workers > 1` the files are parsed in a process pool and results are
+    yielded in completion order, so the caller (e.g. the embedding stage) keeps
+    consuming while the remaining files are still being parsed. At most
+    `2 * workers` files are in flight, which keeps memory bounded when the
+    consumer is slower than the parsers. Each result holds all the chunks of its
+    file and is pickled back from the worker as a whole, so the bound is in files,
+    not bytes. A failure only affects its own file.
+
+    With `workers <= 1` the files are parsed in this process, by `pipeline` when
+    the caller already has one (its tokenizer is not loaded a second time).
+    """
+    pipeline_kwargs = pipeline_kwargs or {}
+
+    if workers <= 1:
+        pipeline = pipeline or DocumentPipeline(**pipeline_kwargs)
+        for file_path in files:
+            try:
+                yield file_path, pipeline.process_file(file_path), None
+            except Exception as e:
+                yield file_path, None, e
+        return
+
+    pending_files = iter(files)
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_kwargs,)) as executor:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            file_path = next(pending_files, None)
+            if file_path is None:
+                return False
+            in_flight[executor.submit(_process_in_worker, file_path)] = file_path
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = in_flight.pop(future)
+                try:
+                    yield file_path, future.result(), None
+                except Exception as e:
+                    yield file_path, None, e
+                submit_next()
@@ -1,61 +1,225 @@
 import re
+from bisect import bisect_right
+from itertools import accumulate, islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Separators are captured so that the offsets of the pieces can be rebuilt
+_PARAGRAPH_SPLIT_RE = re.compile(r'(\n\s*\n)')
+# Sentence ends: the punctuation mark stays with the sentence, the whitespace is dropped
+_SENTENCE_BREAK_RE = re.compile(r'[.!?](\s+)')
+_OVERLAP_BOUNDARY_RE = re.compile(r'[.!?]\s+')
+
+# (start, end) of a piece (paragraph or sentence) in its block
+Span = Tuple[int, int]
+
+# A piece of a chunk: (start, end) in the chunk text, and its offset in the document
+Anchor = Tuple[int, int, int]
 
 class SemanticChunker:
-    def __init__(self, target_size: int = 800, max_size: int = 1000, overlap: int = 150):
+    """
+    Packs paragraphs (or, for paragraphs over `max_size`, sentences) into chunks
+    of up to `target_size` characters, each new chunk starting with the last
+    `overlap` characters of the previous one, cut at a sentence boundary when
+    there is one.
+
+    Paragraphs and sentences are located once per block as (start, end) offsets,
+    chunks are sized with prefix sums over those spans and only materialized
+    when emitted.
+
+    With a `tokenizer` (see `EmbeddingTokenizer`), `target_size` and `max_size`
+    are numbers of tokens, counted in one batch per block; `overlap` is still a
+    number of characters, shortened when needed so that the overlap and the
+    piece opening a chunk stay within `max_size` tokens.
+    """
+
+    def __init__(self, target_size: int = 800, max_size: int = 1000, overlap: int = 150, tokenizer=None):
         self.target_size = target_size
         self.max_size = max_size
         self.overlap = overlap
+        self.tokenizer = tokenizer
 
     def chunk(self, text: str) -> list[str]:
-        # Split text into paragraphs based on double newlines
-        paragraphs = re.split(r'\n\s*\n', text)
-        
-        chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-                
-            # If a single paragraph is larger than max_size, we need to split it by sentences
-            if len(para) > self.max_size:
-                sentences = re.split(r'(?<=[.!?])\s+', para)
-                for sentence in sentences:
-                    if len(current_chunk) + len(sentence) + 1 <= self.target_size:
-                        current_chunk += (" " if current_chunk else "") + sentence
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                        # Start new chunk with overlap
-                        # Find the logical overlap (last sentence or words of the previous chunk)
-                        overlap_text = self._get_overlap_text(current_chunk)
-                        current_chunk = overlap_text + sentence if overlap_text else sentence
-            else:
-                # Add paragraph to current_chunk
-                if len(current_chunk) + len(para) + 2 <= self.target_size:
-                    current_chunk += ("\n\n" if current_chunk else "") + para
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    overlap_text = self._get_overlap_text(current_chunk)
-                    current_chunk = overlap_text + para if overlap_text else para
-                    
-        if current_chunk:
-            chunks.append(current_chunk)
-            
-        return [c.strip() for c in chunks if c.strip()]
-
-    def _get_overlap_text(self, text: str) -> str:
-        if len(text) <= self.overlap:
-            return ""
-        
-        # Try to find a sentence boundary near the overlap length
-        overlap_start = len(text) - self.overlap
-        # Look for the first period after the overlap_start
-        match = re.search(r'[.!?]\s+', text[overlap_start:])
+        return [chunk for chunk, _ in self.chunk_stream([(text, {})])]
+
+    def chunk_stream(self, blocks: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Incremental `chunk`: consumes (text, location) blocks, e.g. the pages of a
+        PDF, and yields (chunk, location) as soon as each chunk is complete. The
+        location is the one of the block where the chunk starts; when it ends in
+        another block, the differing keys are repeated with an `_end` suffix
+        (e.g. {"page": 3, "page_end": 4}). It also holds the `start_offset` and
+        `end_offset` of the chunk in the document, i.e. the blocks joined by "\\n\\n".
+        """
+        # The current chunk is the overlap carried over from the previous one,
+        # followed by runs of pieces: (text, spans, i, j, joiner, lead, base) stands
+        # for `lead + joiner.join(text[s:e] for s, e in spans[i:j])`
+        prefix, prefix_anchors = "", []
+        parts: List[tuple] = []
+        length = 0
+        start_location = end_location = None
+        base = 0
+
+        for text, location in blocks:
+            for spans, sizes, joiner in self._runs(text):
+                # Joiners are whitespace, which tokenizers do not count
+                joiner_size = len(joiner) if self.tokenizer is None else 0
+                # bounds[k]: size of the pieces before k, each counted with a joiner
+                bounds = list(accumulate([size + joiner_size for size in sizes], initial=0))
+                i, n = 0, len(spans)
+                while i < n:
+                    if parts or prefix:
+                        # Longest run of the next pieces that keeps the chunk within target_size
+                        j = bisect_right(bounds, self.target_size - length + bounds[i], i, n + 1) - 1
+                        if j > i:
+                            parts.append((text, spans, i, j, joiner, joiner, base))
+                            length += bounds[j] - bounds[i]
+                            end_location = location
+                            i = j
+                            continue
+                        raw = self._materialize(prefix, parts)
+                        yield self._emit(raw, prefix, prefix_anchors, parts, start_location, end_location)
+                        # Start new chunk with overlap (last sentence or words of the previous chunk)
+                        prefix, prefix_anchors = self._overlap(raw, prefix_anchors, parts)
+                        parts = []
+                        length = self._size(prefix)
+                        piece_size = bounds[i + 1] - bounds[i] - joiner_size
+                        if self.tokenizer is not None and length + piece_size > self.max_size:
+                            # The chunk must fit in one embedding: keep only the overlap that fits
+                            prefix, prefix_anchors = self._fit_prefix(prefix, prefix_anchors, self.max_size - piece_size)
+                            length = self._size(prefix)
+                    # A piece opening a chunk is added even when it exceeds target_size
+                    parts.append((text, spans, i, i + 1, joiner, "", base))
+                    length += bounds[i + 1] - bounds[i] - joiner_size
+                    start_location = end_location = location
+                    i += 1
+            base += len(text) + 2
+
+        if parts or prefix:
+            raw = self._materialize(prefix, parts)
+            yield self._emit(raw, prefix, prefix_anchors, parts, start_location, end_location)
+
+    def _runs(self, text: str) -> Iterator[Tuple[List[Span], List[int], str]]:
+        """
+        Splits a block into runs of pieces sharing a joiner: consecutive paragraphs,
+        joined by "\\n\\n", and the sentences, joined by " ", of each paragraph over
+        `max_size` (which we need to split by sentences). Runs come with the size
+        of each of their pieces.
+        """
+        paragraphs = self._paragraph_spans(text)
+        sizes = self._sizes(text, paragraphs)
+        run_start = 0
+        for k, (start, end) in enumerate(paragraphs):
+            if sizes[k] > self.max_size:
+                if k > run_start:
+                    yield paragraphs[run_start:k], sizes[run_start:k], "\n\n"
+                sentences = self._sentence_spans(text, start, end)
+                yield sentences, self._sizes(text, sentences), " "
+                run_start = k + 1
+        if len(paragraphs) > run_start:
+            yield paragraphs[run_start:], sizes[run_start:], "\n\n"
+
+    def _sizes(self, text: str, spans: List[Span]) -> List[int]:
+        if self.tokenizer is None:
+            return [end - start for start, end in spans]
+        return self.tokenizer.count([text[start:end] for start, end in spans])
+
+    def _size(self, text: str) -> int:
+        if self.tokenizer is None or not text:
+            return len(text)
+        return self.tokenizer.count([text])[0]
+
+    @staticmethod
+    def _paragraph_spans(text: str) -> List[Span]:
+        """(start, end) of the non-empty paragraphs of `text`, without surrounding whitespace."""
+        pieces = _PARAGRAPH_SPLIT_RE.split(text)
+        positions = accumulate(map(len, pieces), initial=0)
+        spans = []
+        for paragraph, start in zip(pieces[0::2], islice(positions, 0, None, 2)):
+            stripped = paragraph.lstrip()
+            if stripped:
+                start += len(paragraph) - len(stripped)
+                spans.append((start, start + len(stripped.rstrip())))
+        return spans
+
+    @staticmethod
+    def _sentence_spans(text: str, start: int, end: int) -> List[Span]:
+        breaks = [match.span(1) for match in _SENTENCE_BREAK_RE.finditer(text, start, end)]
+        starts = [start] + [break_end for _, break_end in breaks]
+        ends = [break_start for break_start, _ in breaks] + [end]
+        return list(zip(starts, ends))
+
+    @staticmethod
+    def _materialize(prefix: str, parts: List[tuple]) -> str:
+        pieces = [prefix]
+        for text, spans, i, j, joiner, lead, _ in parts:
+            pieces.append(lead)
+            pieces.append(joiner.join([text[start:end] for start, end in spans[i:j]]))
+        return "".join(pieces)
+
+    @staticmethod
+    def _anchors_from_end(raw: str, prefix_anchors: List[Anchor], parts: List[tuple]) -> Iterator[Anchor]:
+        """Anchors of the pieces of a chunk, last first."""
+        position = len(raw)
+        for text, spans, i, j, joiner, lead, base in reversed(parts):
+            for k in range(j - 1, i - 1, -1):
+                start, end = spans[k]
+                yield position - (end - start), position, base + start
+                position -= end - start + (len(joiner) if k > i else len(lead))
+        yield from reversed(prefix_anchors)
+
+    def _overlap(self, raw: str, prefix_anchors: List[Anchor], parts: List[tuple]) -> Tuple[str, List[Anchor]]:
+        """
+        Text the next chunk starts with: the last `overlap` characters of the
+        current one, from the first sentence boundary in them if any, plus a space.
+        Also returns the anchors of the pieces it contains.
+        """
+        if len(raw) <= self.overlap or self.overlap <= 0:
+            return "", []
+
+        cut = len(raw) - self.overlap
+        match = _OVERLAP_BOUNDARY_RE.search(raw, cut)
         if match:
-            return text[overlap_start + match.end():] + " "
-        
-        # Fallback: just return the last `overlap` characters
-        return text[-self.overlap:] + " "
+            cut = match.end()
+
+        anchors = []
+        for start, end, offset in self._anchors_from_end(raw, prefix_anchors, parts):
+            if end <= cut:
+                break
+            anchors.append((max(start, cut) - cut, end - cut, offset + max(0, cut - start)))
+        anchors.reverse()
+        return raw[cut:] + " ", anchors
+
+    def _fit_prefix(self, prefix: str, prefix_anchors: List[Anchor], budget: int) -> Tuple[str, List[Anchor]]:
+        """Longest tail of the overlap, starting at a word, of at most `budget` tokens
+        (all the candidates are counted in one batch)."""
+        starts = [match.start() for match in re.finditer(r'\S+', prefix)] if budget > 0 else []
+        for cut, size in zip(starts, self.tokenizer.count([prefix[start:] for start in starts])):
+            if size <= budget:
+                anchors = [
+                    (max(start, cut) - cut, end - cut, offset + max(0, cut - start))
+                    for start, end, offset in prefix_anchors
+                    if end > cut
+                ]
+                return prefix[cut:], anchors
+        return "", []
+
+    @staticmethod
+    def _emit(raw: str, prefix: str, prefix_anchors: List[Anchor], parts: List[tuple], start_location: Dict[str, Any], end_location: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        location = dict(start_location or {})
+        for key, value in (end_location or {}).items():
+            if location.get(key) != value:
+                location[f"{key}_end"] = value
+
+        # Document offsets of the first and last non-whitespace characters. Pieces
+        # start with one, so the first piece of the chunk holds it at the latest.
+        leading = len(raw) - len(raw.lstrip())
+        _, spans, i, _, _, lead, base = parts[0]
+        first_piece = (len(prefix) + len(lead), len(prefix) + len(lead) + spans[i][1] - spans[i][0], base + spans[i][0])
+        for start, end, offset in prefix_anchors + [first_piece]:
+            if end > leading:
+                location["start_offset"] = offset + max(0, leading - start)
+                break
+        _, spans, _, j, _, _, base = parts[-1]
+        location["end_offset"] = base + spans[j - 1][1]
+
+        return raw.strip(), location
@@ -4,23 +4,33 @@ from langdetect import detect, DetectorFactory
 # Set seed for reproducible langdetect results
 DetectorFactory.seed = 0
 
+# Language detection only looks at the beginning of the text
+LANGUAGE_SAMPLE_CHARS = 5000
+
+# Common headers/footers like "Page X of Y" or solitary page numbers
+_PAGE_LINE_RE = re.compile(r'^\s*page\s+\d+\s*(?:of\s+\d+)?\s*$', re.IGNORECASE | re.MULTILINE)
+
 class TextCleaner:
     @staticmethod
     def clean(text: str) -> str:
-        # Remove common headers/footers numbers like "Page X of Y" or solitary page numbers
-        text = re.sub(r'(?i)^\s*page\s+\d+\s*(of\s+\d+)?\s*$', '', text, flags=re.MULTILINE)
-        
-        # Replace 3 or more newlines with double newlines
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Replace multiple spaces with a single space
-        text = re.sub(r' {2,}', ' ', text)
-        
+        # Page lines are removed first: dropping one can merge the newline runs around it
+        text = _PAGE_LINE_RE.sub('', text)
+
+        # Replace 3 or more newlines with double newlines, and multiple spaces with a
+        # single one. Plain replacements are several times faster than a regex pass;
+        # each round shortens every run, so long runs only take a few rounds.
+        while '\n\n\n' in text:
+            text = text.replace('\n\n\n', '\n\n')
+        while '  ' in text:
+            text = text.replace('  ', ' ')
+
         return text.strip()
 
     @staticmethod
-    def detect_language(text: str) -> str:
+    def detect_language(text: str, max_chars: int = LANGUAGE_SAMPLE_CHARS) -> str:
         try:
+            # langdetect's cost grows with the text, a bounded sample is as accurate
+            text = text[:max_chars]
             # Langdetect might throw an exception if the text contains no characters
             if not text.strip():
                 return "unknown"
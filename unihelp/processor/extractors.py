@@ -1,41 +1,93 @@
 import os
+from typing import Any, Dict, Iterator, Tuple
 import fitz  # PyMuPDF
 from docx import Document as DocxDocument
 import openpyxl
 
-class PDFExtractor:
-    @staticmethod
-    def extract(file_path: str) -> str:
-        text = []
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".xlsx", ".txt"}
+
+# A block is a piece of text and where it comes from in the file, e.g. {"page": 3}
+Block = Tuple[str, Dict[str, Any]]
+
+class BaseExtractor:
+    """
+    Extractors stream a document as blocks (pages, row groups, paragraph groups)
+    with `iter_blocks`, so large files never have to be held as one string.
+    Block boundaries are paragraph boundaries.
+    """
+
+    def iter_blocks(self, file_path: str) -> Iterator[Block]:
+        raise NotImplementedError
+
+    def extract(self, file_path: str) -> str:
+        """Whole document as a single string."""
+        return "\n\n".join(text for text, _ in self.iter_blocks(file_path))
+
+class PDFExtractor(BaseExtractor):
+    def iter_blocks(self, file_path: str) -> Iterator[Block]:
         with fitz.open(file_path) as doc:
-            for page in doc:
-                text.append(page.get_text())
-        return "\n\n".join(text)
+            for page_number, page in enumerate(doc, start=1):
+                yield page.get_text(), {"page": page_number}
 
-class DocxExtractor:
-    @staticmethod
-    def extract(file_path: str) -> str:
+class DocxExtractor(BaseExtractor):
+    def iter_blocks(self, file_path: str) -> Iterator[Block]:
+        # python-docx parses the whole file anyway; paragraphs are only grouped
+        # between empty ones, which are the paragraph breaks the chunker splits on
         doc = DocxDocument(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-
-class XlsxExtractor:
-    @staticmethod
-    def extract(file_path: str) -> str:
-        wb = openpyxl.load_workbook(file_path, data_only=True)
-        text = []
-        for sheet in wb.worksheets:
-            text.append(f"--- Sheet: {sheet.title} ---")
-            for row in sheet.iter_rows(values_only=True):
-                row_text = "\t".join([str(cell) for cell in row if cell is not None])
-                if row_text.strip():
-                    text.append(row_text)
-        return "\n".join(text)
-
-class TxtExtractor:
-    @staticmethod
-    def extract(file_path: str) -> str:
+        lines = []
+        for para in doc.paragraphs:
+            if para.text.strip():
+                lines.append(para.text)
+            elif lines:
+                yield "\n".join(lines), {}
+                lines = []
+        if lines:
+            yield "\n".join(lines), {}
+
+class XlsxExtractor(BaseExtractor):
+    # Rows are grouped into blocks of about this many characters, so that long
+    # sheets are chunked on row boundaries
+    max_block_chars = 600
+
+    def iter_blocks(self, file_path: str) -> Iterator[Block]:
+        # Read-only mode streams rows instead of loading every cell in memory
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in wb.worksheets:
+                location = {"sheet": sheet.title}
+                lines = [f"--- Sheet: {sheet.title} ---"]
+                size = len(lines[0])
+                for row in sheet.iter_rows(values_only=True):
+                    row_text = "\t".join([str(cell) for cell in row if cell is not None])
+                    if not row_text.strip():
+                        continue
+                    if lines and size + len(row_text) > self.max_block_chars:
+                        yield "\n".join(lines), location
+                        lines, size = [], 0
+                    lines.append(row_text)
+                    size += len(row_text) + 1
+                if lines:
+                    yield "\n".join(lines), location
+        finally:
+            wb.close()
+
+class TxtExtractor(BaseExtractor):
+    # Blocks end at the first blank line after this many characters
+    block_chars = 64 * 1024
+
+    def iter_blocks(self, file_path: str) -> Iterator[Block]:
         with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            lines = []
+            size = 0
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                # A line without paragraph break longer than 4 blocks is cut anyway
+                if (size >= self.block_chars and not line.strip()) or size >= 4 * self.block_chars:
+                    yield "".join(lines), {}
+                    lines, size = [], 0
+            if lines:
+                yield "".join(lines), {}
 
 def get_extractor(file_path: str):
     ext = os.path.splitext(file_path)[1].lower()
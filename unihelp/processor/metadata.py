@@ -1,49 +1,99 @@
 import re
+from typing import Iterable, Optional
+
+# Metadata usually sits in the letterhead: it is looked up in the first
+# characters of the text, and in the rest only for the fields still missing
+METADATA_HEADER_CHARS = 3000
+
+_MONTHS = "janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre"
+
+# Patterns of each field, by priority
+_DOCUMENT_TYPE_PATTERNS = [
+    re.compile(r'\b(Arrêté|Décision|Procès-verbal|PV|Note\s+d\'information|Avis|Circulaire)\b', re.IGNORECASE),
+]
+
+# e.g., 12/05/2023, 12-05-2023, 12 mai 2023. The leading word boundary is
+# checked after the first digit (`\d(?<!\w\d)` is `\b\d`): a pattern starting
+# with a digit lets the regex engine skip straight to digits, about 3x faster.
+_DATE_PATTERNS = [
+    re.compile(r'\d(?<!\w\d)\d/\d{2}/\d{4}\b'),
+    re.compile(r'\d(?<!\w\d)\d-\d{2}-\d{4}\b'),
+    re.compile(rf'\d(?<!\w\d)\d?\s+(?:{_MONTHS})\s+\d{{4}}\b', re.IGNORECASE),
+]
+
+# e.g. "Département de l'informatique", "Faculté des Sciences". The name ends
+# with its line (or at a comma): it cannot run over the following lines, which
+# also bounds backtracking to one line.
+_DEPARTMENT_PATTERNS = [
+    re.compile(rf'({kind}[ \t]+d(?:e[ \t]+|es[ \t]+|u[ \t]+|e[ \t]+l\')?[a-zA-ZÀ-ÿ \t]+)(?=[\r\n,]|$)', re.IGNORECASE | re.MULTILINE)
+    for kind in ("Département", "Faculté", "Service")
+]
 
 class MetadataExtractor:
+    # Value of each field when nothing is found
+    DEFAULTS = {
+        "document_type": "Unknown",
+        "date": None,
+        "department": "Unknown"
+    }
+
     @staticmethod
-    def extract(text: str) -> dict:
-        metadata = {
-            "document_type": "Unknown",
-            "date": None,
-            "department": "Unknown"
-        }
-        
-        # 1. Document Type heuristics
-        doc_type_patterns = [
-            r'(?i)\b(Arrêté|Décision|Procès-verbal|PV|Note\s+d\'information|Avis|Circulaire)\b'
-        ]
-        for pattern in doc_type_patterns:
-            match = re.search(pattern, text)
-            if match:
-                # Capitalize the first letter
-                metadata["document_type"] = match.group(0).capitalize()
-                break
-                
-        # 2. Date heuristics
-        # e.g., 12/05/2023, 12-05-2023, 12 mai 2023
-        date_patterns = [
-            r'\b\d{2}/\d{2}/\d{4}\b',
-            r'\b\d{2}-\d{2}-\d{4}\b',
-            r'\b\d{1,2}\s+(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s+\d{4}\b'
-        ]
-        for pattern in date_patterns:
-            match = re.search(pattern, text, flags=re.IGNORECASE)
+    def _search(patterns: list, text: str) -> Optional[re.Match]:
+        for pattern in patterns:
+            match = pattern.search(text)
             if match:
-                metadata["date"] = match.group(0)
-                break
-                
-        # 3. Department heuristics
-        # e.g. "Département de l'informatique", "Faculté des Sciences"
-        department_patterns = [
-            r'(?i)(Département\s+d(?:e\s+|es\s+|u\s+|e\s+l\')?[a-zA-ZÀ-ÿ\s]+)(?:[\r\n,]|$)',
-            r'(?i)(Faculté\s+d(?:e\s+|es\s+|u\s+|e\s+l\')?[a-zA-ZÀ-ÿ\s]+)(?:[\r\n,]|$)',
-            r'(?i)(Service\s+d(?:e\s+|es\s+|u\s+|e\s+l\')?[a-zA-ZÀ-ÿ\s]+)(?:[\r\n,]|$)',
-        ]
-        for pattern in department_patterns:
-            match = re.search(pattern, text)
-            if match:
-                metadata["department"] = match.group(1).strip()
-                break
+                return match
+        return None
+
+    @classmethod
+    def _extract_fields(cls, text: str, fields: Iterable[str]) -> dict:
+        found = {}
+        for field in fields:
+            # 1. Document Type heuristics
+            if field == "document_type":
+                match = cls._search(_DOCUMENT_TYPE_PATTERNS, text)
+                if match:
+                    # Capitalize the first letter
+                    found[field] = match.group(0).capitalize()
+            # 2. Date heuristics
+            elif field == "date":
+                match = cls._search(_DATE_PATTERNS, text)
+                if match:
+                    found[field] = match.group(0)
+            # 3. Department heuristics
+            elif field == "department":
+                match = cls._search(_DEPARTMENT_PATTERNS, text)
+                if match:
+                    found[field] = match.group(1).strip()
+        return found
+
+    @classmethod
+    def extract(cls, text: str, fields: Iterable[str] = None) -> dict:
+        """
+        Looks up `fields` (all of them by default) in the header of `text` first,
+        then in the whole text for those the header does not have. Fields that are
+        never found keep their default value.
+        """
+        fields = list(cls.DEFAULTS) if fields is None else list(fields)
+        metadata = {field: cls.DEFAULTS[field] for field in fields}
+
+        metadata.update(cls._extract_fields(text[:METADATA_HEADER_CHARS], fields))
+        missing = [field for field in fields if metadata[field] == cls.DEFAULTS[field]]
+        if missing and len(text) > METADATA_HEADER_CHARS:
+            metadata.update(cls._extract_fields(text, missing))
+
+        return metadata
+
+    @classmethod
+    def missing_fields(cls, metadata: dict) -> list:
+        return [field for field, default in cls.DEFAULTS.items() if metadata.get(field) == default]
 
+    @classmethod
+    def fill_missing(cls, metadata: dict, text: str) -> dict:
+        """Completes, from `text`, the fields of `metadata` that are still unknown.
+        Used to scan a document block by block: the first block mentioning a field wins,
+        and only the fields still missing are looked up in the following blocks."""
+        missing = cls.missing_fields(metadata)
+        if missing:
+            metadata.update(cls.extract(text, missing))
         return metadata
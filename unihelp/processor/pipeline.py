@@ -1,47 +1,122 @@
 import json
 import os
+import time
 from datetime import datetime
 from .extractors import get_extractor
-from .cleaner import TextCleaner
+from .cleaner import LANGUAGE_SAMPLE_CHARS, TextCleaner
 from .metadata import MetadataExtractor
 from .chunker import SemanticChunker
+from .tokens import EmbeddingTokenizer
+from unihelp.core.timing import timed
+
+CHUNKING_MODES = ("chars", "tokens")
 
 class DocumentPipeline:
-    def __init__(self, target_chunk_size: int = 800, max_chunk_size: int = 1000, chunk_overlap: int = 150):
+    """
+    `chunking_mode="chars"` sizes chunks in characters (target/max chunk size).
+    `chunking_mode="tokens"` sizes them with the tokenizer of `embedding_model`
+    so that each chunk fits in one embedding (its max sequence length, or
+    `max_chunk_tokens`). Whenever `embedding_model` is given, chunks also record
+    their `token_count` and the result reports how many would be truncated.
+    """
+
+    def __init__(self, target_chunk_size: int = 800, max_chunk_size: int = 1000, chunk_overlap: int = 150,
+                 chunking_mode: str = "chars", embedding_model: str = None, max_chunk_tokens: int = None):
+        if chunking_mode not in CHUNKING_MODES:
+            raise ValueError(f"Unknown chunking mode: {chunking_mode} (expected one of {', '.join(CHUNKING_MODES)})")
+        if chunking_mode == "tokens" and not embedding_model:
+            raise ValueError("Token chunking needs the embedding model whose tokenizer sizes the chunks")
+
         self.cleaner = TextCleaner()
         self.metadata_extractor = MetadataExtractor()
-        self.chunker = SemanticChunker(
-            target_size=target_chunk_size, 
-            max_size=max_chunk_size, 
-            overlap=chunk_overlap
-        )
+        self.tokenizer = EmbeddingTokenizer(embedding_model, max_tokens=max_chunk_tokens) if embedding_model else None
+        if chunking_mode == "tokens":
+            # Paragraphs that do not fit in one embedding are split by sentences
+            self.chunker = SemanticChunker(
+                target_size=self.tokenizer.max_tokens,
+                max_size=self.tokenizer.max_tokens,
+                overlap=chunk_overlap,
+                tokenizer=self.tokenizer
+            )
+        else:
+            self.chunker = SemanticChunker(
+                target_size=target_chunk_size, 
+                max_size=max_chunk_size, 
+                overlap=chunk_overlap
+            )
+
+    def _clean_blocks(self, file_path: str, metadata: dict, sample: list, timings: dict):
+        """
+        Streams the cleaned blocks of a document. On the way, unknown metadata fields
+        are looked up block by block and the beginning of the text is kept in
+        `sample` for language detection.
+        """
+        extractor = get_extractor(file_path)
+        blocks = extractor.iter_blocks(file_path)
+        sample_size = 0
+        while True:
+            with timed(timings, "extract"):
+                block = next(blocks, None)
+            if block is None:
+                return
+            raw_text, location = block
+            
+            with timed(timings, "clean"):
+                cleaned_text = self.cleaner.clean(raw_text)
+            if not cleaned_text:
+                continue
+            
+            with timed(timings, "metadata"):
+                self.metadata_extractor.fill_missing(metadata, cleaned_text)
+            if sample_size < LANGUAGE_SAMPLE_CHARS:
+                sample.append(cleaned_text[:LANGUAGE_SAMPLE_CHARS - sample_size])
+                sample_size += len(sample[-1])
+            
+            yield cleaned_text, location
 
     def process_file(self, file_path: str) -> dict:
-        """Processes a single document and returns the structured output."""
+        """
+        Processes a single document and returns the structured output. The document
+        is streamed from extraction to chunking (page by page, row block by row block),
+        so the full text is never built, but the result holds all the chunks of the
+        document: memory still grows with its text (about once, instead of several
+        times for the joined, cleaned and split copies). Chunks are not streamed past
+        this point because the document-level metadata they carry is only complete
+        once the last block has been scanned. Each chunk records
+        its page / sheet when the format has them, and its token count when the
+        pipeline has the embedding tokenizer (totals under "tokens"). The duration of each stage (ms)
+        is reported under "timings".
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
         print(f"Processing: {file_path}")
         
-        # 1. Extract text
-        extractor = get_extractor(file_path)
-        raw_text = extractor.extract(file_path)
+        timings = {}
+        metadata = dict(self.metadata_extractor.DEFAULTS)
+        sample = []
         
-        # 2. Clean text and detect language
-        cleaned_text = self.cleaner.clean(raw_text)
-        language = self.cleaner.detect_language(cleaned_text)
+        # 1. Extract, clean, scan metadata and chunk, one block at a time
+        start = time.perf_counter()
+        chunks = list(self.chunker.chunk_stream(self._clean_blocks(file_path, metadata, sample, timings)))
+        streamed_ms = (time.perf_counter() - start) * 1000
+        timings["chunk"] = round(streamed_ms - sum(timings.values()), 2)
         
-        # 3. Extract metadata
-        metadata = self.metadata_extractor.extract(cleaned_text)
+        # 2. Detect language on the beginning of the document
+        with timed(timings, "langdetect"):
+            language = self.cleaner.detect_language("\n\n".join(sample))
+        
+        # 3. Count the tokens the embedding model will see (one batch per file)
+        token_counts = None
+        if self.tokenizer is not None:
+            with timed(timings, "tokens"):
+                token_counts = self.tokenizer.count([chunk for chunk, _ in chunks])
         
         # Add basic file info
         file_name = os.path.basename(file_path)
         metadata["source_file"] = file_name
         metadata["processed_at"] = datetime.now().isoformat()
         
-        # 4. Chunk text
-        chunks = self.chunker.chunk(cleaned_text)
-        
         # Construct final output
         result = {
             "file": file_name,
@@ -52,11 +127,22 @@ class DocumentPipeline:
                 {
                     "chunk_id": i,
                     "content": chunk,
-                    "char_count": len(chunk)
+                    "char_count": len(chunk),
+                    **({"token_count": token_counts[i]} if token_counts is not None else {}),
+                    **location
                 }
-                for i, chunk in enumerate(chunks)
-            ]
+                for i, (chunk, location) in enumerate(chunks)
+            ],
+            "timings": timings
         }
+        if token_counts is not None:
+            max_tokens = self.tokenizer.max_tokens
+            result["tokens"] = {
+                "max_tokens": max_tokens,
+                "total": sum(token_counts),
+                "truncated_chunks": sum(1 for count in token_counts if count > max_tokens),
+                "truncated_tokens": sum(count - max_tokens for count in token_counts if count > max_tokens),
+            }
         
         return result
 
@@ -68,6 +154,11 @@ class DocumentPipeline:
             base_name = os.path.splitext(file_path)[0]
             output_path = f"{base_name}_processed.json"
             
+        return self.save_result(result, output_path)
+
+    @staticmethod
+    def save_result(result: dict, output_path: str) -> str:
+        """Writes an already processed document to a JSON file."""
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
             
@@ -0,0 +1,129 @@
+import os
+import random
+import re
+import pytest
+from unihelp.processor.chunker import SemanticChunker
+
+TESTS_DIR = os.path.dirname(__file__)
+
+WORDS = "le la des étudiants inscription examen stage bourse article doyen faculté règlement session date".split()
+
+
+def baseline_chunk(text, target_size, max_size, overlap):
+    """The original string-concatenation chunker, which SemanticChunker must reproduce."""
+    def overlap_text(chunk):
+        if len(chunk) <= overlap:
+            return ""
+        start = len(chunk) - overlap
+        match = re.search(r'[.!?]\s+', chunk[start:])
+        if match:
+            return chunk[start + match.end():] + " "
+        return chunk[-overlap:] + " "
+
+    chunks, current = [], ""
+    for para in re.split(r'\n\s*\n', text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) > max_size:
+            for sentence in re.split(r'(?<=[.!?])\s+', para):
+                if len(current) + len(sentence) + 1 <= target_size:
+                    current += (" " if current else "") + sentence
+                else:
+                    if current:
+                        chunks.append(current)
+                    carried = overlap_text(current)
+                    current = carried + sentence if carried else sentence
+        else:
+            if len(current) + len(para) + 2 <= target_size:
+                current += ("\n\n" if current else "") + para
+            else:
+                if current:
+                    chunks.append(current)
+                carried = overlap_text(current)
+                current = carried + para if carried else para
+    if current:
+        chunks.append(current)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def random_document(rng):
+    paragraphs = []
+    for _ in range(rng.randint(1, 25)):
+        sentences = []
+        for _ in range(rng.choice([1, 2, 3, 8, 20])):
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30)))
+            sentences.append(words.capitalize() + rng.choice([".", "!", "?", ":", ""]))
+        paragraphs.append(rng.choice([" ", "  ", "\n"]).join(sentences))
+    return "".join(p + rng.choice(["\n\n", "\n \n", "\n\n\n"]) for p in paragraphs)
+
+
+def documents():
+    with open(os.path.join(TESTS_DIR, "dummy_fr.txt"), "r", encoding="utf-8") as f:
+        yield f.read()
+    rng = random.Random(0)
+    for _ in range(60):
+        yield random_document(rng)
+
+
+@pytest.mark.parametrize("target_size,max_size,overlap", [(800, 1000, 150), (200, 250, 50), (120, 300, 20), (60, 80, 100)])
+def test_chunks_match_the_baseline_chunker(target_size, max_size, overlap):
+    chunker = SemanticChunker(target_size=target_size, max_size=max_size, overlap=overlap)
+    for text in documents():
+        assert chunker.chunk(text) == baseline_chunk(text, target_size, max_size, overlap)
+
+
+def test_no_overlap_repeats_nothing():
+    # The baseline carried the whole previous chunk over when overlap was 0 (text[-0:])
+    chunker = SemanticChunker(target_size=120, max_size=300, overlap=0)
+    for text in documents():
+        assert " ".join(chunker.chunk(text)).split() == text.split()
+
+
+@pytest.mark.parametrize("target_size,max_size,overlap", [(800, 1000, 150), (200, 250, 50), (60, 80, 100)])
+def test_offsets_locate_each_chunk_in_the_document(target_size, max_size, overlap):
+    chunker = SemanticChunker(target_size=target_size, max_size=max_size, overlap=overlap)
+    for text in documents():
+        for chunk, location in chunker.chunk_stream([(text, {})]):
+            # Only whitespace differs: joiners replace the original separators
+            span = text[location["start_offset"]:location["end_offset"]]
+            assert span.split() == chunk.split()
+
+
+def test_chunk_stream_locations_and_offsets_across_blocks():
+    chunker = SemanticChunker(target_size=60, max_size=80, overlap=0)
+    pages = [
+        ("Première page, premier paragraphe.\n\nPremière page, second paragraphe.", {"page": 1}),
+        ("Deuxième page.", {"page": 2}),
+    ]
+    document = "\n\n".join(text for text, _ in pages)
+
+    chunks = list(chunker.chunk_stream(pages))
+    assert [chunk for chunk, _ in chunks] == chunker.chunk(document)
+    assert chunks[0][1]["page"] == 1
+    assert chunks[-1][1].get("page_end", chunks[-1][1]["page"]) == 2
+    for chunk, location in chunks:
+        assert document[location["start_offset"]:location["end_offset"]].split() == chunk.split()
+
+
+class WhitespaceTokenizer:
+    """Stands in for `EmbeddingTokenizer`: one token per word."""
+
+    def count(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+def test_token_chunks_with_their_overlap_fit_in_max_size():
+    # Like DocumentPipeline in tokens mode: target and max are the embedding's max tokens
+    chunker = SemanticChunker(target_size=40, max_size=40, overlap=150, tokenizer=WhitespaceTokenizer())
+    rng = random.Random(1)
+    for _ in range(40):
+        # Sentences of at most 30 words, so every piece fits in one chunk on its own
+        paragraphs = [
+            " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))) + "." for _ in range(rng.randint(1, 6)))
+            for _ in range(rng.randint(1, 20))
+        ]
+        text = "\n\n".join(paragraphs)
+        for chunk, location in chunker.chunk_stream([(text, {})]):
+            assert len(chunk.split()) <= 40
+            assert text[location["start_offset"]:location["end_offset"]].split() == chunk.split()
@@ -0,0 +1,47 @@
+import json
+import os
+from typing import List, Optional
+from huggingface_hub import hf_hub_download
+from transformers import AutoTokenizer
+
+# Used when the model does not declare its max sequence length
+DEFAULT_MAX_SEQ_LENGTH = 512
+
+class EmbeddingTokenizer:
+    """
+    Counts tokens the way the embedding model sees them, with the (Rust, batched)
+    fast tokenizer of the sentence-transformers model. `max_tokens` is what one
+    embedding can hold: the model's max sequence length minus the special tokens
+    added around every input. Anything past it is silently truncated by the model.
+    """
+
+    def __init__(self, model_name: str, max_tokens: Optional[int] = None):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        self.max_seq_length = self._max_seq_length(model_name)
+        self.max_tokens = max_tokens or self.max_seq_length - self.tokenizer.num_special_tokens_to_add()
+
+    def _max_seq_length(self, model_name: str) -> int:
+        # sentence-transformers models declare it next to the weights (e.g. 128
+        # for paraphrase-multilingual-MiniLM-L12-v2), below the tokenizer's limit
+        try:
+            if os.path.isdir(model_name):
+                config_path = os.path.join(model_name, "sentence_bert_config.json")
+            else:
+                config_path = hf_hub_download(model_name, "sentence_bert_config.json")
+            with open(config_path, 'r', encoding='utf-8') as f:
+                return int(json.load(f)["max_seq_length"])
+        except Exception:
+            return min(self.tokenizer.model_max_length, DEFAULT_MAX_SEQ_LENGTH)
+
+    def count(self, texts: List[str]) -> List[int]:
+        """Number of tokens of each text, without special tokens."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
@@ -0,0 +1,88 @@
+import copy
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers by question embedding. A lookup hits when a cached
+    question with the same scope (k, language, ...) has a cosine similarity of at
+    least `threshold` with the new one.
+
+    Entries belong to an ingestion generation: as soon as a lookup or store comes
+    with a different generation, the whole cache is dropped, so answers never
+    outlive the documents they were generated from.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self, generation: int):
+        if generation != self.generation:
+            if self._entries:
+                logger.info(f"Collection changed (generation {self.generation} -> {generation}), clearing answer cache")
+            self.generation = generation
+            self._vectors, self._entries, self._matrix = [], [], None
+
+    def lookup(self, embedding: List[float], scope: Hashable, generation: int) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the cached result ({"answer", "sources"}) or None."""
+        if self.max_entries <= 0:
+            return None
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_generation(generation)
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            scores = self._matrix @ query
+            # Only consider entries computed for the same scope
+            for idx in np.argsort(-scores):
+                if scores[idx] < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry["scope"] == scope:
+                    self.hits += 1
+                    logger.info(f"Answer cache hit (similarity={scores[idx]:.3f}) for: {entry['question']}")
+                    return copy.deepcopy(entry["result"])
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding: List[float], scope: Hashable, generation: int, result: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            self._vectors.append(self._normalize(embedding))
+            self._entries.append({"question": question, "scope": scope, "result": copy.deepcopy(result)})
+            # Oldest entries go first
+            if len(self._entries) > self.max_entries:
+                del self._vectors[0], self._entries[0]
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._vectors, self._entries, self._matrix = [], [], None
+
+    def __len__(self) -> int:
+        return len(self._entries)
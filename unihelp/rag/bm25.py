@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from unihelp.rag.filters import matches_where
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+BM25_INDEX_VERSION = 1
+
+# Dates / article numbers such as "01/09/2023" or "2.3" are kept as single tokens
+_TOKEN_RE = re.compile(r'\d+(?:[/.\-]\d+)+|\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-insensitive tokens ("Réinscription" -> "reinscription")."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuses several ranked ID lists: score(d) = sum over rankings of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Sparse lexical index (Okapi BM25) kept next to the Chroma collection and
+    persisted as JSON. Documents can be added, replaced and deleted one by one,
+    so the index is updated incrementally by ingestion.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._mtime = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def load(self):
+        with self._lock:
+            self._docs, self._postings, self._total_length = {}, {}, 0
+            if not os.path.exists(self.path):
+                return
+            try:
+                self._mtime = os.stat(self.path).st_mtime
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read BM25 index {self.path}: {e}")
+                return
+            for doc_id, doc in data.get("docs", {}).items():
+                self._index(doc_id, doc)
+
+    def reload_if_changed(self):
+        """Picks up an index rewritten by another process (e.g. `ingest.py`)."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            logger.info("BM25 index changed on disk, reloading")
+            self.load()
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": BM25_INDEX_VERSION, "docs": self._docs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime
+
+    def _index(self, doc_id: str, doc: Dict[str, Any]):
+        self._docs[doc_id] = doc
+        self._total_length += doc["len"]
+        for term, tf in doc["tf"].items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _unindex(self, doc_id: str):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc["len"]
+        for term in doc["tf"]:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]] = None):
+        """Adds or replaces documents."""
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            for doc_id, text, meta in zip(ids, texts, metadatas):
+                self._unindex(doc_id)
+                tokens = tokenize(text)
+                self._index(doc_id, {"tf": dict(Counter(tokens)), "len": len(tokens), "meta": meta or {}})
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._unindex(doc_id)
+
+    def search(self, query: str, k: int = 10, where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Returns the top k (id, score) pairs for the query, restricted to the
+        documents whose metadata match the ChromaDB-style `where` clause."""
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_len = self._total_length / n_docs or 1.0
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    doc = self._docs[doc_id]
+                    if where and not matches_where(doc["meta"], where):
+                        continue
+                    doc_len = doc["len"]
+                    norm = tf + self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,123 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import tiktoken
+from unihelp.rag.embedding_cache import normalize_text
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+_CHUNK_INDEX_RE = re.compile(r'_chunk_(\d+)$')
+
+# Shorter common prefixes/suffixes are treated as coincidences, not chunker overlap
+_MIN_OVERLAP_CHARS = 20
+
+# Below this many tokens left, a truncated trailing block is not worth adding
+_MIN_TRUNCATED_TOKENS = 50
+
+
+def chunk_index(doc: Dict[str, Any]) -> Optional[int]:
+    """Position of a chunk in its source file (metadata, or the `{source}_chunk_{i}` ID)."""
+    index = doc.get("metadata", {}).get("chunk_index")
+    if index is not None:
+        return int(index)
+    match = _CHUNK_INDEX_RE.search(doc.get("id") or "")
+    return int(match.group(1)) if match else None
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int) -> str:
+    """Removes from `following` the prefix it repeats from the end of `previous`
+    (the overlap added by `SemanticChunker`)."""
+    limit = min(len(previous), len(following), max_overlap)
+    for size in range(limit, _MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:].lstrip()
+    return following
+
+
+class ContextPacker:
+    """
+    Builds the prompt context from retrieved chunks:
+    - identical chunks are kept once,
+    - consecutive chunks of the same source are merged, without their overlap,
+    - blocks are added in retrieval order until `max_tokens` (counted with the
+      LLM's tokenizer) is reached; the last block is truncated to fit.
+    """
+
+    def __init__(self, max_tokens: int = 1500, model: str = "gpt-4o-mini", max_overlap_chars: int = 400):
+        self.max_tokens = max_tokens
+        self.max_overlap_chars = max_overlap_chars
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Models unknown to tiktoken (local or OpenAI-compatible servers): generic encoding
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Air-gapped hosts cannot download the BPE files: fall back to an estimate
+            logger.warning(f"Tokenizer for {model} unavailable ({e}), estimating 4 characters per token")
+            self.encoding = None
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text)[:max_tokens])
+
+    def _merge(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Deduplicates and merges adjacent chunks; blocks keep the best rank of their chunks."""
+        seen = set()
+        by_source: Dict[str, List[Tuple[Optional[int], int, Dict[str, Any]]]] = {}
+        for rank, doc in enumerate(docs):
+            key = normalize_text(doc["page_content"])
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            # Files sharing a name in different directories have distinct source IDs
+            source = doc["metadata"].get("source_id") or doc["metadata"].get("source", "Unknown")
+            by_source.setdefault(source, []).append((chunk_index(doc), rank, doc))
+
+        blocks = []
+        for chunks in by_source.values():
+            chunks.sort(key=lambda item: (item[0] is None, item[0] if item[0] is not None else item[1]))
+            current = None
+            for index, rank, doc in chunks:
+                if current is not None and index is not None and current["last_index"] is not None and index == current["last_index"] + 1:
+                    addition = strip_overlap(current["content"], doc["page_content"], self.max_overlap_chars)
+                    current["content"] = f"{current['content']}\n{addition}" if addition else current["content"]
+                    current["last_index"] = index
+                    current["rank"] = min(current["rank"], rank)
+                    continue
+                current = {"metadata": doc["metadata"], "content": doc["page_content"], "last_index": index, "rank": rank}
+                blocks.append(current)
+
+        blocks.sort(key=lambda block: block["rank"])
+        return blocks
+
+    def pack(self, docs: List[Dict[str, Any]], header=None) -> List[Dict[str, Any]]:
+        """
+        Returns the blocks that fit in the token budget, as {"metadata", "content"}.
+        `header(i, metadata)` renders the line placed before each block; it counts
+        towards the budget.
+        """
+        packed = []
+        remaining = self.max_tokens
+        for block in self._merge(docs):
+            prefix = header(len(packed), block["metadata"]) if header else ""
+            cost = self.count_tokens(f"{prefix}\n{block['content']}\n\n")
+            if cost <= remaining:
+                packed.append({"metadata": block["metadata"], "content": block["content"]})
+                remaining -= cost
+                continue
+            available = remaining - self.count_tokens(f"{prefix}\n\n\n")
+            if available >= _MIN_TRUNCATED_TOKENS or not packed:
+                content = self.truncate(block["content"], max(available, 0))
+                packed.append({"metadata": block["metadata"], "content": content})
+                remaining -= self.count_tokens(f"{prefix}\n{content}\n\n")
+            break
+
+        logger.info(f"Packed {len(packed)} context blocks from {len(docs)} chunks ({self.max_tokens - max(remaining, 0)}/{self.max_tokens} tokens)")
+        return packed
@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from unihelp.core.config import settings
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# A conversation is {"summary": str, "turns": [{"question": str, "answer": str}, ...]}:
+# the recent turns verbatim, and a running summary of the older ones
+Conversation = Dict[str, Any]
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def new_conversation() -> Conversation:
+    return {"summary": "", "turns": []}
+
+
+class InMemoryConversationStore:
+    """
+    Conversations of the current process: at most `max_sessions`, the least
+    recently used ones evicted first, and dropped after `ttl_seconds` without
+    activity. Sessions are lost on restart and not shared between API workers.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Conversation]:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            updated_at, conversation = entry
+            if time.time() - updated_at > self.ttl_seconds:
+                del self._data[session_id]
+                return None
+            self._data.move_to_end(session_id)
+            return json.loads(conversation)
+
+    def save(self, session_id: str, conversation: Conversation):
+        with self._lock:
+            # Stored serialized, so callers never share a mutable conversation
+            self._data[session_id] = (time.time(), json.dumps(conversation, ensure_ascii=False))
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteConversationStore:
+    """
+    Same contract as `InMemoryConversationStore`, in a local SQLite file: sessions
+    survive restarts and are shared by all the API workers of the host.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 1000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at)")
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM conversations WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id: str, conversation: Conversation):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversations (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(conversation, ensure_ascii=False), now)
+            )
+            # Expired sessions, then the least recently used ones over the limit
+            self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM conversations WHERE session_id IN ("
+                "SELECT session_id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def build_conversation_store():
+    """Conversation store selected by CONVERSATION_BACKEND ("memory" or "sqlite")."""
+    if settings.CONVERSATION_BACKEND == "memory":
+        return InMemoryConversationStore(settings.CONVERSATION_MAX_SESSIONS, settings.CONVERSATION_TTL_SECONDS)
+    if settings.CONVERSATION_BACKEND == "sqlite":
+        logger.info(f"Storing conversations in {settings.CONVERSATION_DB_PATH}")
+        return SQLiteConversationStore(
+            settings.CONVERSATION_DB_PATH,
+            settings.CONVERSATION_MAX_SESSIONS,
+            settings.CONVERSATION_TTL_SECONDS
+        )
+    raise ValueError(f"Unknown CONVERSATION_BACKEND: {settings.CONVERSATION_BACKEND} (expected 'memory' or 'sqlite')")
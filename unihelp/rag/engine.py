@@ -1,25 +1,53 @@
+import asyncio
 import os
 from dateutil import parser as date_parser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from unihelp.rag.vector_store import VectorStore
+from unihelp.rag.answer_cache import SemanticAnswerCache
+from unihelp.rag.filters import build_where, infer_filters
+from unihelp.rag.reranker import CrossEncoderReranker
+from unihelp.rag.context import ContextPacker
+from unihelp.rag.conversations import build_conversation_store, new_conversation
+from unihelp.processor.cleaner import TextCleaner
 from unihelp.core.config import settings
+from unihelp.core.llm import build_chat_llm
 from unihelp.core.logging import setup_logger
+from unihelp.core.timing import timed
+from unihelp.core.metrics import record_stages
 
 logger = setup_logger(__name__)
 
+NO_CONTEXT_ANSWER = "Désolé, je ne trouve aucun document relatif à votre demande."
+
+# Previous answers are cut to this length in the history given to the condense prompt
+HISTORY_ANSWER_CHARS = 1000
+
 class RAGEngine:
-    def __init__(self):
-        self.vector_store = VectorStore()
+    def __init__(self, vector_store: VectorStore = None):
+        # Share the caller's store when given, so the embedding model is only loaded once
+        self.vector_store = vector_store or VectorStore()
         
         # We use a robust model like GPT-4o-mini or GPT-3.5-turbo 
         # based on availability. Assuming the user has a standard setup.
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.1,  # Low temp for factual answers
-            api_key=settings.OPENAI_API_KEY
+        self.llm = build_chat_llm(temperature=0.1)  # Low temp for factual answers
+
+        # Optional second stage: retrieve a wide candidate set, keep the best k after cross-encoding
+        self.reranker = None
+        if settings.RERANKER_ENABLED:
+            self.reranker = CrossEncoderReranker(
+                settings.RERANKER_MODEL_NAME,
+                batch_size=settings.RERANK_BATCH_SIZE,
+                time_budget_ms=settings.RERANK_TIME_BUDGET_MS
+            )
+
+        self.context_packer = ContextPacker(max_tokens=settings.CONTEXT_MAX_TOKENS, model=settings.LLM_MODEL)
+
+        # Near-duplicate questions are answered from memory until the collection changes
+        self.answer_cache = SemanticAnswerCache(
+            max_entries=settings.ANSWER_CACHE_SIZE,
+            threshold=settings.ANSWER_CACHE_THRESHOLD
         )
         
         # Simple prompt that enforces grounding and multi-lingual behavior
@@ -40,48 +68,454 @@ Guidelines:
 - Do not make up any policies."""),
             ("human", "{question}")
         ])
+        self.chain = self.prompt | self.llm | StrOutputParser()
+
+        # Multi-turn chat: follow-ups are rewritten into standalone questions before
+        # retrieval, and the older turns of a conversation are folded into a summary
+        self.conversations = build_conversation_store()
+        self.condense_chain = ChatPromptTemplate.from_messages([
+            ("system", """Given a conversation between a student and UniHelp and a follow-up question, rewrite the follow-up into a standalone question that can be understood without the conversation.
+Keep the language of the follow-up question. Keep names, dates, programs and departments it refers to.
+If the follow-up is already standalone, return it unchanged. Return ONLY the question.
+
+Conversation:
+{history}"""),
+            ("human", "{question}")
+        ]) | self.llm | StrOutputParser()
+        self.summary_chain = ChatPromptTemplate.from_messages([
+            ("system", """Summarize this conversation between a student and UniHelp in at most 5 sentences, in the language of the conversation.
+Keep what the student is asking about (procedures, programs, dates, departments) and the key facts of the answers.
+
+Summary so far:
+{summary}"""),
+            ("human", "{turns}")
+        ]) | self.llm | StrOutputParser()
         
+    @staticmethod
+    def _source_header(i: int, meta: dict) -> str:
+        return f"[Source {i+1}: {meta.get('document_type', 'Document')} from {meta.get('department', 'University')}]"
+
     def _format_docs(self, docs):
+        # Merge adjacent chunks, drop overlap/duplicates and fit the token budget
+        blocks = self.context_packer.pack(docs, header=self._source_header)
+        
         formatted = []
         sources = []
-        for i, doc in enumerate(docs):
-            content = doc["page_content"]
-            meta = doc["metadata"]
+        for i, block in enumerate(blocks):
+            content = block["content"]
+            meta = block["metadata"]
             
             # Format metadata
-            source_desc = f"[Source {i+1}: {meta.get('document_type', 'Document')} from {meta.get('department', 'University')}]"
+            source_desc = self._source_header(i, meta)
             sources.append({
                 "id": i+1,
                 "file": meta.get("source", "Unknown"),
                 "department": meta.get("department", ""),
-                "date": meta.get("date", "")
+                "date": meta.get("date", ""),
+                **{field: meta[field] for field in ("page", "sheet") if field in meta}
             })
             
             formatted.append(f"{source_desc}\n{content}")
             
         return "\n\n".join(formatted), sources
 
-    def answer(self, question: str, k: int = 4):
-        logger.info(f"Answering query: {question}")
+    def _auto_filters(self, question: str, language: str) -> dict:
+        if not settings.AUTO_FILTERS_ENABLED:
+            return None
+        auto_filters = infer_filters(
+            question,
+            language,
+            known_languages=self.vector_store.get_metadata_values("language"),
+            known_departments=self.vector_store.get_metadata_values("department")
+        )
+        if auto_filters:
+            logger.info(f"Applying automatic filters: {auto_filters}")
+        return auto_filters
+
+    def _retrieve(self, question: str, k: int, embedding, language: str, filters: dict = None):
+        """
+        Explicit filters are always enforced. Without them, filters inferred from the
+        question (its language, a mentioned department) are tried first and dropped
+        if they leave no candidate.
+        """
+        if filters:
+            return self.vector_store.similarity_search(question, k=k, embedding=embedding, where=build_where(filters))
         
-        # 1. Retrieve raw documents
-        docs = self.vector_store.similarity_search(question, k=k)
+        auto_filters = self._auto_filters(question, language)
+        if auto_filters:
+            docs = self.vector_store.similarity_search(question, k=k, embedding=embedding, where=build_where(auto_filters))
+            if docs:
+                return docs
         
+        return self.vector_store.similarity_search(question, k=k, embedding=embedding)
+
+    def _retrieve_many(self, questions: list, k: int, embeddings: list, languages: list, filters: dict = None):
+        """`_retrieve` for a batch of questions, with the same filter rules."""
+        if filters:
+            wheres = [build_where(filters)] * len(questions)
+        else:
+            wheres = [build_where(self._auto_filters(question, language)) for question, language in zip(questions, languages)]
+        results = self.vector_store.similarity_search_many(questions, k, embeddings, wheres)
+        
+        # Automatic filters that leave no candidate are dropped, as in `_retrieve`
+        retry = [i for i, docs in enumerate(results) if not docs and wheres[i] and not filters]
+        if retry:
+            unfiltered = self.vector_store.similarity_search_many(
+                [questions[i] for i in retry], k, [embeddings[i] for i in retry], [None] * len(retry)
+            )
+            for i, docs in zip(retry, unfiltered):
+                results[i] = docs
+        return results
+
+    def _lookup(self, question: str, k: int, filters: dict, query_embedding, timings: dict):
+        """
+        Checks the semantic answer cache. The answer language must match the
+        question, so the detected language is part of the cache scope. Returns
+        the language, the key to cache the answer under and the cached result.
+        """
+        with timed(timings, "langdetect"):
+            language = TextCleaner.detect_language(question)
+        with timed(timings, "cache_lookup"):
+            generation = self.vector_store.get_generation()
+            scope = (k, language, tuple(sorted((field, str(value)) for field, value in (filters or {}).items())))
+            cached = self.answer_cache.lookup(query_embedding, scope, generation)
+        return language, (query_embedding, scope, generation), cached
+
+    def _build_context(self, question: str, k: int, docs: list, cache_key: tuple, timings: dict):
+        """Reranks the retrieved documents and formats them into the prompt context."""
         if not docs:
             logger.warning("No context found for query.")
-            return {
-                "answer": "Désolé, je ne trouve aucun document relatif à votre demande.",
-                "sources": []
-            }
+            return {"result": {"answer": NO_CONTEXT_ANSWER, "sources": []}, "timings": timings}
+        
+        if self.reranker:
+            with timed(timings, "rerank"):
+                docs, rerank_stats = self.reranker.rerank(question, docs, top_n=k)
+            logger.info(f"Reranked {rerank_stats['scored']}/{rerank_stats['candidates']} candidates in {rerank_stats['ms']}ms")
             
-        # 2. Format documents into prompt context
-        context_str, sources = self._format_docs(docs)
+        with timed(timings, "format"):
+            context_str, sources = self._format_docs(docs)
+        return {
+            "context": context_str,
+            "sources": sources,
+            "cache_key": cache_key,
+            "timings": timings
+        }
+
+    def _n_candidates(self, k: int) -> int:
+        # A wider candidate set when they get reranked
+        return max(k, settings.RERANK_CANDIDATES) if self.reranker else k
+
+    def _prepare(self, question: str, k: int, filters: dict = None):
+        """
+        Steps shared by `answer` and `stream_answer` before generation. Returns either
+        {"result": ...} when no LLM call is needed (cache hit, no context), or the
+        prompt "context" with its "sources" and the key to cache the answer under.
+        Per-stage durations (ms) are collected in "timings".
+        """
+        timings = {}
         
-        # 3. Generate Answer
-        chain = self.prompt | self.llm | StrOutputParser()
-        response = chain.invoke({"context": context_str, "question": question})
+        # 1. Check the semantic answer cache
+        with timed(timings, "embed"):
+            query_embedding = self.vector_store.embed_query(question)
+        language, cache_key, cached = self._lookup(question, k, filters, query_embedding, timings)
+        if cached is not None:
+            return {"result": cached, "timings": timings}
         
-        return {
-            "answer": response,
-            "sources": sources
+        # 2. Retrieve raw documents
+        with timed(timings, "retrieve"):
+            docs = self._retrieve(question, self._n_candidates(k), query_embedding, language, filters)
+        
+        # 3. Format documents into prompt context
+        return self._build_context(question, k, docs, cache_key, timings)
+
+    def _prepare_many(self, questions: list, k: int, filters: dict = None):
+        """
+        `_prepare` for a batch: the questions are embedded in one model call and
+        retrieved together. Returns the prepared questions, in input order, and the
+        durations of the batched stages.
+        """
+        batch_timings = {}
+        with timed(batch_timings, "embed"):
+            embeddings = self.vector_store.embed_queries(questions)
+        
+        prepared = [None] * len(questions)
+        pending = []
+        for i, (question, embedding) in enumerate(zip(questions, embeddings)):
+            timings = {}
+            language, cache_key, cached = self._lookup(question, k, filters, embedding, timings)
+            if cached is not None:
+                prepared[i] = {"result": cached, "timings": timings}
+            else:
+                pending.append((i, language, cache_key, timings))
+        
+        if pending:
+            with timed(batch_timings, "retrieve"):
+                results = self._retrieve_many(
+                    [questions[i] for i, _, _, _ in pending],
+                    self._n_candidates(k),
+                    [embeddings[i] for i, _, _, _ in pending],
+                    [language for _, language, _, _ in pending],
+                    filters
+                )
+            for (i, _, cache_key, timings), docs in zip(pending, results):
+                prepared[i] = self._build_context(questions[i], k, docs, cache_key, timings)
+        return prepared, batch_timings
+
+    def _remember(self, question: str, prepared: dict, answer: str) -> dict:
+        result = {
+            "answer": answer,
+            "sources": prepared["sources"]
         }
+        query_embedding, scope, generation = prepared["cache_key"]
+        self.answer_cache.store(question, query_embedding, scope, generation, result)
+        return result
+
+    @staticmethod
+    def _with_timings(result: dict, timings: dict) -> dict:
+        record_stages("rag", timings)
+        return {**result, "timings": timings}
+
+    def answer(self, question: str, k: int = 4, filters: dict = None):
+        logger.info(f"Answering query: {question}")
+        
+        prepared = self._prepare(question, k, filters)
+        timings = prepared["timings"]
+        if "result" in prepared:
+            return self._with_timings(prepared["result"], timings)
+        
+        # 4. Generate Answer
+        with timed(timings, "generate"):
+            response = self.chain.invoke({"context": prepared["context"], "question": question})
+        return self._with_timings(self._remember(question, prepared, response), timings)
+
+    def stream_answer(self, question: str, k: int = 4, filters: dict = None):
+        """
+        Generator version of `answer`: yields a {"type": "sources"} event as soon as
+        retrieval is done, then {"type": "token"} events while the LLM generates,
+        and finally a {"type": "timings"} event.
+        """
+        logger.info(f"Streaming answer for query: {question}")
+        
+        prepared = self._prepare(question, k, filters)
+        timings = prepared["timings"]
+        if "result" in prepared:
+            yield {"type": "sources", "sources": prepared["result"]["sources"]}
+            yield {"type": "token", "content": prepared["result"]["answer"]}
+            record_stages("rag", timings)
+            yield {"type": "timings", "timings": timings}
+            return
+        
+        yield {"type": "sources", "sources": prepared["sources"]}
+        
+        parts = []
+        with timed(timings, "generate"):
+            for token in self.chain.stream({"context": prepared["context"], "question": question}):
+                parts.append(token)
+                yield {"type": "token", "content": token}
+        self._remember(question, prepared, "".join(parts))
+        record_stages("rag", timings)
+        yield {"type": "timings", "timings": timings}
+
+    async def aanswer(self, question: str, k: int = 4, filters: dict = None):
+        """Async `answer`: retrieval runs in a worker thread, the LLM call is awaited
+        on the shared async HTTP client so no thread is held while waiting on OpenAI."""
+        logger.info(f"Answering query (async): {question}")
+        
+        prepared = await asyncio.to_thread(self._prepare, question, k, filters)
+        timings = prepared["timings"]
+        if "result" in prepared:
+            return self._with_timings(prepared["result"], timings)
+        
+        with timed(timings, "generate"):
+            response = await self.chain.ainvoke({"context": prepared["context"], "question": question})
+        return self._with_timings(self._remember(question, prepared, response), timings)
+
+    def answer_many(self, questions: list, k: int = 4, filters: dict = None):
+        """
+        Answers a batch of questions, in input order: one embedding call and one
+        retrieval pass for the whole batch, then the LLM calls run in parallel, at
+        most ASK_BATCH_CONCURRENCY at a time. A failed generation gives an {"error"}
+        result for its question only.
+        """
+        logger.info(f"Answering a batch of {len(questions)} questions")
+        
+        prepared, batch_timings = self._prepare_many(questions, k, filters)
+        
+        pending = [i for i, item in enumerate(prepared) if "result" not in item]
+        with timed(batch_timings, "generate"):
+            responses = self.chain.batch(
+                [{"context": prepared[i]["context"], "question": questions[i]} for i in pending],
+                config={"max_concurrency": settings.ASK_BATCH_CONCURRENCY},
+                return_exceptions=True
+            )
+        record_stages("rag_batch", batch_timings, questions=len(questions))
+        
+        results = [None] * len(questions)
+        for i, item in enumerate(prepared):
+            if "result" in item:
+                results[i] = self._with_timings(item["result"], item["timings"])
+        for i, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Generation failed for batch question {i}: {response}")
+                results[i] = {"error": str(response), "timings": prepared[i]["timings"]}
+                continue
+            results[i] = self._with_timings(self._remember(questions[i], prepared[i], response), prepared[i]["timings"])
+        return {"results": results, "timings": batch_timings}
+
+    async def aanswer_many(self, questions: list, k: int = 4, filters: dict = None):
+        """Async `answer_many`."""
+        results = [None] * len(questions)
+        batch_timings = {}
+        async for i, result in self.astream_answer_many(questions, k, filters, batch_timings):
+            results[i] = result
+        return {"results": results, "timings": batch_timings}
+
+    async def astream_answer_many(self, questions: list, k: int = 4, filters: dict = None, batch_timings: dict = None):
+        """
+        Async generator version of `answer_many`: yields (index, result) as soon as
+        each answer is ready, cached ones first. The LLM calls are awaited on the
+        shared async HTTP client, at most ASK_BATCH_CONCURRENCY at a time. The
+        durations of the batched stages are stored in `batch_timings`.
+        """
+        logger.info(f"Answering a batch of {len(questions)} questions (async)")
+        
+        prepared, timings = await asyncio.to_thread(self._prepare_many, questions, k, filters)
+        if batch_timings is not None:
+            batch_timings.update(timings)
+        record_stages("rag_batch", timings, questions=len(questions))
+        
+        for i, item in enumerate(prepared):
+            if "result" in item:
+                yield i, self._with_timings(item["result"], item["timings"])
+        
+        semaphore = asyncio.Semaphore(settings.ASK_BATCH_CONCURRENCY)
+        
+        async def generate(i: int):
+            item = prepared[i]
+            try:
+                async with semaphore:
+                    with timed(item["timings"], "generate"):
+                        response = await self.chain.ainvoke({"context": item["context"], "question": questions[i]})
+            except Exception as e:
+                logger.error(f"Generation failed for batch question {i}: {e}")
+                return i, {"error": str(e), "timings": item["timings"]}
+            return i, self._with_timings(self._remember(questions[i], item, response), item["timings"])
+        
+        tasks = [asyncio.create_task(generate(i)) for i, item in enumerate(prepared) if "result" not in item]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. client disconnected): stop the remaining calls
+            for task in tasks:
+                task.cancel()
+
+    async def astream_answer(self, question: str, k: int = 4, filters: dict = None):
+        """Async generator version of `stream_answer`."""
+        logger.info(f"Streaming answer for query (async): {question}")
+        
+        prepared = await asyncio.to_thread(self._prepare, question, k, filters)
+        timings = prepared["timings"]
+        if "result" in prepared:
+            yield {"type": "sources", "sources": prepared["result"]["sources"]}
+            yield {"type": "token", "content": prepared["result"]["answer"]}
+            record_stages("rag", timings)
+            yield {"type": "timings", "timings": timings}
+            return
+        
+        yield {"type": "sources", "sources": prepared["sources"]}
+        
+        parts = []
+        with timed(timings, "generate"):
+            async for token in self.chain.astream({"context": prepared["context"], "question": question}):
+                parts.append(token)
+                yield {"type": "token", "content": token}
+        self._remember(question, prepared, "".join(parts))
+        record_stages("rag", timings)
+        yield {"type": "timings", "timings": timings}
+
+    @staticmethod
+    def _format_turns(turns: list) -> str:
+        return "\n".join(
+            f"Student: {turn['question']}\nUniHelp: {turn['answer'][:HISTORY_ANSWER_CHARS]}"
+            for turn in turns
+        )
+
+    async def _acondense(self, conversation: dict, question: str, timings: dict) -> str:
+        """Standalone version of a follow-up question, for retrieval and generation."""
+        if not conversation["turns"] and not conversation["summary"]:
+            return question
+        history = self._format_turns(conversation["turns"])
+        if conversation["summary"]:
+            history = f"Summary of the earlier turns: {conversation['summary']}\n{history}"
+        with timed(timings, "condense"):
+            standalone = await self.condense_chain.ainvoke({"history": history, "question": question})
+        return standalone.strip() or question
+
+    async def _acompact(self, conversation: dict, timings: dict):
+        """
+        Once a conversation has more than CONVERSATION_MAX_TURNS turns, folds the
+        oldest ones into its summary and keeps the most recent half verbatim, so the
+        condense prompt stays bounded however long the conversation gets.
+        """
+        turns = conversation["turns"]
+        if len(turns) <= settings.CONVERSATION_MAX_TURNS:
+            return
+        keep = max(1, settings.CONVERSATION_MAX_TURNS // 2)
+        with timed(timings, "summarize"):
+            conversation["summary"] = (await self.summary_chain.ainvoke({
+                "summary": conversation["summary"] or "(none)",
+                "turns": self._format_turns(turns[:-keep])
+            })).strip()
+        conversation["turns"] = turns[-keep:]
+
+    async def _aload_conversation(self, session_id: str) -> dict:
+        return await asyncio.to_thread(self.conversations.get, session_id) or new_conversation()
+
+    async def _asave_turn(self, session_id: str, conversation: dict, question: str, answer: str, timings: dict):
+        conversation["turns"].append({"question": question, "answer": answer})
+        await self._acompact(conversation, timings)
+        await asyncio.to_thread(self.conversations.save, session_id, conversation)
+
+    async def achat(self, session_id: str, question: str, k: int = 4, filters: dict = None):
+        """
+        One turn of the conversation `session_id`: the question is condensed with the
+        history into a standalone question, answered like `aanswer`, and the turn is
+        added to the conversation. The result also has the "standalone_question".
+        """
+        logger.info(f"Chat turn for session {session_id}: {question}")
+        
+        conversation = await self._aload_conversation(session_id)
+        timings = {}
+        standalone = await self._acondense(conversation, question, timings)
+        result = await self.aanswer(standalone, k, filters)
+        timings.update(result["timings"])
+        await self._asave_turn(session_id, conversation, question, result["answer"], timings)
+        return {**result, "standalone_question": standalone, "timings": timings}
+
+    async def astream_chat(self, session_id: str, question: str, k: int = 4, filters: dict = None):
+        """Async generator version of `achat`: a {"type": "question"} event with the
+        standalone question, then the events of `astream_answer`."""
+        logger.info(f"Streaming chat turn for session {session_id}: {question}")
+        
+        conversation = await self._aload_conversation(session_id)
+        timings = {}
+        standalone = await self._acondense(conversation, question, timings)
+        yield {"type": "question", "standalone_question": standalone}
+        
+        parts = []
+        async for event in self.astream_answer(standalone, k, filters):
+            if event["type"] == "token":
+                parts.append(event["content"])
+            elif event["type"] == "timings":
+                timings.update(event["timings"])
+                # The turn is saved before the last event, so the next question sees it
+                await self._asave_turn(session_id, conversation, question, "".join(parts), timings)
+                event = {"type": "timings", "timings": timings}
+            yield event
+
+    async def aget_conversation(self, session_id: str):
+        return await asyncio.to_thread(self.conversations.get, session_id)
+
+    async def adelete_conversation(self, session_id: str):
+        await asyncio.to_thread(self.conversations.delete, session_id)
@@ -0,0 +1,77 @@
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+# Chunk metadata fields written by ingestion that retrieval can be restricted to
+FILTERABLE_FIELDS = ("document_type", "department", "language", "date")
+
+# "Département des affaires académiques" -> "affaires academiques"
+_DEPARTMENT_PREFIX_RE = re.compile(r"^(?:departement|faculte|service)\s+d(?:e\s+l'|es\s+|u\s+|e\s+|')?", re.IGNORECASE)
+
+# Department names too generic to be used for automatic filtering
+_MIN_DEPARTMENT_KEY_LENGTH = 4
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def build_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Turns {"field": value | [values]} into a ChromaDB `where` clause."""
+    if not filters:
+        return None
+    clauses = []
+    for field, value in sorted(filters.items()):
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({field: {"$in": list(value)}})
+        else:
+            clauses.append({field: value})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates the subset of ChromaDB `where` clauses produced by `build_where`."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def infer_filters(question: str, language: str, known_languages: Iterable[str], known_departments: Iterable[str]) -> Dict[str, Any]:
+    """
+    Automatic filters derived from the question: its detected language when the
+    collection holds documents in that language, and the departments it mentions
+    by name (e.g. "affaires académiques").
+    """
+    filters: Dict[str, Any] = {}
+    if language and language != "unknown" and language in set(known_languages):
+        filters["language"] = language
+
+    folded_question = _fold(question)
+    mentioned: List[str] = []
+    for department in known_departments:
+        if not department or department == "Unknown":
+            continue
+        key = _DEPARTMENT_PREFIX_RE.sub("", _fold(department)).strip()
+        if len(key) >= _MIN_DEPARTMENT_KEY_LENGTH and re.search(rf"\b{re.escape(key)}\b", folded_question):
+            mentioned.append(department)
+    if mentioned:
+        filters["department"] = mentioned[0] if len(mentioned) == 1 else sorted(mentioned)
+    return filters
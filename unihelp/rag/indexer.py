@@ -0,0 +1,167 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+from unihelp.rag.vector_store import VectorStore
+from unihelp.core.config import settings
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class IndexingError(Exception):
+    """A batch could not be embedded or stored. The documents with chunks in it
+    have been dropped and their `on_failed` callbacks called."""
+
+    def __init__(self, error: Exception, failed_documents: int):
+        super().__init__(f"Failed to write an embedding batch ({failed_documents} documents dropped): {error}")
+        self.error = error
+        self.failed_documents = failed_documents
+
+
+class BatchIndexer:
+    """
+    Accumulates chunks across documents and writes them to the vector store in
+    fixed-size embedding batches, so that the model always encodes `batch_size`
+    texts per call instead of one document's worth of chunks.
+
+    A document's `on_written` callback runs once all of its chunks are stored,
+    which lets the caller commit per-file bookkeeping (e.g. the ingestion manifest).
+    When a batch fails, only the documents with chunks in it fail: their remaining
+    chunks are dropped, their `on_failed(error)` callback runs, and the write raises
+    an `IndexingError`. The other queued documents are unaffected.
+    """
+
+    def __init__(self, vector_store: VectorStore, batch_size: int = None):
+        self.vector_store = vector_store
+        self.batch_size = max(1, batch_size or settings.EMBEDDING_BATCH_SIZE)
+
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._ids: List[str] = []
+        # [start, end, on_written, on_failed]: the document's chunks in the pending
+        # buffer (start is negative once its first chunks have been written)
+        self._documents: List[list] = []
+
+        self.chunks_written = 0
+        self.chunks_failed = 0
+        self.batches_written = 0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def add(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+        on_written: Optional[Callable[[], None]] = None,
+        on_failed: Optional[Callable[[Exception], None]] = None
+    ):
+        """Queue one document's chunks; full batches are written immediately."""
+        start = len(self._texts)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        self._ids.extend(ids)
+        self._documents.append([start, len(self._texts), on_written, on_failed])
+
+        while len(self._texts) >= self.batch_size:
+            self._write(self.batch_size)
+        self._complete_documents()
+
+    def flush(self):
+        """Write every pending chunk, including a last partial batch. Every batch is
+        attempted; the first failure is raised once the buffer is empty."""
+        failure = None
+        while self._texts:
+            try:
+                self._write(min(self.batch_size, len(self._texts)))
+            except IndexingError as e:
+                failure = failure or e
+        # Documents without any chunk are complete as well
+        self._complete_documents()
+        if failure is not None:
+            raise failure
+
+    def _write(self, size: int):
+        texts, metadatas, ids = self._texts[:size], self._metadatas[:size], self._ids[:size]
+
+        start = time.perf_counter()
+        try:
+            embeddings = self.vector_store.embed_documents(texts)
+            embedded = time.perf_counter()
+            self.vector_store.add_texts(texts=texts, metadatas=metadatas, ids=ids, embeddings=embeddings)
+        except Exception as e:
+            self._fail_batch(size, e)
+        written = time.perf_counter()
+
+        self.embed_seconds += embedded - start
+        self.write_seconds += written - embedded
+        self.chunks_written += size
+        self.batches_written += 1
+
+        del self._texts[:size], self._metadatas[:size], self._ids[:size]
+        for document in self._documents:
+            document[0] -= size
+            document[1] -= size
+        self._complete_documents()
+
+        logger.info(
+            f"Embedded batch of {size} chunks in {embedded - start:.2f}s "
+            f"({size / max(embedded - start, 1e-9):.1f} chunks/sec)"
+        )
+
+    def _fail_batch(self, size: int, error: Exception):
+        """Drops every pending chunk of the documents in the first `size` chunks."""
+        failed = [document for document in self._documents if document[0] < size and document[1] > max(document[0], 0)]
+        logger.error(f"Failed to write a batch of {size} chunks ({len(failed)} documents dropped): {error}")
+
+        dropped = [False] * len(self._texts)
+        for start, end, _, _ in failed:
+            for i in range(max(start, 0), end):
+                dropped[i] = True
+        # Position of each buffer index once the dropped chunks are removed
+        shift, removed_before = [], 0
+        for flag in dropped + [False]:
+            shift.append(removed_before)
+            removed_before += flag
+
+        self._texts = [text for text, flag in zip(self._texts, dropped) if not flag]
+        self._metadatas = [meta for meta, flag in zip(self._metadatas, dropped) if not flag]
+        self._ids = [doc_id for doc_id, flag in zip(self._ids, dropped) if not flag]
+        self.chunks_failed += removed_before
+        failed_ids = {id(document) for document in failed}
+        self._documents = [
+            [document[0] - shift[document[0]], document[1] - shift[document[1]], document[2], document[3]]
+            for document in self._documents
+            if id(document) not in failed_ids
+        ]
+
+        for _, _, _, on_failed in failed:
+            if on_failed is not None:
+                on_failed(error)
+        raise IndexingError(error, len(failed))
+
+    def _complete_documents(self):
+        while self._documents and self._documents[0][1] <= 0:
+            _, _, callback, _ = self._documents.pop(0)
+            if callback is not None:
+                callback()
+
+    @property
+    def chunks_per_second(self) -> float:
+        """Embedding throughput over the whole run (model time only)."""
+        return self.chunks_written / self.embed_seconds if self.embed_seconds else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "chunks": self.chunks_written,
+            "chunks_failed": self.chunks_failed,
+            "batches": self.batches_written,
+            "batch_size": self.batch_size,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "chunks_per_sec": round(self.chunks_per_second, 1),
+        }
+        cache = getattr(self.vector_store.embeddings, "cache", None)
+        if cache is not None:
+            stats["cache_hits"] = cache.hits
+            stats["cache_misses"] = cache.misses
+        return stats
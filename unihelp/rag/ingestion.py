@@ -0,0 +1,278 @@
+import hashlib
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from unihelp.processor.batch import find_documents, process_files
+from unihelp.rag.indexer import BatchIndexer, IndexingError
+from unihelp.rag.manifest import IngestionManifest
+from unihelp.rag.vector_store import VectorStore
+from unihelp.core.config import settings
+from unihelp.core.metrics import record_stages
+from unihelp.core.logging import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialized across processes
+    fcntl = None
+
+logger = setup_logger(__name__)
+
+# The manifest is rewritten periodically so an interrupted run keeps most of its progress
+MANIFEST_SAVE_EVERY = 50
+
+# Provenance recorded on chunks by the processor: page / sheet when the format has
+# it, and the character offsets of the chunk in the cleaned document
+PROVENANCE_FIELDS = ("page", "page_end", "sheet", "sheet_end", "start_offset", "end_offset")
+
+def source_id(key: str) -> str:
+    """Identifier of a raw file derived from its manifest key (resolved absolute path). It is
+    part of the IDs and metadata of the file's chunks, so that files sharing a name in
+    different directories never overwrite or purge each other's chunks."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+@contextmanager
+def ingestion_lock(manifest_path: str):
+    """Serializes the ingestion runs of a manifest across processes (`ingest.py`,
+    API workers): a second run waits for the first one to finish."""
+    lock_path = f"{manifest_path}.lock"
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(lock_path, "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        # Released when the file is closed
+        yield
+
+# Called as progress(event, **fields): "start" (files_total), then "file_done" (file,
+# chunks) once a file's chunks are stored, or "file_failed" (file, error)
+ProgressCallback = Callable[..., None]
+
+def ingest_data(
+    raw_data_dir: str = "data/raw",
+    workers: int = 1,
+    full: bool = False,
+    batch_size: int = None,
+    vector_store: VectorStore = None,
+    progress: Optional[ProgressCallback] = None
+):
+    """
+    Ingests the documents of `raw_data_dir` and returns the run statistics.
+    `vector_store` lets a long-running process (the API) reuse its store and
+    embedding model instead of loading a second copy.
+    """
+    progress = progress or (lambda event, **fields: None)
+
+    # 1. Initialize Vector DB (documents are parsed by `process_files`, in worker processes when workers > 1)
+    if vector_store is None:
+        try:
+            vector_store = VectorStore()
+        except Exception as e:
+            logger.error(f"Failed to initialize Vector Store: {e}")
+            return None
+
+    with ingestion_lock(settings.INGEST_MANIFEST_PATH):
+        return _ingest(raw_data_dir, workers, full, batch_size, vector_store, progress)
+
+def _ingest(raw_data_dir: str, workers: int, full: bool, batch_size: int, vector_store: VectorStore, progress: ProgressCallback):
+    manifest = IngestionManifest(settings.INGEST_MANIFEST_PATH)
+    # Another process (`ingest.py`, an API worker) may have ingested since this store was loaded
+    vector_store.reload_side_indexes()
+    start = time.perf_counter()
+
+    # 2. Find documents and compare them against the manifest
+    root = os.path.realpath(raw_data_dir)
+    files = find_documents(raw_data_dir)
+    keys = {f: os.path.realpath(f) for f in files}
+    # Paths relative to the raw directory, for logs and job progress
+    names = {f: os.path.relpath(f, raw_data_dir).replace(os.sep, "/") for f in files}
+    manifest.adopt_relative_keys(root)
+
+    files_to_process = []
+    file_states = {}
+    for filepath in files:
+        state = manifest.check(keys[filepath], filepath, force=full)
+        if state is not None:
+            files_to_process.append(filepath)
+            file_states[filepath] = state
+
+    logger.info(
+        f"Found {len(files)} documents, {len(files_to_process)} new or changed "
+        f"(workers={workers}, full={full})."
+    )
+    progress("start", files_total=len(files_to_process))
+
+    changed = False
+    files_failed = 0
+    # Tokens the embedding model will see, and what it drops past its max sequence length
+    # (measured in tokens mode only: chars mode does not load the tokenizer)
+    token_stats = {"chunk_tokens": 0, "truncated_chunks": 0, "truncated_tokens": 0}
+
+    # 3. Purge the chunks of files that disappeared from the raw directory (files
+    # ingested from other directories are left alone)
+    removed_keys = set(manifest.keys_under(root)) - set(keys.values())
+    for key in sorted(removed_keys):
+        stale_ids = manifest.remove(key)
+        vector_store.delete(ids=stale_ids)
+        changed = True
+        logger.info(f"Removed {len(stale_ids)} chunks of deleted file {key}")
+
+    # Chunk IDs recorded in the manifest, computed on first use (see the purge below)
+    owned_ids = None
+
+    # Chunks are accumulated across files and embedded in batches of `batch_size`
+    indexer = BatchIndexer(vector_store, batch_size=batch_size)
+    files_done = 0
+
+    def on_written(key, name, state, ids):
+        nonlocal files_done
+        manifest.record(key, state, ids)
+        progress("file_done", file=name, chunks=len(ids))
+        files_done += 1
+        if files_done % MANIFEST_SAVE_EVERY == 0:
+            vector_store.persist()
+            manifest.save()
+
+    def on_failed(name, error):
+        # The file stays out of the manifest (or keeps its old entry), so the next run retries it
+        nonlocal files_failed
+        logger.error(f"Error writing the chunks of {name}: {error}")
+        files_failed += 1
+        progress("file_failed", file=name, error=str(error))
+
+    # 4. Ingest each file as soon as it has been processed. Parsing keeps running in the
+    # worker pool while this (consumer) loop embeds and writes to ChromaDB.
+    pipeline_kwargs = {"chunking_mode": settings.CHUNKING_MODE}
+    if settings.CHUNKING_MODE == "tokens":
+        pipeline_kwargs.update(embedding_model=settings.EMBEDDING_MODEL_NAME, max_chunk_tokens=settings.CHUNK_MAX_TOKENS or None)
+    for filepath, processed_data, error in process_files(files_to_process, workers=workers, pipeline_kwargs=pipeline_kwargs):
+        if error is not None:
+            logger.error(f"Error processing {filepath}: {error}")
+            progress("file_failed", file=names[filepath], error=str(error))
+            files_failed += 1
+            continue
+        # Stage timings are measured in the worker that parsed the file
+        record_stages("pipeline", processed_data.get("timings", {}), file=names[filepath])
+        tokens = processed_data.get("tokens", {})
+        token_stats["chunk_tokens"] += tokens.get("total", 0)
+        token_stats["truncated_chunks"] += tokens.get("truncated_chunks", 0)
+        token_stats["truncated_tokens"] += tokens.get("truncated_tokens", 0)
+        if tokens.get("truncated_chunks"):
+            logger.warning(
+                f"{tokens['truncated_chunks']} chunks of {filepath} exceed the embedding model's "
+                f"{tokens['max_tokens']} tokens ({tokens['truncated_tokens']} tokens will be ignored)"
+            )
+        try:
+            # Prepare for ingestion
+            texts = []
+            metadatas = []
+            ids = []
+
+            base_meta = processed_data.get("metadata", {})
+            file_lang = processed_data.get("language", "unknown")
+            key = keys[filepath]
+            file_id = source_id(key)
+
+            for chunk in processed_data.get("chunks", []):
+                content = chunk.get("content", "").strip()
+                if not content:
+                    continue
+
+                chunk_id = f"{base_meta.get('source_file')}_{file_id}_chunk_{chunk.get('chunk_id')}"
+
+                # We blend the document level metadata with chunk level stuff
+                meta = {
+                    "source": base_meta.get('source_file', 'unknown'),
+                    "source_id": file_id,
+                    "document_type": base_meta.get('document_type', 'unknown'),
+                    "department": base_meta.get('department', 'unknown'),
+                    "date": base_meta.get('date', 'unknown') or 'unknown',
+                    "language": file_lang,
+                    "chunk_index": chunk.get('chunk_id')
+                }
+                meta.update({field: chunk[field] for field in PROVENANCE_FIELDS if field in chunk})
+
+                texts.append(content)
+                metadatas.append(meta)
+                ids.append(chunk_id)
+
+            entry = manifest.get(key)
+            if entry is None:
+                # Unknown to the manifest (first run on an existing index): drop whatever
+                # was ingested earlier for this file so that no orphan chunks remain. Older
+                # indexes named chunks after the file name only: those are dropped too,
+                # unless a file of the manifest owns them.
+                if owned_ids is None:
+                    owned_ids = {doc_id for known in manifest.files.values() for doc_id in known.get("chunk_ids", [])}
+                legacy_id = re.compile(rf"{re.escape(str(base_meta.get('source_file')))}_chunk_\d+")
+                orphan_ids = vector_store.get_ids(where={"source_id": file_id}) + [
+                    doc_id for doc_id in vector_store.get_ids(where={"source": base_meta.get('source_file')})
+                    if legacy_id.fullmatch(doc_id) and doc_id not in owned_ids
+                ]
+                vector_store.delete(ids=orphan_ids)
+            else:
+                stale_ids = sorted(set(entry.get("chunk_ids", [])) - set(ids))
+                vector_store.delete(ids=stale_ids)
+
+            # The manifest entry is only committed once all chunks are in the store
+            changed = True
+            logger.info(f"Queuing {len(texts)} chunks from {filepath}")
+            try:
+                indexer.add(
+                    texts, metadatas, ids,
+                    on_written=lambda k=key, n=names[filepath], st=file_states[filepath], i=ids: on_written(k, n, st, i),
+                    on_failed=lambda error, n=names[filepath]: on_failed(n, error)
+                )
+            except IndexingError:
+                # Already counted, through `on_failed`, for the files of the failed batch
+                pass
+
+        except Exception as e:
+            logger.error(f"Error ingesting {filepath}: {e}")
+            progress("file_failed", file=names[filepath], error=str(e))
+            files_failed += 1
+
+    try:
+        indexer.flush()
+    except IndexingError:
+        # Already counted, through `on_failed`, for the files of the failed batches
+        pass
+    finally:
+        # Any other error fails the run, but what was written so far is committed first
+        if changed:
+            manifest.bump_generation()
+        vector_store.persist()
+        manifest.save()
+    elapsed = time.perf_counter() - start
+
+    stats = indexer.stats()
+    logger.info(
+        f"Ingestion complete. Total chunks added: {stats['chunks']} in {stats['batches']} batches "
+        f"(batch_size={stats['batch_size']}, {stats['chunks_per_sec']} chunks/sec embedding, "
+        f"{stats['embed_seconds']}s embedding, {stats['write_seconds']}s writing)"
+    )
+    if "cache_hits" in stats:
+        logger.info(f"Embedding cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+    if settings.CHUNKING_MODE == "tokens":
+        logger.info(
+            f"Embedding truncation: {token_stats['truncated_chunks']} chunks truncated, "
+            f"{token_stats['truncated_tokens']}/{token_stats['chunk_tokens']} tokens dropped"
+        )
+
+    # Print stats
+    collection_stats = vector_store.get_collection_stats()
+    logger.info(f"ChromaDB Collection now contains {collection_stats['count']} total chunks.")
+
+    files_ingested = len(files_to_process) - files_failed
+    return {
+        **stats,
+        **token_stats,
+        "files_found": len(files),
+        "files_ingested": files_ingested,
+        "files_failed": files_failed,
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(files_ingested / elapsed, 2) if elapsed else 0.0,
+        "total_chunks": collection_stats["count"],
+    }
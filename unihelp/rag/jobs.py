@@ -0,0 +1,136 @@
+import copy
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from unihelp.rag.ingestion import ingest_data
+from unihelp.rag.vector_store import VectorStore
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Errors kept per job (the first ones), so a broken upload does not grow the job without bound
+MAX_JOB_ERRORS = 100
+
+FINISHED_STATUSES = ("succeeded", "completed_with_errors", "failed")
+
+
+class IngestionJobQueue:
+    """
+    Runs ingestion jobs one at a time in a background thread of the API process,
+    with its already-loaded `VectorStore` (and embedding model). Each job is a
+    dict with its status ("queued", "running", then "succeeded", "completed_with_errors"
+    when some files could not be ingested, or "failed" when the run itself failed), progress
+    (files done/failed out of files_total, chunks written, chunks/sec), the
+    errors of the files that could not be ingested and, once finished, the run
+    statistics of `ingest_data`. The last `max_jobs` jobs are kept in memory.
+    """
+
+    def __init__(self, vector_store: VectorStore, raw_data_dir: str, workers: int = 1, max_jobs: int = 100):
+        self.vector_store = vector_store
+        self.raw_data_dir = raw_data_dir
+        self.workers = workers
+        self.max_jobs = max_jobs
+
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker = None
+
+    def submit(self, full: bool = False, files: List[str] = None) -> Dict[str, Any]:
+        """Queues an ingestion of the raw data directory; `files` are the uploads that triggered it."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "full": full,
+            "uploaded_files": files or [],
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "files_total": None,
+            "files_done": 0,
+            "files_failed": 0,
+            "chunks": 0,
+            "chunks_per_sec": 0.0,
+            "errors": [],
+            "stats": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            # Forget the oldest finished jobs
+            for job_id in [job_id for job_id, old in self._jobs.items() if old["status"] in FINISHED_STATUSES]:
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                del self._jobs[job_id]
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+                self._worker.start()
+        self._queue.put(job["id"])
+        logger.info(f"Queued ingestion job {job['id']} (full={full}, uploaded files={len(job['uploaded_files'])})")
+        return self.get(job["id"])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Jobs, most recent first, without their per-file errors."""
+        with self._lock:
+            return [{**job, "errors": len(job["errors"])} for job in reversed(self._jobs.values())]
+
+    def _update(self, job: Dict[str, Any], **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                self._execute(job)
+            self._queue.task_done()
+
+    def _execute(self, job: Dict[str, Any]):
+        started = time.perf_counter()
+        self._update(job, status="running", started_at=time.time())
+
+        def progress(event: str, **fields):
+            with self._lock:
+                if event == "start":
+                    job["files_total"] = fields["files_total"]
+                elif event == "file_done":
+                    job["files_done"] += 1
+                    job["chunks"] += fields["chunks"]
+                    elapsed = time.perf_counter() - started
+                    job["chunks_per_sec"] = round(job["chunks"] / elapsed, 2) if elapsed else 0.0
+                elif event == "file_failed":
+                    job["files_failed"] += 1
+                    if len(job["errors"]) < MAX_JOB_ERRORS:
+                        job["errors"].append({"file": fields["file"], "error": fields["error"]})
+
+        try:
+            stats = ingest_data(
+                self.raw_data_dir,
+                workers=self.workers,
+                full=job["full"],
+                vector_store=self.vector_store,
+                progress=progress
+            )
+        except Exception as e:
+            logger.error(f"Ingestion job {job['id']} failed: {e}")
+            self._update(job, status="failed", finished_at=time.time(), error=str(e))
+            return
+        if stats is None:
+            logger.error(f"Ingestion job {job['id']} failed: the vector store could not be initialized")
+            self._update(job, status="failed", finished_at=time.time(), error="The vector store could not be initialized")
+            return
+        status = "completed_with_errors" if stats["files_failed"] else "succeeded"
+        self._update(job, status=status, finished_at=time.time(), stats=stats)
+        logger.info(
+            f"Ingestion job {job['id']} {status}: {job['files_done']} files, {job['chunks']} chunks, "
+            f"{job['files_failed']} files failed"
+        )
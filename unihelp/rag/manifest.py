@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Optional
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """Streams a file through SHA-256 without loading it in memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# path -> (mtime, generation), so that readers only re-parse the manifest after it changed
+_generation_cache: Dict[str, tuple] = {}
+
+
+def read_generation(path: str) -> int:
+    """Cheaply returns the current ingestion generation stored in a manifest (0 if none)."""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return 0
+    cached = _generation_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            generation = json.load(f).get("generation", 0)
+    except (OSError, ValueError):
+        return cached[1] if cached else 0
+    _generation_cache[path] = (mtime, generation)
+    return generation
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been ingested: for every raw file (keyed by its
+    resolved absolute path, so runs on different directories never collide) we keep its content hash, mtime, size
+    and the chunk IDs written to the vector store. The `generation` counter is
+    bumped whenever the collection content changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.generation = data.get("generation", 0)
+            self.files = data.get("files", {})
+        except (OSError, ValueError) as e:
+            # A corrupt manifest only costs a full re-ingestion
+            logger.warning(f"Could not read ingestion manifest {self.path}: {e}")
+            self.files = {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "generation": self.generation, "files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(key)
+
+    def keys(self) -> List[str]:
+        return list(self.files.keys())
+
+    def check(self, key: str, file_path: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Returns the current state (sha256, mtime, size) of a file if it needs to be
+        (re-)ingested, or None when it is unchanged since the last ingestion.
+        The file is only hashed when its mtime or size differ from the manifest.
+        """
+        stat = os.stat(file_path)
+        entry = self.files.get(key)
+        if not force and entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            return None
+
+        state = {"sha256": hash_file(file_path), "mtime": stat.st_mtime, "size": stat.st_size}
+        if not force and entry and entry.get("sha256") == state["sha256"]:
+            # Touched but identical content: just remember the new mtime
+            entry["mtime"] = state["mtime"]
+            return None
+        return state
+
+    def record(self, key: str, state: Dict[str, Any], chunk_ids: List[str]):
+        self.files[key] = {**state, "chunk_ids": list(chunk_ids)}
+
+    def adopt_relative_keys(self, root: str):
+        """Rekeys the entries of older manifests, keyed by path relative to the raw data
+        directory, by the absolute path of the file when it exists under `root`. Entries
+        whose file cannot be found there are kept as they are."""
+        for key in [key for key in self.files if not os.path.isabs(key)]:
+            path = os.path.realpath(os.path.join(root, key))
+            if os.path.exists(path) and path not in self.files:
+                self.files[path] = self.files.pop(key)
+
+    def keys_under(self, root: str) -> List[str]:
+        """Keys of the files that were ingested from the directory `root`."""
+        return [
+            key for key in self.files
+            if os.path.isabs(key) and os.path.commonpath([key, root]) == root
+        ]
+
+    def remove(self, key: str) -> List[str]:
+        entry = self.files.pop(key, None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    def bump_generation(self) -> int:
+        self.generation += 1
+        return self.generation
@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from unihelp.rag.filters import matches_where
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+QUANTIZED_INDEX_VERSION = 1
+
+# Rows scored per matrix product, which bounds the float32 copy of the int8 codes
+SCAN_BLOCK_ROWS = 65536
+
+# Up to this many queries, the codes are multiplied without a float32 copy of the block
+# (faster for single queries, slower than one matrix product for larger batches)
+DIRECT_DOT_MAX_QUERIES = 4
+
+# Deleted rows are reclaimed once they make up this share of the files
+COMPACT_RATIO = 0.3
+
+# Data files of one generation: name -> dtype, and whether it holds one value or one vector per row
+_FILES = {
+    "codes": (np.int8, True),
+    "vectors": (np.float32, True),
+    "scales": (np.float32, False),
+    "norms": (np.float32, False),
+}
+
+
+class QuantizedIndex:
+    """
+    Dense vector index for large corpora: each embedding is stored as int8 codes
+    (1 byte per dimension, with a per-row scale) in a memory-mapped file, next to
+    the float32 vectors. A search scans the codes, which all the API workers
+    share through the OS page cache, and re-scores the best `rescore_candidates`
+    exactly against the float vectors, of which only those rows are read from
+    disk. Distances are squared L2, like the Chroma collection.
+
+    Rows are written in place at the end of the files; replaced and deleted rows
+    are tombstoned until they make up COMPACT_RATIO of the index, at which point
+    `save` rewrites the files under a new generation. `index.json` (IDs, metadata
+    for filtering, tombstones, current generation) is replaced last, so readers in other
+    processes always see a consistent index.
+
+    Writers must hold the ingestion lock and call `reload_if_changed` first, as
+    `add` appends after the rows this process knows of.
+    """
+
+    def __init__(self, path: str, rescore_candidates: int = 100):
+        self.path = path
+        self.rescore_candidates = rescore_candidates
+        self.meta_path = os.path.join(path, "index.json")
+
+        self._lock = threading.RLock()
+        self._mtime = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _reset(self):
+        self.dim = None
+        self._generation = 0
+        self._ids: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._deleted = set()
+        self._arrays = None
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def _file_path(self, name: str, generation: int = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.path, f"{name}.{generation}.bin")
+
+    def load(self):
+        with self._lock:
+            self._reset()
+            if not os.path.exists(self.meta_path):
+                return
+            try:
+                self._mtime = os.stat(self.meta_path).st_mtime
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read quantized index {self.meta_path}: {e}")
+                return
+            self.dim = data["dim"]
+            self._generation = data["generation"]
+            self._ids = data["ids"]
+            self._metadatas = data["metadatas"]
+            self._deleted = set(data["deleted"])
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if row not in self._deleted}
+
+    def reload_if_changed(self):
+        """Picks up an index rewritten by another process (e.g. `ingest.py`)."""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            logger.info("Quantized index changed on disk, reloading")
+            self.load()
+
+    def _write_rows(self, name: str, start_row: int, values: np.ndarray):
+        """Writes rows at their position: leftovers of an interrupted run past the
+        committed rows are overwritten instead of shifting the new ones."""
+        dtype, per_dimension = _FILES[name]
+        row_bytes = np.dtype(dtype).itemsize * (self.dim if per_dimension else 1)
+        path = self._file_path(name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(start_row * row_bytes)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def _changed(self):
+        self._arrays = None
+        self._masks = {}
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]] = None):
+        """Adds or replaces vectors. They are visible to other processes after `save`."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            os.makedirs(self.path, exist_ok=True)
+            self.delete(ids)
+
+            # Symmetric per-row quantization: code = round(x / scale), scale = max|x| / 127
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            start_row = len(self._ids)
+            self._write_rows("codes", start_row, codes)
+            self._write_rows("vectors", start_row, vectors)
+            self._write_rows("scales", start_row, scales)
+            self._write_rows("norms", start_row, np.einsum("ij,ij->i", vectors, vectors))
+
+            for doc_id, meta in zip(ids, metadatas):
+                self._rows[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._metadatas.append(meta or {})
+            self._changed()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._deleted.add(row)
+            self._changed()
+
+    def save(self):
+        with self._lock:
+            if self.dim is None:
+                return
+            if len(self._deleted) > COMPACT_RATIO * len(self._ids):
+                self._compact()
+            tmp_path = f"{self.meta_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": QUANTIZED_INDEX_VERSION,
+                    "dim": self.dim,
+                    "generation": self._generation,
+                    "ids": self._ids,
+                    "metadatas": self._metadatas,
+                    "deleted": sorted(self._deleted),
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self.meta_path)
+            self._mtime = os.stat(self.meta_path).st_mtime
+            self._remove_old_generations()
+
+    def _compact(self):
+        """Rewrites the live rows into the files of a new generation."""
+        live = np.array(sorted(self._rows.values()), dtype=np.int64)
+        logger.info(f"Compacting quantized index: {len(live)} live rows, {len(self._deleted)} deleted")
+        arrays = self._map()
+        self._generation += 1
+        for name in _FILES:
+            if os.path.exists(self._file_path(name)):
+                os.remove(self._file_path(name))
+            if len(live):
+                self._write_rows(name, 0, arrays[name][live])
+        self._ids = [self._ids[row] for row in live]
+        self._metadatas = [self._metadatas[row] for row in live]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted = set()
+        self._changed()
+
+    def _remove_old_generations(self):
+        # Processes that still map them keep reading the old inodes until they reload
+        current = {os.path.basename(self._file_path(name)) for name in _FILES}
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".bin") and file_name not in current:
+                os.remove(os.path.join(self.path, file_name))
+
+    def _map(self) -> Dict[str, np.ndarray]:
+        """Memory maps of the rows known to this process."""
+        if self._arrays is None:
+            rows = len(self._ids)
+            self._arrays = {
+                name: np.memmap(self._file_path(name), dtype=dtype, mode="r", shape=(rows, self.dim) if per_dimension else (rows,))
+                for name, (dtype, per_dimension) in _FILES.items()
+            } if rows else {}
+        return self._arrays
+
+    def _mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Rows that are live and match `where`, cached per filter until the index changes."""
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.zeros(len(self._ids), dtype=bool)
+            rows = list(self._rows.values())
+            if where:
+                rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+            mask[rows] = True
+            self._masks[key] = mask
+        return mask
+
+    def search(self, embeddings: List[List[float]], k: int, where: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        """Top k (id, squared L2 distance) of each query embedding, among the vectors
+        whose metadata match the ChromaDB-style `where` clause."""
+        # Snapshot under the lock, scan without it: rows below `n_rows` are never rewritten
+        # in place (appends go after them, compaction writes new files and a new ID list)
+        with self._lock:
+            if not self._rows:
+                return [[] for _ in embeddings]
+            arrays = self._map()
+            allowed = self._mask(where)
+            ids = self._ids
+        n_rows = len(allowed)
+        n_candidates = min(max(self.rescore_candidates, k), int(allowed.sum()))
+        if not n_candidates:
+            return [[] for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        # 1. Approximate distances from the int8 codes (|q|² is the same for all rows)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, n_rows, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, n_rows)
+            block_allowed = allowed[start:stop]
+            if not block_allowed.any():
+                continue
+            codes = arrays["codes"][start:stop]
+            if len(queries) <= DIRECT_DOT_MAX_QUERIES:
+                dots = np.stack([np.einsum("ij,j->i", codes, query) for query in queries], axis=1)
+            else:
+                dots = codes.astype(np.float32) @ queries.T
+            distances = arrays["norms"][start:stop, None] - 2 * arrays["scales"][start:stop, None] * dots
+            distances[~block_allowed] = np.inf
+            best_distances = np.concatenate([best_distances, distances.T], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), distances.T.shape)], axis=1)
+            if best_distances.shape[1] > n_candidates:
+                keep = np.argpartition(best_distances, n_candidates - 1, axis=1)[:, :n_candidates]
+                best_distances = np.take_along_axis(best_distances, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        # 2. Exact distances of the candidates, from the float vectors
+        results = []
+        for query, distances, rows in zip(queries, best_distances, best_rows):
+            rows = np.sort(rows[np.isfinite(distances)])
+            exact = ((arrays["vectors"][rows] - query) ** 2).sum(axis=1)
+            order = np.argsort(exact)[:k]
+            results.append([(ids[rows[i]], float(exact[i])) for i in order])
+        return results
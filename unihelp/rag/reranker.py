@@ -0,0 +1,44 @@
+import time
+from typing import Any, Dict, List, Tuple
+from sentence_transformers import CrossEncoder
+from unihelp.core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Reorders retrieved chunks with a local cross-encoder scoring (query, chunk)
+    pairs on CPU, in batches. Scoring stops once `time_budget_ms` is spent: the
+    candidates scored so far are reranked and the rest keep their retrieval order
+    behind them, so a slow box degrades to plain retrieval instead of stalling.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16, time_budget_ms: float = 200):
+        logger.info(f"Loading reranker model: {model_name}")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.time_budget_ms = time_budget_ms
+
+    def rerank(self, query: str, docs: List[Dict[str, Any]], top_n: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Returns the best `top_n` docs and stats about the scoring pass."""
+        start = time.perf_counter()
+        scored: List[Tuple[float, int]] = []
+
+        for offset in range(0, len(docs), self.batch_size):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if scored and elapsed_ms >= self.time_budget_ms:
+                logger.warning(f"Rerank budget of {self.time_budget_ms}ms exhausted after {len(scored)}/{len(docs)} candidates")
+                break
+            batch = docs[offset:offset + self.batch_size]
+            scores = self.model.predict([(query, doc["page_content"]) for doc in batch], batch_size=len(batch))
+            scored.extend((float(score), offset + i) for i, score in enumerate(scores))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        order = [idx for _, idx in scored] + list(range(len(scored), len(docs)))
+        stats = {
+            "candidates": len(docs),
+            "scored": len(scored),
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        return [docs[idx] for idx in order[:top_n]], stats
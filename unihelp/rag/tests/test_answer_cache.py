@@ -0,0 +1,50 @@
+from unihelp.rag.answer_cache import SemanticAnswerCache
+
+RESULT = {"answer": "Les inscriptions ferment le 30 septembre.", "sources": [{"source": "calendrier.pdf"}]}
+
+
+def test_similar_questions_of_the_same_scope_hit():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("Quand ferment les inscriptions ?", [1.0, 0.0, 0.1], ("fr", 5), 1, RESULT)
+
+    # Cosine similarity, whatever the norm
+    assert cache.lookup([2.0, 0.0, 0.21], ("fr", 5), 1) == RESULT
+    assert cache.lookup([1.0, 1.0, 0.0], ("fr", 5), 1) is None
+    assert cache.lookup([1.0, 0.0, 0.1], ("en", 5), 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lookup_finds_the_entry_of_its_scope_among_closer_ones():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("q", [1.0, 0.0], ("en", 5), 1, {"answer": "en"})
+    cache.store("q", [1.0, 0.1], ("fr", 5), 1, {"answer": "fr"})
+    assert cache.lookup([1.0, 0.0], ("fr", 5), 1) == {"answer": "fr"}
+
+
+def test_a_new_generation_drops_every_answer():
+    cache = SemanticAnswerCache()
+    cache.store("q", [1.0, 0.0], "scope", 1, RESULT)
+    assert cache.lookup([1.0, 0.0], "scope", 2) is None
+    assert len(cache) == 0
+
+
+def test_cached_results_are_copies():
+    cache = SemanticAnswerCache()
+    result = {"answer": "a", "sources": []}
+    cache.store("q", [1.0, 0.0], "scope", 1, result)
+    result["sources"].append("modified after storing")
+    cache.lookup([1.0, 0.0], "scope", 1)["sources"].append("modified after lookup")
+    assert cache.lookup([1.0, 0.0], "scope", 1) == {"answer": "a", "sources": []}
+
+
+def test_oldest_entries_go_first_and_zero_disables():
+    cache = SemanticAnswerCache(max_entries=2)
+    for i, vector in enumerate([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]):
+        cache.store(f"q{i}", vector, "scope", 1, {"answer": i})
+    assert len(cache) == 2
+    assert cache.lookup([1.0, 0.0], "scope", 1) is None
+    assert cache.lookup([1.0, 1.0], "scope", 1) == {"answer": 2}
+
+    disabled = SemanticAnswerCache(max_entries=0)
+    disabled.store("q", [1.0, 0.0], "scope", 1, RESULT)
+    assert disabled.lookup([1.0, 0.0], "scope", 1) is None
@@ -0,0 +1,70 @@
+from unihelp.rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def build_index(path):
+    index = BM25Index(path)
+    index.add(
+        ["reinscription", "stage", "bourse"],
+        [
+            "La réinscription se fait avant le 15/09/2023 auprès de la scolarité.",
+            "La convention de stage est signée par le département des stages.",
+            "La demande de bourse est déposée auprès du service des bourses.",
+        ],
+        [{"department": "Scolarité"}, {"department": "Stages"}, {"department": "Bourses"}]
+    )
+    return index
+
+
+def test_tokenize_folds_case_and_accents_and_keeps_dates():
+    assert tokenize("Réinscription le 01/09/2023, article 2.3") == ["reinscription", "le", "01/09/2023", "article", "2.3"]
+
+
+def test_search_ranks_documents_with_the_query_terms(tmp_path):
+    index = build_index(str(tmp_path / "bm25.json"))
+
+    results = index.search("Reinscription", k=3)
+    assert [doc_id for doc_id, _ in results] == ["reinscription"]
+    assert index.search("15/09/2023")[0][0] == "reinscription"
+    assert index.search("inconnu") == []
+
+
+def test_search_applies_the_where_filter(tmp_path):
+    index = build_index(str(tmp_path / "bm25.json"))
+
+    assert [doc_id for doc_id, _ in index.search("département demande", where={"department": "Bourses"})] == ["bourse"]
+
+
+def test_add_replaces_and_delete_removes(tmp_path):
+    index = build_index(str(tmp_path / "bm25.json"))
+
+    index.add(["stage"], ["Attestation de présence."])
+    assert index.search("convention") == []
+    assert index.search("attestation")[0][0] == "stage"
+
+    index.delete(["stage", "unknown"])
+    assert len(index) == 2
+    assert index.search("attestation") == []
+
+
+def test_save_load_and_reload_if_changed(tmp_path):
+    path = str(tmp_path / "data" / "bm25.json")
+    writer = build_index(path)
+    writer.save()
+
+    reader = BM25Index(path)
+    assert len(reader) == 3
+    assert reader.search("bourse") == writer.search("bourse")
+
+    writer.add(["absence"], ["Le justificatif d'absence est remis sous 48 heures."])
+    writer.save()
+    reader.reload_if_changed()
+    assert reader.search("justificatif")[0][0] == "absence"
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+    assert fused[2][1] == 1 / 62
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,59 @@
+from unihelp.rag.context import ContextPacker, chunk_index, strip_overlap
+
+OVERLAP = "Les dossiers incomplets ne sont pas traités par la scolarité."
+
+
+def doc(doc_id, content, source="reglement.pdf", index=None):
+    metadata = {"source": source}
+    if index is not None:
+        metadata["chunk_index"] = index
+    return {"id": doc_id, "page_content": content, "metadata": metadata}
+
+
+def test_chunk_index_from_metadata_or_id():
+    assert chunk_index(doc("x", "", index=3)) == 3
+    assert chunk_index(doc("reglement.pdf_chunk_7", "")) == 7
+    assert chunk_index(doc("x", "")) is None
+
+
+def test_strip_overlap():
+    assert strip_overlap(f"Article 1. {OVERLAP}", f"{OVERLAP} Article 2.", 400) == "Article 2."
+    # Short common parts are coincidences, not chunker overlap
+    assert strip_overlap("Fin de la phrase.", "phrase. Suite", 400) == "phrase. Suite"
+
+
+def test_pack_deduplicates_and_merges_consecutive_chunks():
+    packer = ContextPacker(max_tokens=1000)
+    docs = [
+        doc("reglement.pdf_chunk_1", f"{OVERLAP} Article 2: les examens ont lieu en juin."),
+        doc("bourses.pdf_chunk_0", "Les bourses sont versées en octobre.", source="bourses.pdf"),
+        doc("reglement.pdf_chunk_0", f"Article 1: inscriptions. {OVERLAP}"),
+        doc("copie", "Les bourses sont versées en octobre.", source="bourses.pdf"),
+    ]
+
+    packed = packer.pack(docs)
+    assert [block["metadata"]["source"] for block in packed] == ["reglement.pdf", "bourses.pdf"]
+    assert packed[0]["content"] == f"Article 1: inscriptions. {OVERLAP}\nArticle 2: les examens ont lieu en juin."
+    assert packed[1]["content"] == "Les bourses sont versées en octobre."
+
+
+def test_pack_respects_the_token_budget():
+    long_text = " ".join(f"Article {i}: disposition du règlement intérieur." for i in range(200))
+    packer = ContextPacker(max_tokens=120)
+    header = lambda i, metadata: f"[Source {i + 1}: {metadata['source']}]"
+
+    packed = packer.pack([doc("a", long_text, source="a.pdf"), doc("b", "Autre document.", source="b.pdf")], header=header)
+    assert len(packed) == 1
+    assert long_text.startswith(packed[0]["content"])
+    used = packer.count_tokens(f"{header(0, packed[0]['metadata'])}\n{packed[0]['content']}\n\n")
+    assert used <= packer.max_tokens
+
+
+def test_pack_keeps_blocks_that_fit_and_stops_at_the_first_that_does_not():
+    packer = ContextPacker(max_tokens=60)
+    short = doc("a", "Les inscriptions ferment le 30 septembre.", source="a.pdf")
+    long = doc("b", "Le règlement des examens. " * 100, source="b.pdf")
+
+    packed = packer.pack([short, long, doc("c", "Dernier.", source="c.pdf")])
+    # What is left after the first block is under the minimum worth truncating
+    assert [block["metadata"]["source"] for block in packed] == ["a.pdf"]
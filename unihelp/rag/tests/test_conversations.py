@@ -0,0 +1,71 @@
+import pytest
+from unihelp.rag.conversations import InMemoryConversationStore, SQLiteConversationStore, new_conversation
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_sessions=1000, ttl_seconds=3600):
+        if request.param == "memory":
+            return InMemoryConversationStore(max_sessions, ttl_seconds)
+        return SQLiteConversationStore(str(tmp_path / "conversations.sqlite3"), max_sessions, ttl_seconds)
+    return make
+
+
+def turn(question):
+    return {"question": question, "answer": f"Réponse à « {question} »"}
+
+
+def test_conversations_round_trip(make_store):
+    store = make_store()
+    assert store.get("s1") is None
+
+    conversation = new_conversation()
+    conversation["turns"].append(turn("Quand ferment les inscriptions ?"))
+    store.save("s1", conversation)
+    assert store.get("s1") == conversation
+
+    store.delete("s1")
+    assert store.get("s1") is None
+    assert len(store) == 0
+
+
+def test_callers_never_share_a_conversation(make_store):
+    store = make_store()
+    conversation = new_conversation()
+    store.save("s1", conversation)
+    conversation["turns"].append(turn("modifiée après l'enregistrement"))
+    store.get("s1")["turns"].append(turn("modifiée après la lecture"))
+    assert store.get("s1") == new_conversation()
+
+
+def test_least_recently_used_sessions_are_evicted(make_store, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("unihelp.rag.conversations.time.time", lambda: next(clock))
+    store = make_store(max_sessions=2)
+    store.save("s1", new_conversation())
+    store.save("s2", new_conversation())
+    # Saving a session makes it recent again
+    store.save("s1", {"summary": "", "turns": [turn("suite")]})
+
+    store.save("s3", new_conversation())
+    assert len(store) == 2
+    assert store.get("s2") is None
+    assert store.get("s1") is not None and store.get("s3") is not None
+
+
+def test_sessions_expire_after_the_ttl(make_store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("unihelp.rag.conversations.time.time", lambda: now[0])
+    store = make_store(ttl_seconds=60)
+    store.save("s1", new_conversation())
+
+    now[0] += 59
+    assert store.get("s1") is not None
+    now[0] += 2
+    assert store.get("s1") is None
+
+
+def test_sqlite_sessions_are_shared_by_every_store_of_the_file(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    SQLiteConversationStore(path).save("s1", {"summary": "Bourses", "turns": []})
+    assert SQLiteConversationStore(path).get("s1") == {"summary": "Bourses", "turns": []}
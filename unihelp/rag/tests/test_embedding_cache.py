@@ -0,0 +1,72 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+from unihelp.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic vectors, remembering which texts reached the model."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(text.count("e")), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite")
+
+
+def test_only_unseen_texts_reach_the_model(cache_path):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, EmbeddingCache(cache_path, "model-a"))
+    first = embeddings.embed_documents(["Règlement des examens", "Calendrier"])
+
+    second = embeddings.embed_documents(["Calendrier", "Bourses", "Règlement des examens"])
+    assert model.embedded == ["Règlement des examens", "Calendrier", "Bourses"]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert embeddings.cache.hits == 2 and embeddings.cache.misses == 3
+
+
+def test_keys_ignore_whitespace_and_unicode_forms_but_not_the_model(cache_path):
+    cache = EmbeddingCache(cache_path, "model-a")
+    assert cache.key("  Règlement\n des   examens ") == cache.key("Règlement des examens")
+    # NFKC folds the ligature
+    assert cache.key("ﬁche") == cache.key("fiche")
+    assert cache.key("Règlement") != EmbeddingCache(cache_path, "model-b").key("Règlement")
+
+
+def test_vectors_persist_across_instances(cache_path):
+    EmbeddingCache(cache_path, "model-a").put_many(["Calendrier"], [[1.0, 2.0, 3.0]])
+
+    cache = EmbeddingCache(cache_path, "model-a")
+    assert len(cache) == 1
+    assert cache.get_many(["Calendrier", "Bourses"]) == [[1.0, 2.0, 3.0], None]
+    # Another model never sees the vectors of the first one
+    assert EmbeddingCache(cache_path, "model-b").get_many(["Calendrier"]) == [None]
+
+
+def test_least_recently_used_vectors_are_evicted(cache_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("unihelp.rag.embedding_cache.time.time", lambda: next(clock))
+    cache = EmbeddingCache(cache_path, "model-a", max_entries=2)
+    cache.put_many(["a"], [[1.0]])
+    cache.put_many(["b"], [[2.0]])
+    cache.get_many(["a"])
+
+    cache.put_many(["c"], [[3.0]])
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_storing_a_known_text_again_does_not_count_twice(cache_path):
+    cache = EmbeddingCache(cache_path, "model-a", max_entries=2)
+    cache.put_many(["a", "b"], [[1.0], [2.0]])
+    cache.put_many(["a"], [[1.0]])
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b"]) == [[1.0], [2.0]]
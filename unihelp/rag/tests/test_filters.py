@@ -0,0 +1,41 @@
+from unihelp.rag.filters import build_where, infer_filters, matches_where
+
+META = {"department": "Stages", "language": "fr", "document_type": "Note"}
+
+
+def test_build_where():
+    assert build_where(None) is None
+    assert build_where({}) is None
+    assert build_where({"language": "fr"}) == {"language": "fr"}
+    assert build_where({"language": "fr", "department": ["Stages", "Bourses"]}) == {
+        "$and": [{"department": {"$in": ["Stages", "Bourses"]}}, {"language": "fr"}]
+    }
+
+
+def test_matches_where_of_built_clauses():
+    assert matches_where(META, None)
+    assert matches_where(META, build_where({"language": "fr"}))
+    assert not matches_where(META, build_where({"language": "ar"}))
+    assert matches_where(META, build_where({"language": "fr", "department": ["Stages", "Bourses"]}))
+    assert not matches_where(META, build_where({"language": "fr", "department": ["Bourses"]}))
+    assert not matches_where({}, build_where({"language": "fr"}))
+
+
+def test_matches_where_operators():
+    assert matches_where(META, {"language": {"$eq": "fr"}})
+    assert not matches_where(META, {"language": {"$ne": "fr"}})
+    assert matches_where(META, {"$or": [{"language": "ar"}, {"department": "Stages"}]})
+    assert not matches_where(META, {"$or": [{"language": "ar"}, {"department": "Bourses"}]})
+
+
+def test_infer_filters():
+    departments = ["Département des Stages", "Département des affaires académiques", "Unknown"]
+
+    assert infer_filters("Comment déposer ma convention auprès des stages ?", "fr", ["fr", "ar"], departments) == {
+        "language": "fr",
+        "department": "Département des Stages",
+    }
+    assert infer_filters("Question sur les affaires academiques", "en", ["fr"], departments) == {
+        "department": "Département des affaires académiques"
+    }
+    assert infer_filters("Bonjour", "unknown", ["fr"], departments) == {}
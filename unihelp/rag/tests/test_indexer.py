@@ -0,0 +1,88 @@
+import pytest
+from unihelp.rag.indexer import BatchIndexer, IndexingError
+
+
+class FakeVectorStore:
+    """Stores chunks in a dict; batches containing one of `failing_ids` fail."""
+
+    def __init__(self, failing_ids=()):
+        self.failing_ids = set(failing_ids)
+        self.embeddings = None
+        self.stored = {}
+        self.batches = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def add_texts(self, texts, metadatas, ids, embeddings):
+        self.batches.append(list(ids))
+        if self.failing_ids & set(ids):
+            raise RuntimeError("embedding failed")
+        self.stored.update(zip(ids, texts))
+
+
+def add_document(indexer, events, name, chunks):
+    ids = [f"{name}{i}" for i in range(chunks)]
+    indexer.add(
+        [f"texte {doc_id}" for doc_id in ids], [{} for _ in ids], ids,
+        on_written=lambda: events.append(("written", name)),
+        on_failed=lambda error: events.append(("failed", name))
+    )
+
+
+def test_documents_are_written_in_full_batches():
+    store = FakeVectorStore()
+    indexer = BatchIndexer(store, batch_size=3)
+    events = []
+
+    add_document(indexer, events, "a", 2)
+    assert store.batches == [] and events == []
+    add_document(indexer, events, "b", 2)
+    assert store.batches == [["a0", "a1", "b0"]]
+    assert events == [("written", "a")]
+
+    add_document(indexer, events, "c", 0)
+    indexer.flush()
+    assert store.batches[-1] == ["b1"]
+    assert events == [("written", "a"), ("written", "b"), ("written", "c")]
+    assert indexer.stats()["chunks"] == 4 and indexer.stats()["batches"] == 2
+
+
+def test_a_failed_batch_only_fails_its_documents():
+    store = FakeVectorStore(failing_ids={"b1"})
+    indexer = BatchIndexer(store, batch_size=3)
+    events = []
+
+    add_document(indexer, events, "a", 2)
+    with pytest.raises(IndexingError):
+        # [a0, a1, b0] is written, then [b1, b2, b3] fails
+        add_document(indexer, events, "b", 5)
+    assert events == [("written", "a"), ("failed", "b")]
+
+    # The rest of "b" was dropped: later documents are not blocked behind it
+    add_document(indexer, events, "c", 2)
+    add_document(indexer, events, "d", 2)
+    indexer.flush()
+    assert events == [("written", "a"), ("failed", "b"), ("written", "c"), ("written", "d")]
+    assert not any(doc_id in store.stored for doc_id in ("b1", "b2", "b3", "b4"))
+    assert {"c0", "c1", "d0", "d1"} <= set(store.stored)
+    assert indexer.stats()["chunks_failed"] == 4
+
+
+def test_flush_attempts_every_batch_and_raises_the_first_failure():
+    store = FakeVectorStore(failing_ids={"a0"})
+    indexer = BatchIndexer(store, batch_size=10)
+    events = []
+
+    add_document(indexer, events, "a", 1)
+    add_document(indexer, events, "b", 1)
+    with pytest.raises(IndexingError) as excinfo:
+        indexer.flush()
+    # Both documents were in the failed batch
+    assert excinfo.value.failed_documents == 2
+    assert events == [("failed", "a"), ("failed", "b")]
+
+    add_document(indexer, events, "c", 1)
+    indexer.flush()
+    assert events[-1] == ("written", "c")
+    assert store.stored == {"c0": "texte c0"}
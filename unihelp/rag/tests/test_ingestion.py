@@ -0,0 +1,101 @@
+import os
+import pytest
+from unihelp.core.config import settings
+from unihelp.rag.filters import matches_where
+from unihelp.rag.ingestion import ingest_data
+from unihelp.rag.manifest import IngestionManifest
+
+
+class InMemoryVectorStore:
+    """The part of `VectorStore` that ingestion uses, over a dict of id -> (text, metadata)."""
+
+    def __init__(self):
+        self.embeddings = None
+        self.chunks = {}
+
+    def reload_side_indexes(self):
+        pass
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def add_texts(self, texts, metadatas, ids=None, embeddings=None):
+        self.chunks.update((doc_id, (text, meta)) for doc_id, text, meta in zip(ids, texts, metadatas))
+
+    def get_ids(self, where):
+        return [doc_id for doc_id, (_, meta) in self.chunks.items() if matches_where(meta, where)]
+
+    def delete(self, ids=None, where=None):
+        for doc_id in list(ids or []) + (self.get_ids(where) if where else []):
+            self.chunks.pop(doc_id, None)
+
+    def persist(self):
+        pass
+
+    def get_collection_stats(self):
+        return {"count": len(self.chunks)}
+
+    def texts_of(self, source_path):
+        """Chunk texts of the file whose manifest key is `source_path`."""
+        manifest = IngestionManifest(settings.INGEST_MANIFEST_PATH)
+        return [self.chunks[doc_id][0] for doc_id in manifest.get(os.path.realpath(source_path))["chunk_ids"]]
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(settings, "CHUNKING_MODE", "chars")
+    return tmp_path / "raw"
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_files_with_the_same_name_in_different_directories_keep_their_chunks(raw_dir):
+    store = InMemoryVectorStore()
+    first = write(raw_dir / "d1" / "a.txt", "Règlement des examens du département d'informatique.")
+    ingest_data(str(raw_dir), vector_store=store)
+    first_chunks = dict(store.chunks)
+
+    second = write(raw_dir / "d2" / "a.txt", "Calendrier des inscriptions du service de la scolarité.")
+    stats = ingest_data(str(raw_dir), vector_store=store)
+    assert stats["files_ingested"] == 1
+    assert first_chunks.items() <= store.chunks.items()
+    assert "examens" in store.texts_of(first)[0]
+    assert "inscriptions" in store.texts_of(second)[0]
+
+    os.remove(second)
+    ingest_data(str(raw_dir), vector_store=store)
+    assert store.chunks == first_chunks
+    # Unchanged and still in the store: the next run has nothing to do
+    assert ingest_data(str(raw_dir), vector_store=store)["files_ingested"] == 0
+
+
+def test_chunks_of_older_indexes_named_after_the_file_only_are_replaced(raw_dir):
+    store = InMemoryVectorStore()
+    store.add_texts(["Ancienne version."], [{"source": "a.txt"}], ids=["a.txt_chunk_0"])
+    store.add_texts(["Autre fichier."], [{"source": "b.txt"}], ids=["b.txt_chunk_0"])
+    path = write(raw_dir / "a.txt", "Nouvelle version du règlement.")
+
+    ingest_data(str(raw_dir), vector_store=store)
+    assert "a.txt_chunk_0" not in store.chunks
+    assert "b.txt_chunk_0" in store.chunks
+    assert store.texts_of(path) == ["Nouvelle version du règlement."]
+
+
+def test_old_chunks_owned_by_another_file_of_the_manifest_are_kept(raw_dir):
+    store = InMemoryVectorStore()
+    owner = write(raw_dir / "d1" / "a.txt", "Règlement des examens.")
+    # d1/a.txt was ingested before chunk IDs carried the source ID
+    manifest = IngestionManifest(settings.INGEST_MANIFEST_PATH)
+    manifest.record(os.path.realpath(owner), manifest.check(owner, owner), ["a.txt_chunk_0"])
+    manifest.save()
+    store.add_texts(["Règlement des examens."], [{"source": "a.txt"}], ids=["a.txt_chunk_0"])
+
+    write(raw_dir / "d2" / "a.txt", "Calendrier des inscriptions.")
+    ingest_data(str(raw_dir), vector_store=store)
+    assert "a.txt_chunk_0" in store.chunks
+    assert len(store.chunks) == 2
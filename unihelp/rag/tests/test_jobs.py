@@ -0,0 +1,113 @@
+import threading
+import time
+from unihelp.rag import jobs
+from unihelp.rag.jobs import FINISHED_STATUSES, MAX_JOB_ERRORS, IngestionJobQueue
+
+
+def wait_for(job_queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_queue.get(job_id)
+        if job["status"] in FINISHED_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish: {job}")
+
+
+def fake_ingestion(monkeypatch, run):
+    """Replaces `ingest_data` by `run(progress, full)`; returns the calls made."""
+    calls = []
+
+    def ingest_data(raw_data_dir, workers, full, vector_store, progress):
+        calls.append({"raw_data_dir": raw_data_dir, "workers": workers, "full": full, "vector_store": vector_store})
+        return run(progress, full)
+
+    monkeypatch.setattr(jobs, "ingest_data", ingest_data)
+    return calls
+
+
+def test_job_reports_progress_and_stats(monkeypatch):
+    def run(progress, full):
+        progress("start", files_total=3)
+        progress("file_done", file="calendrier.pdf", chunks=4)
+        progress("file_failed", file="scan.pdf", error="no text")
+        progress("file_done", file="bourses.docx", chunks=2)
+        return {"files_ingested": 2, "files_failed": 1}
+
+    store = object()
+    calls = fake_ingestion(monkeypatch, run)
+    job_queue = IngestionJobQueue(store, "data/raw", workers=2)
+    submitted = job_queue.submit(files=["calendrier.pdf"])
+    assert submitted["status"] in ("queued", "running")
+
+    job = wait_for(job_queue, submitted["id"])
+    assert calls == [{"raw_data_dir": "data/raw", "workers": 2, "full": False, "vector_store": store}]
+    assert job["status"] == "completed_with_errors"
+    assert (job["files_total"], job["files_done"], job["files_failed"], job["chunks"]) == (3, 2, 1, 6)
+    assert job["errors"] == [{"file": "scan.pdf", "error": "no text"}]
+    assert job["stats"] == {"files_ingested": 2, "files_failed": 1}
+    assert job["uploaded_files"] == ["calendrier.pdf"]
+    assert job["started_at"] <= job["finished_at"]
+
+
+def test_failed_runs_and_clean_runs(monkeypatch):
+    def run(progress, full):
+        if full:
+            raise RuntimeError("disk full")
+        return {"files_ingested": 0, "files_failed": 0}
+
+    fake_ingestion(monkeypatch, run)
+    job_queue = IngestionJobQueue(object(), "data/raw")
+    failed = wait_for(job_queue, job_queue.submit(full=True)["id"])
+    assert failed["status"] == "failed" and failed["error"] == "disk full"
+    assert wait_for(job_queue, job_queue.submit()["id"])["status"] == "succeeded"
+
+
+def test_jobs_run_one_at_a_time_in_submission_order(monkeypatch):
+    release = threading.Event()
+    running = []
+
+    def run(progress, full):
+        running.append(full)
+        release.wait(5)
+        return {"files_ingested": 0, "files_failed": 0}
+
+    fake_ingestion(monkeypatch, run)
+    job_queue = IngestionJobQueue(object(), "data/raw")
+    first, second = job_queue.submit(full=True), job_queue.submit(full=False)
+    while not running:
+        time.sleep(0.01)
+    assert job_queue.get(second["id"])["status"] == "queued"
+
+    release.set()
+    wait_for(job_queue, second["id"])
+    assert running == [True, False]
+    # Most recent first, with the number of errors only
+    assert [job["id"] for job in job_queue.list_jobs()] == [second["id"], first["id"]]
+    assert job_queue.list_jobs()[0]["errors"] == 0
+
+
+def test_errors_are_capped_and_old_finished_jobs_forgotten(monkeypatch):
+    def run(progress, full):
+        for i in range(MAX_JOB_ERRORS + 10):
+            progress("file_failed", file=f"f{i}.pdf", error="no text")
+        return {"files_ingested": 0, "files_failed": MAX_JOB_ERRORS + 10}
+
+    fake_ingestion(monkeypatch, run)
+    job_queue = IngestionJobQueue(object(), "data/raw", max_jobs=2)
+    ids = [wait_for(job_queue, job_queue.submit()["id"])["id"] for _ in range(3)]
+
+    job = job_queue.get(ids[-1])
+    assert job["files_failed"] == MAX_JOB_ERRORS + 10
+    assert len(job["errors"]) == MAX_JOB_ERRORS
+    assert job_queue.get(ids[0]) is None
+    assert [job["id"] for job in job_queue.list_jobs()] == ids[:0:-1]
+
+
+def test_a_store_that_cannot_be_initialized_fails_the_job(monkeypatch):
+    # `ingest_data` returns None when it cannot open the vector store
+    fake_ingestion(monkeypatch, lambda progress, full: None)
+    job_queue = IngestionJobQueue(object(), "data/raw")
+    job = wait_for(job_queue, job_queue.submit()["id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "The vector store could not be initialized"
@@ -0,0 +1,81 @@
+import os
+from unihelp.rag.manifest import IngestionManifest, read_generation
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return os.path.realpath(path)
+
+
+def test_check_detects_new_changed_and_unchanged_files(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    path = write(str(tmp_path / "raw" / "a.txt"), "Article 1")
+
+    state = manifest.check(path, path)
+    assert state is not None and state["size"] == len("Article 1")
+    manifest.record(path, state, ["a.txt_chunk_0"])
+    assert manifest.check(path, path) is None
+    assert manifest.check(path, path, force=True) is not None
+
+    write(path, "Article 1 modifié")
+    assert manifest.check(path, path)["sha256"] != state["sha256"]
+
+
+def test_touched_file_with_same_content_is_unchanged(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    path = write(str(tmp_path / "raw" / "a.txt"), "Article 1")
+    manifest.record(path, manifest.check(path, path), ["a.txt_chunk_0"])
+
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert manifest.check(path, path) is None
+    assert manifest.get(path)["mtime"] == os.stat(path).st_mtime
+
+
+def test_remove_returns_the_chunk_ids(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    path = write(str(tmp_path / "raw" / "a.txt"), "Article 1")
+    manifest.record(path, manifest.check(path, path), ["a.txt_chunk_0", "a.txt_chunk_1"])
+
+    assert manifest.remove(path) == ["a.txt_chunk_0", "a.txt_chunk_1"]
+    assert manifest.get(path) is None
+    assert manifest.remove(path) == []
+
+
+def test_keys_under_only_returns_files_of_that_directory(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    inside = write(str(tmp_path / "raw" / "sub" / "a.txt"), "a")
+    # Shares the "raw" prefix without being under it
+    sibling = write(str(tmp_path / "raw2" / "b.txt"), "b")
+    for path in (inside, sibling):
+        manifest.record(path, manifest.check(path, path), [])
+
+    assert manifest.keys_under(os.path.realpath(str(tmp_path / "raw"))) == [inside]
+
+
+def test_relative_keys_of_older_manifests_are_adopted(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    path = write(str(tmp_path / "raw" / "a.txt"), "a")
+    manifest.record("a.txt", manifest.check(path, path), ["a.txt_chunk_0"])
+    manifest.record("missing.txt", {"sha256": "", "mtime": 0, "size": 0}, [])
+
+    manifest.adopt_relative_keys(os.path.realpath(str(tmp_path / "raw")))
+    assert sorted(manifest.keys()) == sorted([path, "missing.txt"])
+    assert manifest.get(path)["chunk_ids"] == ["a.txt_chunk_0"]
+
+
+def test_save_and_load_keep_files_and_generation(tmp_path):
+    manifest_path = str(tmp_path / "data" / "manifest.json")
+    manifest = IngestionManifest(manifest_path)
+    path = write(str(tmp_path / "raw" / "a.txt"), "a")
+    manifest.record(path, manifest.check(path, path), ["a.txt_chunk_0"])
+    manifest.bump_generation()
+    manifest.save()
+
+    loaded = IngestionManifest(manifest_path)
+    assert loaded.files == manifest.files
+    assert loaded.generation == 1
+    assert read_generation(manifest_path) == 1
+    assert read_generation(str(tmp_path / "none.json")) == 0
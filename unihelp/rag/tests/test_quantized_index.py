@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from unihelp.rag.quantized_index import QuantizedIndex
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_search_returns_the_nearest_vectors(tmp_path):
+    index = QuantizedIndex(str(tmp_path / "index"), rescore_candidates=10)
+    data = vectors(200)
+    index.add([f"d{i}" for i in range(200)], data.tolist(), [{"language": "fr" if i % 2 else "ar"} for i in range(200)])
+
+    results = index.search([data[5].tolist(), data[42].tolist()], k=3)
+    for query, hits in zip((5, 42), results):
+        # Same top k and exact squared L2 distances as a brute-force search
+        distances = ((data - data[query]) ** 2).sum(axis=1)
+        expected = np.argsort(distances)[:3]
+        assert [doc_id for doc_id, _ in hits] == [f"d{i}" for i in expected]
+        assert np.allclose([distance for _, distance in hits], distances[expected], atol=1e-4)
+
+    filtered = index.search([data[5].tolist()], k=5, where={"language": "ar"})[0]
+    assert all(int(doc_id[1:]) % 2 == 0 for doc_id, _ in filtered)
+
+
+def test_add_replaces_and_delete_removes(tmp_path):
+    index = QuantizedIndex(str(tmp_path / "index"))
+    data = vectors(3)
+    index.add(["a", "b", "c"], data.tolist())
+
+    index.add(["a"], [data[2].tolist()])
+    index.delete(["c"])
+    assert len(index) == 2
+    assert [doc_id for doc_id, _ in index.search([data[2].tolist()], k=3)[0]] == ["a", "b"]
+    assert index.search([data[0].tolist()], k=3, where={"language": "fr"}) == [[]]
+
+
+def test_save_and_reload_in_another_process(tmp_path):
+    path = str(tmp_path / "index")
+    writer = QuantizedIndex(path)
+    data = vectors(20)
+    writer.add([f"d{i}" for i in range(10)], data[:10].tolist())
+    writer.save()
+
+    reader = QuantizedIndex(path)
+    assert len(reader) == 10
+    writer.add([f"d{i}" for i in range(10, 20)], data[10:].tolist())
+    # Added rows are only visible once saved
+    reader.reload_if_changed()
+    assert len(reader) == 10
+    writer.save()
+    reader.reload_if_changed()
+    assert reader.search([data[15].tolist()], k=1)[0][0][0] == "d15"
+
+
+def test_a_reloaded_writer_appends_after_the_rows_of_others(tmp_path):
+    path = str(tmp_path / "index")
+    first, second = QuantizedIndex(path), QuantizedIndex(path)
+    data = vectors(8)
+    first.add(["a0", "a1", "a2", "a3"], data[:4].tolist())
+    first.save()
+
+    second.reload_if_changed()
+    second.add(["b0", "b1", "b2", "b3"], data[4:].tolist())
+    second.save()
+
+    index = QuantizedIndex(path)
+    assert len(index) == 8
+    for i, doc_id in enumerate(["a0", "a1", "a2", "a3", "b0", "b1", "b2", "b3"]):
+        assert index.search([data[i].tolist()], k=1)[0][0][0] == doc_id
+
+
+def test_save_compacts_deleted_rows(tmp_path):
+    path = str(tmp_path / "index")
+    index = QuantizedIndex(path)
+    data = vectors(10)
+    index.add([f"d{i}" for i in range(10)], data.tolist())
+    index.save()
+    index.delete([f"d{i}" for i in range(5)])
+    index.save()
+
+    assert sorted(name for name in os.listdir(path) if name.endswith(".bin")) == [
+        "codes.1.bin", "norms.1.bin", "scales.1.bin", "vectors.1.bin"
+    ]
+    reloaded = QuantizedIndex(path)
+    assert len(reloaded) == 5
+    assert reloaded.search([data[7].tolist()], k=1)[0][0][0] == "d7"
@@ -1,7 +1,15 @@
+import asyncio
+import json
 import os
-from typing import List, Dict, Any
+import uuid
+from typing import List, Dict, Any, Set
 from langchain_chroma import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from unihelp.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+from unihelp.rag.bm25 import BM25Index, reciprocal_rank_fusion
+from unihelp.rag.quantized_index import QuantizedIndex
+from unihelp.rag.manifest import read_generation
+from unihelp.core.cache import LRUCache
 from unihelp.core.config import settings
 from unihelp.core.logging import setup_logger
 
@@ -13,7 +21,25 @@ class VectorStore:
         self.model_name = settings.EMBEDDING_MODEL_NAME
         
         logger.info(f"Initializing embedding model: {self.model_name}")
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            encode_kwargs={"batch_size": settings.EMBEDDING_BATCH_SIZE}
+        )
+
+        # Serve already known texts (boilerplate headers, chunk overlaps, rebuilds) from disk
+        if settings.EMBEDDING_CACHE_PATH:
+            cache = EmbeddingCache(
+                settings.EMBEDDING_CACHE_PATH,
+                model_name=self.model_name,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            logger.info(f"Using embedding cache at {settings.EMBEDDING_CACHE_PATH} ({len(cache)} entries)")
+            self.embeddings = CachedEmbeddings(self.embeddings, cache)
+        
+        # Students keep asking the same questions: keep their embeddings in memory
+        self.query_cache = LRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE)
+        self._metadata_values: Dict[str, Set[str]] = {}
+        self._metadata_values_generation = None
         
         logger.info(f"Connecting to ChromaDB at {self.persist_dir}")
         self.db = Chroma(
@@ -22,24 +48,231 @@ class VectorStore:
             persist_directory=self.persist_dir
         )
 
-    def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str] = None):
-        """Add text chunks with their associated metadata to the vector store."""
+        # Large corpora: nearest neighbours come from a memory-mapped int8 index instead of
+        # the in-memory HNSW index of Chroma, which then only serves documents and metadata.
+        # Chroma still receives the embeddings (it requires them, and `rebuild_dense_index`
+        # reads them back), so its HNSW index is still built and loaded by the process that
+        # writes to the collection: the saving is on the API workers' queries, not on ingestion.
+        self.dense_index = None
+        if settings.VECTOR_BACKEND == "int8":
+            self.dense_index = QuantizedIndex(settings.QUANTIZED_INDEX_DIR, rescore_candidates=settings.QUANTIZED_RESCORE_CANDIDATES)
+            if not len(self.dense_index) and self.db._collection.count():
+                self.rebuild_dense_index()
+        elif settings.VECTOR_BACKEND != "chroma":
+            raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND} (expected 'chroma' or 'int8')")
+
+        # Lexical index next to the collection, for exact tokens (article numbers, dates, acronyms)
+        self.bm25 = None
+        if settings.HYBRID_SEARCH_ENABLED:
+            self.bm25 = BM25Index(settings.BM25_INDEX_PATH)
+            if not len(self.bm25) and self.db._collection.count():
+                self.rebuild_lexical_index()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode a batch of texts in a single model call."""
+        return self.embeddings.embed_documents(texts)
+
+    def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str] = None, embeddings: List[List[float]] = None):
+        """Add text chunks with their associated metadata to the vector store.
+
+        Embeddings are computed here when the caller has not already done it.
+        """
         logger.info(f"Adding {len(texts)} chunks to ChromaDB")
-        self.db.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+        if embeddings is None:
+            embeddings = self.embed_documents(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        self.db._collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=texts)
         # Note: In newer explicit langchain_chroma, persistence is handled automatically
+        if self.dense_index is not None:
+            self.dense_index.add(ids, embeddings, metadatas)
+        if self.bm25 is not None:
+            self.bm25.add(ids, texts, metadatas)
 
-    def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Retrieve top k chunks representing context for the query."""
-        logger.info(f"Searching for: '{query}' (k={k})")
-        docs = self.db.similarity_search(query, k=k)
-        
-        results = []
-        for doc in docs:
-            results.append({
-                "page_content": doc.page_content,
-                "metadata": doc.metadata
-            })
-        return results
+    def get_ids(self, where: Dict[str, Any]) -> List[str]:
+        """IDs of the chunks matching a ChromaDB metadata filter."""
+        return self.db._collection.get(where=where, include=[])["ids"]
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None):
+        """Remove chunks from the vector store, by ID and/or metadata filter."""
+        if not ids and not where:
+            return
+        if where:
+            # Resolve the filter to IDs so that the lexical index stays in sync
+            ids = list(ids or []) + self.get_ids(where)
+            if not ids:
+                return
+        logger.info(f"Deleting {len(ids)} chunks from ChromaDB")
+        self.db._collection.delete(ids=ids)
+        if self.dense_index is not None:
+            self.dense_index.delete(ids)
+        if self.bm25 is not None:
+            self.bm25.delete(ids)
+
+    def persist(self):
+        """Flush on-disk side indexes. ChromaDB persists by itself; the BM25 and quantized
+        indexes are written here so that ingestion can save them once per run instead of per batch."""
+        if self.dense_index is not None:
+            self.dense_index.save()
+        if self.bm25 is not None:
+            self.bm25.save()
+
+    def reload_side_indexes(self):
+        """Re-reads the BM25 and quantized indexes if another process rewrote them. Ingestion calls this under
+        the ingestion lock before writing, so that its `persist` extends the latest index
+        instead of overwriting it with this process's stale copy."""
+        if self.bm25 is not None:
+            self.bm25.reload_if_changed()
+        if self.dense_index is not None:
+            self.dense_index.reload_if_changed()
+
+    def rebuild_lexical_index(self):
+        """Builds the BM25 index from the documents already stored in ChromaDB."""
+        logger.info("Building BM25 index from the ChromaDB collection")
+        data = self.db._collection.get(include=["documents", "metadatas"])
+        self.bm25.add(data["ids"], data["documents"], data["metadatas"])
+        self.bm25.save()
+
+    def rebuild_dense_index(self):
+        """Builds the quantized index from the embeddings already stored in ChromaDB."""
+        logger.info("Building quantized vector index from the ChromaDB collection")
+        data = self.db._collection.get(include=["embeddings", "metadatas"])
+        self.dense_index.add(data["ids"], data["embeddings"], data["metadatas"])
+        self.dense_index.save()
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, served from the in-process LRU cache when possible."""
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self.query_cache.put(query, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many search queries with a single model call for those not in the LRU cache.
+        Queries never go to the on-disk cache, which is meant for documents."""
+        embeddings = [self.query_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if missing:
+            model = self.embeddings.embeddings if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+            computed = dict(zip(missing, model.embed_documents(missing)))
+            for query, embedding in computed.items():
+                self.query_cache.put(query, embedding)
+            embeddings = [computed[query] if embedding is None else embedding for query, embedding in zip(queries, embeddings)]
+        return embeddings
+
+    def _dense_search(self, embedding: List[float], k: int, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self._dense_search_many([embedding], k, where)[0]
+
+    def _dense_search_many(self, embeddings: List[List[float]], k: int, where: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest neighbours of several embeddings in one ChromaDB (or quantized index) query."""
+        if self.dense_index is not None:
+            self.dense_index.reload_if_changed()
+            hits = self.dense_index.search(embeddings, k, where)
+            docs = self._get_by_ids(list(dict.fromkeys(doc_id for query_hits in hits for doc_id, _ in query_hits)))
+            return [[docs[doc_id] for doc_id, _ in query_hits if doc_id in docs] for query_hits in hits]
+
+        result = self.db._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                {"id": doc_id, "page_content": doc, "metadata": meta or {}}
+                for doc_id, doc, meta in zip(ids, documents, metadatas)
+            ]
+            for ids, documents, metadatas in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+
+    def _get_by_ids(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        data = self.db._collection.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            doc_id: {"id": doc_id, "page_content": doc, "metadata": meta or {}}
+            for doc_id, doc, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+
+    def similarity_search(self, query: str, k: int = 5, embedding: List[float] = None, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Retrieve top k chunks representing context for the query.
+
+        `where` is a ChromaDB metadata filter (see `filters.build_where`); it prunes
+        candidates before the nearest-neighbour search. With hybrid search enabled,
+        the dense (embedding) and BM25 rankings are computed over a wider candidate
+        set and merged with reciprocal-rank fusion.
+        """
+        logger.info(f"Searching for: '{query}' (k={k}, where={where})")
+        if embedding is None:
+            embedding = self.embed_query(query)
+
+        if self.bm25 is None:
+            return self._dense_search(embedding, k, where)
+
+        self.bm25.reload_if_changed()
+        n_candidates = max(k, settings.HYBRID_CANDIDATES)
+        dense = self._dense_search(embedding, n_candidates, where)
+        return self._fuse(query, k, dense, where)
+
+    def similarity_search_many(self, queries: List[str], k: int, embeddings: List[List[float]], wheres: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """`similarity_search` for a batch of queries, in input order. Queries sharing
+        the same filter are sent to ChromaDB as a single multi-embedding query."""
+        logger.info(f"Searching for {len(queries)} queries (k={k})")
+        n_candidates = max(k, settings.HYBRID_CANDIDATES) if self.bm25 is not None else k
+
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(wheres):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+
+        dense: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for indexes in groups.values():
+            where = wheres[indexes[0]]
+            for i, docs in zip(indexes, self._dense_search_many([embeddings[i] for i in indexes], n_candidates, where)):
+                dense[i] = docs
+
+        if self.bm25 is None:
+            return dense
+
+        self.bm25.reload_if_changed()
+        return [self._fuse(query, k, docs, where) for query, docs, where in zip(queries, dense, wheres)]
+
+    def _fuse(self, query: str, k: int, dense: List[Dict[str, Any]], where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Merges the dense candidates with the BM25 ranking of `query`."""
+        n_candidates = max(k, settings.HYBRID_CANDIDATES)
+        sparse = self.bm25.search(query, n_candidates, where)
+        if not sparse:
+            return dense[:k]
+
+        fused = reciprocal_rank_fusion(
+            [[doc["id"] for doc in dense], [doc_id for doc_id, _ in sparse]],
+            k=settings.RRF_K
+        )[:k]
+        docs = {doc["id"]: doc for doc in dense}
+        docs.update(self._get_by_ids([doc_id for doc_id, _ in fused if doc_id not in docs]))
+        return [docs[doc_id] for doc_id, _ in fused if doc_id in docs]
+
+    async def asimilarity_search(self, query: str, k: int = 5, embedding: List[float] = None, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Async `similarity_search`. Embedding and the local ChromaDB query are CPU bound,
+        so they run in a worker thread instead of blocking the event loop."""
+        return await asyncio.to_thread(self.similarity_search, query, k, embedding, where)
+
+    def get_metadata_values(self, field: str) -> Set[str]:
+        """Distinct values of a metadata field in the collection, recomputed once per
+        ingestion generation."""
+        generation = self.get_generation()
+        if self._metadata_values_generation != generation:
+            values: Dict[str, Set[str]] = {}
+            for meta in self.db._collection.get(include=["metadatas"])["metadatas"]:
+                for key, value in (meta or {}).items():
+                    values.setdefault(key, set()).add(value)
+            self._metadata_values = values
+            self._metadata_values_generation = generation
+        return self._metadata_values.get(field, set())
+
+    def get_generation(self) -> int:
+        """Ingestion generation of the collection; it changes whenever ingestion modifies it."""
+        return read_generation(settings.INGEST_MANIFEST_PATH)
 
     def get_collection_stats(self):
         return {
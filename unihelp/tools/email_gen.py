@@ -1,19 +1,23 @@
+import asyncio
 import os
+import threading
 from typing import Dict, Any
+import openai
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from unihelp.core.cache import LRUCache
 from unihelp.core.config import settings
+from unihelp.core.llm import build_chat_llm
 from unihelp.core.logging import setup_logger
+from unihelp.core.metrics import record_stages
+from unihelp.core.timing import timed
 
 logger = setup_logger(__name__)
 
 class EmailGenerator:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            api_key=settings.OPENAI_API_KEY
-        )
+    def __init__(self, rag_engine=None):
+        # Source of the university rules injected with `include_rag_context`
+        self.rag_engine = rag_engine
+        self.llm = build_chat_llm(temperature=0.3)
         
         self.templates = {
             "attestation": "Demande d'attestation de scolarité",
@@ -45,22 +49,152 @@ L'email doit être en français.
 Email généré:
 """
         )
+        self.chain = self.prompt | self.llm
+
+        # The rule context only depends on the template: it is retrieved once per
+        # template and ingestion generation, not on every request
+        self._contexts: Dict[str, str] = {}
+        self._contexts_generation = None
+        self._contexts_lock = threading.Lock()
+
+        # Emails already generated for the same (template, student info, context)
+        self.output_cache = LRUCache(settings.EMAIL_CACHE_SIZE)
+
+        # Mass mailings retry transient LLM failures (rate limits, timeouts, dropped
+        # connections) with backoff. The client does not retry on its own, so that a
+        # failing student costs at most EMAIL_BATCH_RETRIES + 1 calls in total.
+        self.batch_chain = (self.prompt | build_chat_llm(temperature=0.3, max_retries=0)).with_retry(
+            retry_if_exception_type=(openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError),
+            stop_after_attempt=settings.EMAIL_BATCH_RETRIES + 1,
+            wait_exponential_jitter=True
+        )
 
     def get_supported_templates(self) -> Dict[str, str]:
         return self.templates
 
-    def generate(self, template_key: str, student_info: str, rag_context: str = "") -> str:
+    def rule_context(self, template_key: str) -> str:
+        """University rules relevant to a template, formatted for the prompt. They are
+        retrieved again for all templates once ingestion has changed the collection."""
+        if self.rag_engine is None:
+            return ""
         if template_key not in self.templates:
             raise ValueError(f"Template type '{template_key}' is not supported.")
-            
-        logger.info(f"Generating email for template: {template_key}")
-        template_name = self.templates[template_key]
-        
-        chain = self.prompt | self.llm
-        result = chain.invoke({
-            "template_type": template_name,
+        generation = self.rag_engine.vector_store.get_generation()
+        with self._contexts_lock:
+            if generation != self._contexts_generation:
+                self._contexts = {}
+                self._contexts_generation = generation
+            context = self._contexts.get(template_key)
+            if context is None:
+                docs = self.rag_engine.vector_store.similarity_search(template_key, k=settings.EMAIL_CONTEXT_K)
+                context, _ = self.rag_engine._format_docs(docs)
+                self._contexts[template_key] = context
+        return context
+
+    def precompute_contexts(self):
+        """Retrieves the rule context of every template ahead of the first requests."""
+        for template_key in self.templates:
+            self.rule_context(template_key)
+
+    def _inputs(self, template_key: str, student_info: str, rag_context: str) -> Dict[str, Any]:
+        if template_key not in self.templates:
+            raise ValueError(f"Template type '{template_key}' is not supported.")
+        return {
+            "template_type": self.templates[template_key],
             "student_info": student_info,
             "context": rag_context
-        })
+        }
+
+    def _prepare(self, template_key: str, student_info: str, rag_context: str, include_rag_context: bool, timings: dict):
+        """Prompt inputs, with the template's rule context when `include_rag_context`,
+        and the output cache key (the email when it is already cached)."""
+        if include_rag_context:
+            with timed(timings, "context"):
+                rag_context = self.rule_context(template_key)
+        with timed(timings, "prompt"):
+            inputs = self._inputs(template_key, student_info, rag_context)
+        cache_key = (template_key, student_info.strip(), rag_context)
+        return inputs, cache_key, self.output_cache.get(cache_key)
+
+    def generate(self, template_key: str, student_info: str, rag_context: str = "", include_rag_context: bool = False) -> str:
+        timings = {}
+        inputs, cache_key, cached = self._prepare(template_key, student_info, rag_context, include_rag_context, timings)
+        if cached is not None:
+            logger.info(f"Email cache hit for template: {template_key}")
+            record_stages("email", timings, template=template_key, cached=True)
+            return cached
+        logger.info(f"Generating email for template: {template_key}")
+        
+        with timed(timings, "generate"):
+            result = self.chain.invoke(inputs)
+        record_stages("email", timings, template=template_key)
+        self.output_cache.put(cache_key, result.content)
+        return result.content
+
+    async def agenerate(self, template_key: str, student_info: str, rag_context: str = "", include_rag_context: bool = False) -> str:
+        timings = {}
+        if include_rag_context:
+            # A retrieval (first request of a template) must not block the event loop
+            inputs, cache_key, cached = await asyncio.to_thread(
+                self._prepare, template_key, student_info, rag_context, include_rag_context, timings
+            )
+        else:
+            inputs, cache_key, cached = self._prepare(template_key, student_info, rag_context, False, timings)
+        if cached is not None:
+            logger.info(f"Email cache hit for template: {template_key}")
+            record_stages("email", timings, template=template_key, cached=True)
+            return cached
+        logger.info(f"Generating email for template (async): {template_key}")
         
+        with timed(timings, "generate"):
+            result = await self.chain.ainvoke(inputs)
+        record_stages("email", timings, template=template_key)
+        self.output_cache.put(cache_key, result.content)
         return result.content
+
+    async def astream_generate_many(self, template_key: str, students: list, include_rag_context: bool = False, batch_timings: dict = None):
+        """
+        Emails of a template for many students, yielded as (index, {"email"}) as soon
+        as each one is ready (cached ones first). The rule context is retrieved once
+        for the whole batch; the LLM calls run at most EMAIL_BATCH_CONCURRENCY at a
+        time and are retried EMAIL_BATCH_RETRIES times. A student whose generation
+        still fails gets an (index, {"error"}) result.
+        """
+        logger.info(f"Generating {len(students)} emails for template: {template_key}")
+        timings = {} if batch_timings is None else batch_timings
+        
+        rag_context = ""
+        if include_rag_context:
+            with timed(timings, "context"):
+                rag_context = await asyncio.to_thread(self.rule_context, template_key)
+        
+        pending = []
+        for i, student_info in enumerate(students):
+            inputs, cache_key, cached = self._prepare(template_key, student_info, rag_context, False, {})
+            if cached is not None:
+                yield i, {"email": cached}
+            else:
+                pending.append((i, inputs, cache_key))
+        
+        semaphore = asyncio.Semaphore(settings.EMAIL_BATCH_CONCURRENCY)
+        
+        async def generate(i: int, inputs: dict, cache_key: tuple):
+            try:
+                async with semaphore:
+                    result = await self.batch_chain.ainvoke(inputs)
+            except Exception as e:
+                logger.error(f"Email generation failed for batch student {i}: {e}")
+                return i, {"error": str(e)}
+            self.output_cache.put(cache_key, result.content)
+            return i, {"email": result.content}
+        
+        tasks = [asyncio.create_task(generate(*item)) for item in pending]
+        try:
+            with timed(timings, "generate"):
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+        finally:
+            # The consumer went away (e.g. client disconnected): stop the remaining calls
+            for task in tasks:
+                task.cancel()
+        record_stages("email_batch", timings, template=template_key, students=len(students))
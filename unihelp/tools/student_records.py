@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import os
+from typing import Any, Dict, List, Union
+import openpyxl
+
+SUPPORTED_RECORD_EXTENSIONS = {".csv", ".xlsx", ".json"}
+
+# A student is given either as a ready-made description or as named fields
+StudentRecord = Union[str, Dict[str, Any]]
+
+
+def format_student_record(record: StudentRecord) -> str:
+    """The `student_info` of the email prompt: the text itself, or "field: value" pairs."""
+    if isinstance(record, str):
+        return record.strip()
+    return "; ".join(f"{key}: {value}" for key, value in record.items() if value not in (None, ""))
+
+
+def _rows_to_records(header: List[Any], rows) -> List[Dict[str, Any]]:
+    header = [str(name).strip() if name is not None else f"col{i + 1}" for i, name in enumerate(header)]
+    records = []
+    for row in rows:
+        record = {name: value for name, value in zip(header, row) if value not in (None, "")}
+        if record:
+            records.append(record)
+    return records
+
+
+def _parse_csv(content: bytes) -> List[Dict[str, Any]]:
+    # Spreadsheets exported in French locales use ";" and often a BOM
+    text = content.decode("utf-8-sig")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    if not rows:
+        return []
+    return _rows_to_records(rows[0], rows[1:])
+
+
+def _parse_xlsx(content: bytes) -> List[Dict[str, Any]]:
+    wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        # First sheet, first row as the header
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return []
+        return _rows_to_records(list(header), rows)
+    finally:
+        wb.close()
+
+
+def _parse_json(content: bytes) -> List[StudentRecord]:
+    records = json.loads(content)
+    if not isinstance(records, list) or not all(isinstance(record, (str, dict)) for record in records):
+        raise ValueError("A JSON upload must be a list of strings or objects")
+    return records
+
+
+def parse_student_records(filename: str, content: bytes) -> List[str]:
+    """
+    The `student_info` of each student listed in an uploaded file: one per row of
+    a CSV or of the first sheet of an XLSX (the first row names the columns), or
+    one per item of a JSON list. A "student_info" column is used as is; otherwise
+    the whole row is described as "column: value" pairs.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        records = _parse_csv(content)
+    elif extension == ".xlsx":
+        records = _parse_xlsx(content)
+    elif extension == ".json":
+        records = _parse_json(content)
+    else:
+        raise ValueError(f"Unsupported file type '{extension}'. Supported: {sorted(SUPPORTED_RECORD_EXTENSIONS)}")
+
+    students = []
+    for record in records:
+        if isinstance(record, dict) and record.get("student_info"):
+            record = str(record["student_info"])
+        student_info = format_student_record(record)
+        if student_info:
+            students.append(student_info)
+    return students
@@ -0,0 +1,52 @@
+import io
+import json
+import openpyxl
+import pytest
+from unihelp.tools.student_records import format_student_record, parse_student_records
+
+
+def test_records_are_described_as_field_value_pairs():
+    assert format_student_record("  Amine Ben Salah, L3 informatique ") == "Amine Ben Salah, L3 informatique"
+    record = {"nom": "Amine Ben Salah", "matricule": 2021042, "groupe": "", "remarque": None}
+    assert format_student_record(record) == "nom: Amine Ben Salah; matricule: 2021042"
+
+
+def test_csv_exported_in_a_french_locale():
+    content = "\ufeffnom;matricule;niveau\nAmine Ben Salah;2021042;L3\n;;\nSarra Trabelsi;2022017;\n".encode("utf-8")
+    assert parse_student_records("etudiants.csv", content) == [
+        "nom: Amine Ben Salah; matricule: 2021042; niveau: L3",
+        "nom: Sarra Trabelsi; matricule: 2022017",
+    ]
+
+
+def test_csv_with_commas_and_a_student_info_column():
+    content = b'student_info,matricule\n"Amine, L3 informatique",2021042\n'
+    assert parse_student_records("etudiants.csv", content) == ["Amine, L3 informatique"]
+
+
+def test_xlsx_first_sheet_with_the_first_row_as_header():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["nom", "matricule", None])
+    sheet.append(["Amine Ben Salah", 2021042, "boursier"])
+    sheet.append([None, None, None])
+    workbook.create_sheet("autre").append(["ignorée"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    assert parse_student_records("etudiants.xlsx", buffer.getvalue()) == [
+        "nom: Amine Ben Salah; matricule: 2021042; col3: boursier"
+    ]
+
+
+def test_json_list_of_strings_or_objects():
+    content = json.dumps(["Amine Ben Salah", {"nom": "Sarra Trabelsi"}, {"student_info": "Yassine, M1"}, ""]).encode()
+    assert parse_student_records("etudiants.json", content) == ["Amine Ben Salah", "nom: Sarra Trabelsi", "Yassine, M1"]
+
+    with pytest.raises(ValueError):
+        parse_student_records("etudiants.json", b'{"nom": "Amine"}')
+
+
+def test_unsupported_file_types_are_rejected():
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        parse_student_records("etudiants.pdf", b"%PDF")
@@ -13,6 +13,19 @@ st.set_page_config(
 # Replace with your actual backend URL if deployed separately
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+def iter_sse(response):
+    """Parses a server-sent events stream into (event, data) pairs."""
+    response.encoding = "utf-8"
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = "message"
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
 # --- Custom Styling ---
 st.markdown("""
 <style>
@@ -50,6 +63,9 @@ with st.sidebar:
 # --- Application State ---
 if "messages" not in st.session_state:
     st.session_state["messages"] = [{"role": "assistant", "content": "Bonjour ! Je suis UniHelp. Comment puis-je vous aider avec vos démarches administratives aujourd'hui ?"}]
+# The history itself is kept by the API, under the ID it gives to the first turn
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = None
 
 
 # --- Main Layout ---
@@ -61,6 +77,15 @@ tab1, tab2, tab3 = st.tabs(["💬 Assistant Assistant", "✉️ Générateur d'E
 with tab1:
     st.markdown("<h2 class='main-header'>Questions Administratives</h2>", unsafe_allow_html=True)
     st.markdown("Posez vos questions sur les inscriptions, scolarité, bourses, etc.")
+    if st.button("🔄 Nouvelle conversation"):
+        if st.session_state.session_id:
+            try:
+                requests.delete(f"{API_URL}/chat/{st.session_state.session_id}")
+            except requests.exceptions.ConnectionError:
+                pass
+        st.session_state.session_id = None
+        del st.session_state["messages"]
+        st.rerun()
     
     # Display chat messages from history
     for msg in st.session_state.messages:
@@ -81,30 +106,47 @@ with tab1:
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Get response from FastAPI
+        # Stream the response from FastAPI: sources arrive first, then the answer token by token
         with st.chat_message("assistant"):
-            with st.spinner("Recherche dans les documents..."):
-                try:
-                    response = requests.post(f"{API_URL}/ask", json={"question": prompt, "top_k": 4})
-                    if response.status_code == 200:
-                        data = response.json()
-                        answer = data.get("answer", "Erreur lors de la génération de la réponse.")
-                        sources = data.get("sources", [])
-                        
-                        st.markdown(answer)
-                        if sources:
-                            with st.expander("Voir les sources"):
-                                for src in sources:
-                                    file_name = src.get('file', 'N/A')
-                                    dept = src.get('department', 'N/A')
-                                    date = src.get('date', 'N/A')
-                                    st.markdown(f"<div class='source-box'>📄 <b>Fichier:</b> {file_name} <br> 🏛️ <b>Dép:</b> {dept} <br> 📅 <b>Date:</b> {date}</div>", unsafe_allow_html=True)
-                        
-                        st.session_state.messages.append({"role": "assistant", "content": answer, "sources": sources})
-                    else:
-                        st.error(f"Erreur API: {response.text}")
-                except requests.exceptions.ConnectionError:
-                    st.error("Impossible de contacter le serveur (FastAPI n'est pas lancé).")
+            placeholder = st.empty()
+            placeholder.markdown("_Recherche dans les documents..._")
+            try:
+                answer = ""
+                sources = []
+                response = requests.post(
+                    f"{API_URL}/chat/stream",
+                    json={"session_id": st.session_state.session_id, "question": prompt, "top_k": 4},
+                    stream=True
+                )
+                if response.status_code == 200:
+                    for event, data in iter_sse(response):
+                        if event == "session":
+                            st.session_state.session_id = data.get("session_id")
+                        elif event == "sources":
+                            sources = data.get("sources", [])
+                        elif event == "token":
+                            answer += data.get("content", "")
+                            placeholder.markdown(answer + "▌")
+                        elif event == "error":
+                            st.error(f"Erreur API: {data.get('detail', '')}")
+                    
+                    answer = answer or "Erreur lors de la génération de la réponse."
+                    placeholder.markdown(answer)
+                    if sources:
+                        with st.expander("Voir les sources"):
+                            for src in sources:
+                                file_name = src.get('file', 'N/A')
+                                dept = src.get('department', 'N/A')
+                                date = src.get('date', 'N/A')
+                                st.markdown(f"<div class='source-box'>📄 <b>Fichier:</b> {file_name} <br> 🏛️ <b>Dép:</b> {dept} <br> 📅 <b>Date:</b> {date}</div>", unsafe_allow_html=True)
+                    
+                    st.session_state.messages.append({"role": "assistant", "content": answer, "sources": sources})
+                else:
+                    placeholder.empty()
+                    st.error(f"Erreur API: {response.text}")
+            except requests.exceptions.ConnectionError:
+                placeholder.empty()
+                st.error("Impossible de contacter le serveur (FastAPI n'est pas lancé).")
 
 # ==========================================
 # TAB 2: Email Generator